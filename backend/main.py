@@ -4,20 +4,27 @@
 import sys
 import os
 from pathlib import Path
-import re
 
 # 添加src路径
 src_path = Path(__file__).parent.parent / "src"
 sys.path.insert(0, str(src_path))
+# 添加backend路径（services 等子模块）
+sys.path.insert(0, str(Path(__file__).parent))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import codecs
+import io
+import concurrent.futures
 import json
 import logging
+import time
 
 # 修复导入：明确从src目录导入，避免与当前文件名冲突
 import importlib.util
@@ -26,17 +33,50 @@ src_main = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(src_main)
 OracleSPAnalyzer = src_main.OracleSPAnalyzer
 
+from utils.config import config
+from analyzer.parameter_analyzer import parameter_key
+from visualizer.edge_aggregator import EdgeAggregator
+from utils.cache import AnalysisCache, procedure_hash
+from utils import serialization
+from parser.unit_splitter import iter_analysis_units
+from services.analysis_pool import AnalysisPool, AnalysisPoolBusy
+from services.job_queue import JobQueue, JobQueueFull, JOB_SUCCEEDED, JOB_FAILED
+from services.graph_query import StoredAnalysis
+from services.compact_format import to_compact
+from services.compression import CompressionMiddleware
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 上传文件配置，文件按块流式读取
+upload_config = config.get_upload_config()
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# 可视化配置：是否默认合并平行边（/api/analyze 可通过 options.aggregate_edges 覆盖）
+visualization_config = config.get_visualization_config()
+
+# 已完成的分析按 analysis_id 保存（LRU + TTL），图查询接口按需从中取子图
+store_config = config.get_analysis_store_config()
+analysis_store = AnalysisCache(max_size=store_config['max_size'], ttl=store_config['ttl'])
+
+# 分析进程池：CPU密集的分析在独立进程中执行，不阻塞事件循环
+analysis_pool = AnalysisPool.from_config(config)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    job_queue.shutdown()
+    analysis_pool.shutdown()
+
 # 创建FastAPI应用
 app = FastAPI(
     title="Oracle存储过程分析工具",
     description="分析Oracle存储过程的数据流向、表关系和字段血缘关系",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -48,6 +88,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩：按 Accept-Encoding 协商 br / gzip
+compression_config = config.get_compression_config()
+if compression_config['enabled']:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=compression_config['minimum_size'],
+        gzip_level=compression_config['gzip_level'],
+        brotli_quality=compression_config['brotli_quality']
+    )
+
 # 挂载静态文件服务（仅在目录存在时）
 static_dir = Path(__file__).parent.parent / "frontend" / "build" / "static"
 build_dir = Path(__file__).parent.parent / "frontend" / "build"
@@ -100,15 +150,51 @@ class AnalyzeRequest(BaseModel):
     stored_procedure: str
     options: Optional[Dict[str, Any]] = {}
 
+class BatchProcedure(BaseModel):
+    id: Optional[str] = None  # 调用方自定义标识，原样返回；未指定时为序号
+    stored_procedure: str
+
+class BatchAnalyzeRequest(BaseModel):
+    procedures: List[BatchProcedure]
+    include_visualization: bool = False
+
 class AnalyzeResponse(BaseModel):
     success: bool
     message: str
+    analysis_id: Optional[str] = None  # 用于 /api/analyses/{analysis_id}/graph 等查询接口
     data: Optional[Dict[str, Any]] = None
     visualization: Optional[Dict[str, Any]] = None
 
-# 全局分析器实例
+class FastJSONResponse(Response):
+    """
+    直接编码的JSON响应
+    
+    分析响应由 build_analyze_response 一次性构建为只含基本类型的字典，不再经过
+    AnalyzeResponse 的二次校验与 jsonable_encoder 的逐值转换，直接由 utils.serialization
+    编码（安装了 orjson 时使用 orjson）。路由上的 response_model 仅用于生成接口文档。
+    """
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return serialization.dumps(content)
+
+# 全局分析器实例（主进程中仅用于缓存查询，分析在进程池中执行）
 analyzer = OracleSPAnalyzer()
 
+def run_analysis_job(sp_text: str):
+    """在任务队列的工作线程中执行分析：先查缓存，未命中时交给进程池（等待空闲名额）"""
+    result = analyzer.get_cached_analysis(sp_text)
+    if result is None:
+        try:
+            result = analysis_pool.run(sp_text)
+        except concurrent.futures.TimeoutError:
+            raise RuntimeError(f"分析超时（超过 {analysis_pool.timeout:g} 秒）")
+        analyzer.cache_analysis(sp_text, result)
+    return result
+
+# 异步分析任务队列：提交后立即返回任务ID，客户端轮询获取结果
+job_queue = JobQueue.from_config(config, run_analysis_job, workers=analysis_pool.max_workers)
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """首页"""
@@ -143,145 +229,519 @@ async def health_check():
     """健康检查"""
     return {"status": "healthy", "message": "Oracle存储过程分析服务运行正常"}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """分析缓存统计"""
+    return {
+        "memory": analyzer.cache.stats() if analyzer.cache is not None else None,
+        "persistent": analyzer.persistent_cache.stats() if analyzer.persistent_cache is not None else None
+    }
+
+@app.get("/api/pool/stats")
+async def pool_stats():
+    """分析进程池统计"""
+    return analysis_pool.stats()
+
 @app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze_stored_procedure(request: AnalyzeRequest):
-    """分析存储过程"""
+async def analyze_stored_procedure(request: AnalyzeRequest,
+                                   response_format: str = Query("full", alias="format", pattern="^(full|compact)$")):
+    """
+    分析存储过程
+    
+    format=compact 时返回紧凑格式（字符串表 + 列存储，见 services/compact_format）。
+    """
+    options = request.options or {}
+    return await analyze_text(
+        request.stored_procedure,
+        aggregate_edges=options.get("aggregate_edges"),
+        include_visualization=options.get("include_visualization", True),
+        compact=response_format == "compact"
+    )
+
+async def analyze_text(stored_procedure: str, aggregate_edges: Optional[bool] = None,
+                       include_visualization: bool = True, compact: bool = False) -> FastJSONResponse:
+    """
+    分析存储过程文本（JSON请求与文件上传共用）
+    
+    结果以存储过程文本的哈希为 analysis_id 保存；include_visualization 为 false 时响应中
+    不含完整的可视化图，客户端通过 /api/analyses/{analysis_id}/graph 按需查询子图。
+    """
     try:
-        logger.info("开始分析存储过程")
-        
         # 验证输入
-        if not request.stored_procedure.strip():
+        if not has_content(stored_procedure):
             raise HTTPException(status_code=400, detail="存储过程内容不能为空")
         
-        # 执行分析
-        result = analyzer.analyze(request.stored_procedure)
-        
-        # 转换为可视化数据
-        visualization_data = convert_to_visualization_data(result)
-        
-        # 构建响应数据
-        response_data = {
-            "procedure_name": result.sp_structure.name,
-            "parameters": [
-                {
-                    "name": p.name,
-                    "direction": p.direction,
-                    "data_type": p.data_type,
-                    "used_in_statements": p.used_in_statements
-                } for p in result.parameters
-            ],
-            "sql_statements": [
-                {
-                    "id": stmt.statement_id,
-                    "type": stmt.statement_type.value,
-                    "raw_sql": stmt.raw_sql,
-                    "source_tables": stmt.source_tables,
-                    "target_tables": stmt.target_tables,
-                    "parameters_used": stmt.parameters_used
-                } for stmt in result.sp_structure.sql_statements
-            ],
-            "tables": {
-                "physical": {
-                    name: {
-                        "fields": table.fields,
-                        "source_sql_ids": table.source_sql_ids
-                    } for name, table in result.table_field_analysis.physical_tables.items()
-                },
-                "temporary": {
-                    name: {
-                        "fields": table.fields,
-                        "source_sql_ids": table.source_sql_ids
-                    } for name, table in result.table_field_analysis.temp_tables.items()
-                }
-            },
-            "join_conditions": [
-                {
-                    "left_table": jc.left_table,
-                    "left_field": jc.left_field,
-                    "right_table": jc.right_table,
-                    "right_field": jc.right_field,
-                    "join_type": jc.join_type,
-                    "condition_text": jc.condition_text
-                } for jc in result.conditions_and_logic.join_conditions
-            ],
-            "statistics": {
-                "parameter_count": len(result.parameters),
-                "sql_statement_count": len(result.sp_structure.sql_statements),
-                "physical_table_count": len(result.table_field_analysis.physical_tables),
-                "temporary_table_count": len(result.table_field_analysis.temp_tables),
-                "join_condition_count": len(result.conditions_and_logic.join_conditions)
-            }
-        }
-        
-        logger.info(f"分析完成: {result.sp_structure.name}")
-        
-        return AnalyzeResponse(
-            success=True,
-            message=f"成功分析存储过程 '{result.sp_structure.name}'",
-            data=response_data,
-            visualization=visualization_data
-        )
+        result, analysis_id = await run_analysis(stored_procedure)
+        return build_analyze_response(result, aggregate_edges, analysis_id, include_visualization, compact)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"分析过程中发生错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
+async def run_analysis(stored_procedure: str):
+    """
+    分析一个存储过程并保存结果，返回 (分析结果, analysis_id)
+
+    先查本进程缓存，未命中时在进程池中运行（超出排队上限返回429，超时返回504）。
+    """
+    logger.info("开始分析存储过程")
+    
+    result = analyzer.get_cached_analysis(stored_procedure)
+    if result is None:
+        try:
+            result = await analysis_pool.analyze(stored_procedure)
+        except AnalysisPoolBusy:
+            raise HTTPException(
+                status_code=429,
+                detail="分析任务繁忙，请稍后重试",
+                headers={"Retry-After": "5"}
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"分析超时（超过 {analysis_pool.timeout:g} 秒）")
+        analyzer.cache_analysis(stored_procedure, result)
+    
+    logger.info(f"分析完成: {result.sp_structure.name}")
+    
+    analysis_id = procedure_hash(stored_procedure)
+    store_analysis(analysis_id, result)
+    return result, analysis_id
+
 @app.post("/api/analyze/file")
 async def analyze_file(file: UploadFile = File(...)):
-    """从文件上传分析存储过程"""
+    """
+    从文件上传分析存储过程
+
+    文件按程序单元切分（与 OracleSPAnalyzer.analyze_units 相同）：只有一个单元时响应格式
+    同 /api/analyze；包含多个单元（如多个过程的DDL导出、包体）时逐个分析，units 中
+    每个单元一项，字段同 /api/analyze 的响应，另含 unit（单元名称）与 kind（单元类型）。
+    """
     try:
         # 检查文件类型
         if not file.filename.lower().endswith(('.sql', '.txt', '.pls')):
             raise HTTPException(status_code=400, detail="仅支持 .sql, .txt, .pls 文件格式")
         
-        # 读取文件内容
-        content = await file.read()
-        stored_procedure = content.decode('utf-8')
+        # 流式读取并解码文件内容
+        stored_procedure = await read_upload_text(file, upload_config['max_size'])
         
-        # 创建分析请求
-        request = AnalyzeRequest(stored_procedure=stored_procedure)
+        units = list(iter_analysis_units(stored_procedure))
+        if len(units) <= 1:
+            return await analyze_text(stored_procedure)
         
-        # 调用分析功能
-        return await analyze_stored_procedure(request)
+        unit_payloads = []
+        for unit in units:
+            result, analysis_id = await run_analysis(stored_procedure[unit.start:unit.end])
+            payload = build_analyze_payload(result, analysis_id=analysis_id)
+            payload["unit"] = unit.name
+            payload["kind"] = unit.kind
+            unit_payloads.append(payload)
+        return FastJSONResponse({
+            "success": True,
+            "message": f"成功分析文件 '{file.filename}' 中的 {len(units)} 个程序单元",
+            "units": unit_payloads
+        })
         
+    except HTTPException:
+        raise
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="文件编码错误，请确保文件使用UTF-8编码")
     except Exception as e:
         logger.error(f"文件分析错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文件分析失败: {str(e)}")
 
-def convert_to_visualization_data(result) -> Dict[str, Any]:
-    """转换分析结果为可视化数据格式"""
-    nodes = []
-    edges = []
+async def read_upload_text(file: UploadFile, max_size: int) -> str:
+    """
+    以流式方式读取上传文件并解码为文本
+
+    按块读取并经增量解码器解码（多字节字符跨块也能正确处理），读取过程中即检查
+    大小上限，超限时立即返回413；原始字节不会整体驻留内存，解码结果直接写入同一个缓冲区。
+    """
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=413, detail=f"文件过大，最大支持 {max_size} 字节")
+    
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buf = io.StringIO()
+    total = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            raise HTTPException(status_code=413, detail=f"文件过大，最大支持 {max_size} 字节")
+        buf.write(decoder.decode(chunk))
+    buf.write(decoder.decode(b'', final=True))
+    return buf.getvalue()
+
+def has_content(text: str) -> bool:
+    """判断文本是否包含非空白字符（遇到第一个非空白字符即返回，不复制文本）"""
+    return any(not c.isspace() for c in text)
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """
+    批量分析存储过程
+
+    各存储过程在进程池中并行分析，结果按完成顺序以NDJSON（每行一个JSON对象）流式返回，
+    每行包含 index（请求中的序号）、id、success，以及 data/visualization 或 error。
+    """
+    if not request.procedures:
+        raise HTTPException(status_code=400, detail="存储过程列表不能为空")
     
-    # 创建别名到实际表名的映射
-    alias_to_table_map = {}
+    items = [
+        (p.id if p.id is not None else str(i), p.stored_procedure, None)
+        for i, p in enumerate(request.procedures)
+    ]
+    return StreamingResponse(
+        stream_batch_results(items, request.include_visualization),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/api/analyze/batch/files")
+async def analyze_batch_files(files: List[UploadFile] = File(...), include_visualization: bool = False):
+    """
+    批量分析上传的多个存储过程文件，返回格式同 /api/analyze/batch
+
+    每个文件按程序单元切分（如包含多个过程的DDL导出、包体），每个单元一行结果；
+    id 为文件名，文件包含多个单元时为 "文件名:单元名"。
+    """
+    items = []
+    for upload in files:
+        if not upload.filename.lower().endswith(('.sql', '.txt', '.pls', '.pkb')):
+            items.append((upload.filename, None, "仅支持 .sql, .txt, .pls, .pkb 文件格式"))
+            continue
+        try:
+            text = await read_upload_text(upload, upload_config['max_size'])
+            units = list(iter_analysis_units(text))
+            if len(units) <= 1:
+                items.append((upload.filename, text, None))
+            else:
+                items.extend(
+                    (f"{upload.filename}:{unit.name}", text[unit.start:unit.end], None) for unit in units
+                )
+        except HTTPException as e:
+            items.append((upload.filename, None, e.detail))
+        except UnicodeDecodeError:
+            items.append((upload.filename, None, "文件编码错误，请确保文件使用UTF-8编码"))
     
-    # 构建别名映射关系
-    for stmt in result.sp_structure.sql_statements:
-        # 从 SQL 语句中提取别名信息
-        sql_text = stmt.raw_sql.upper()
-        
-        # 匹配 FROM table_name alias 格式
-        from_pattern = r'FROM\s+(\w+)\s+(\w+)'
-        from_match = re.search(from_pattern, sql_text, re.IGNORECASE)
-        if from_match:
-            table_name = from_match.group(1).lower()
-            alias = from_match.group(2).lower()
-            alias_to_table_map[alias] = table_name
+    return StreamingResponse(
+        stream_batch_results(items, include_visualization),
+        media_type="application/x-ndjson"
+    )
+
+def batch_result_line(index: int, item_id: str, result=None, error: Optional[str] = None,
+                      include_visualization: bool = False) -> bytes:
+    """构建批量分析结果中的一行NDJSON"""
+    line: Dict[str, Any] = {"index": index, "id": item_id, "success": error is None}
+    if error is not None:
+        line["error"] = error
+    else:
+        line["data"] = build_analysis_data(result)
+        if include_visualization:
+            line["visualization"] = convert_to_visualization_data(result)
+    return serialization.dumps(line) + b"\n"
+
+async def stream_batch_results(items: List[tuple], include_visualization: bool):
+    """
+    逐行产出批量分析结果
+
+    Args:
+        items: (id, 存储过程文本, 错误信息) 列表，错误信息不为空的条目直接返回错误
+        include_visualization: 是否在每行中包含可视化数据
+    """
+    pending = []
+    for index, (item_id, sp_text, error) in enumerate(items):
+        if error is None and not has_content(sp_text):
+            error = "存储过程内容不能为空"
+        if error is not None:
+            yield batch_result_line(index, item_id, error=error)
+            continue
         
-        # 匹配 JOIN table_name alias 格式
-        join_pattern = r'JOIN\s+(\w+)\s+(\w+)'
-        join_matches = re.finditer(join_pattern, sql_text, re.IGNORECASE)
-        for match in join_matches:
-            table_name = match.group(1).lower()
-            alias = match.group(2).lower()
-            alias_to_table_map[alias] = table_name
+        # 缓存命中的条目立即返回，其余交给进程池并行分析
+        cached = analyzer.get_cached_analysis(sp_text)
+        if cached is not None:
+            yield batch_result_line(index, item_id, cached, include_visualization=include_visualization)
+        else:
+            pending.append(index)
+    
+    succeeded = 0
+    async for position, result, exc in analysis_pool.analyze_many(items[i][1] for i in pending):
+        index = pending[position]
+        item_id, sp_text, _ = items[index]
+        if exc is None:
+            analyzer.cache_analysis(sp_text, result)
+            succeeded += 1
+            yield batch_result_line(index, item_id, result, include_visualization=include_visualization)
+        elif isinstance(exc, asyncio.TimeoutError):
+            yield batch_result_line(index, item_id, error=f"分析超时（超过 {analysis_pool.timeout:g} 秒）")
+        else:
+            yield batch_result_line(index, item_id, error=f"分析失败: {exc}")
+    
+    logger.info(f"批量分析完成: 共 {len(items)} 个，进程池分析成功 {succeeded}/{len(pending)} 个")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_analysis_job(request: AnalyzeRequest):
+    """提交异步分析任务，立即返回任务ID"""
+    if not has_content(request.stored_procedure):
+        raise HTTPException(status_code=400, detail="存储过程内容不能为空")
+    
+    cached = analyzer.get_cached_analysis(request.stored_procedure)
+    if cached is not None:
+        job = job_queue.complete(cached)
+    else:
+        try:
+            job = job_queue.submit(request.stored_procedure)
+        except JobQueueFull:
+            raise HTTPException(
+                status_code=429,
+                detail="排队中的分析任务过多，请稍后重试",
+                headers={"Retry-After": "5"}
+            )
+    return build_job_status(job)
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    """异步分析任务统计"""
+    return job_queue.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """查询异步分析任务状态"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return build_job_status(job)
+
+@app.get("/api/jobs/{job_id}/result", response_model=AnalyzeResponse)
+async def get_analysis_job_result(job_id: str):
+    """获取异步分析任务结果，格式与 /api/analyze 相同；任务未完成时返回409"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"分析失败: {job.error}")
+    if job.status != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成（当前状态: {job.status}）")
+    store_analysis(job.id, job.result)
+    return build_analyze_response(job.result, analysis_id=job.id)
+
+def build_job_status(job) -> Dict[str, Any]:
+    """构建异步分析任务的状态数据"""
+    end = job.finished_at or time.time()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "queue_position": job_queue.queue_position(job),
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "elapsed": end - job.created_at,
+        "error": job.error,
+        "result_url": f"/api/jobs/{job.id}/result" if job.status == JOB_SUCCEEDED else None
+    }
+
+def build_analyze_response(result, aggregate_edges: Optional[bool] = None, analysis_id: Optional[str] = None,
+                           include_visualization: bool = True, compact: bool = False) -> FastJSONResponse:
+    """构建 /api/analyze 格式（字段同 AnalyzeResponse）的完整响应，compact 为 true 时转换为紧凑格式"""
+    payload = build_analyze_payload(result, aggregate_edges, analysis_id, include_visualization)
+    return FastJSONResponse(to_compact(payload) if compact else payload)
+
+def build_analyze_payload(result, aggregate_edges: Optional[bool] = None, analysis_id: Optional[str] = None,
+                          include_visualization: bool = True) -> Dict[str, Any]:
+    """构建 /api/analyze 格式的响应内容"""
+    return {
+        "success": True,
+        "message": f"成功分析存储过程 '{result.sp_structure.name}'",
+        "analysis_id": analysis_id,
+        "data": build_analysis_data(result),
+        "visualization": convert_to_visualization_data(result, aggregate_edges) if include_visualization else None
+    }
+
+def store_analysis(analysis_id: str, result):
+    """保存分析结果供查询接口使用（同一ID已保存时复用，保留已构建的图索引）"""
+    stored = analysis_store.get(analysis_id)
+    if stored is None or stored.result is not result:
+        analysis_store.put(analysis_id, StoredAnalysis(result, convert_to_visualization_data))
+
+def get_stored_analysis(analysis_id: str) -> StoredAnalysis:
+    stored = analysis_store.get(analysis_id)
+    if stored is None and analyzer.persistent_cache is not None:
+        # 已从内存中淘汰（或服务重启）时，从持久化缓存恢复（键同为存储过程文本的哈希）
+        result = analyzer.persistent_cache.get(analysis_id)
+        if result is not None:
+            stored = StoredAnalysis(result, convert_to_visualization_data)
+            analysis_store.put(analysis_id, stored)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="分析结果不存在或已过期，请重新分析")
+    return stored
+
+def parse_name_list(value: Optional[str]) -> Optional[set]:
+    """解析逗号分隔的名称列表，空值表示不过滤"""
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+@app.get("/api/analyses/{analysis_id}/graph")
+async def query_analysis_graph(
+    analysis_id: str,
+    focus: Optional[str] = None,
+    depth: int = Query(1, ge=0, le=10),
+    types: Optional[str] = None,
+    node_types: Optional[str] = None,
+    aggregate: Optional[bool] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=2000)
+):
+    """
+    查询已保存分析的可视化子图
+    
+    focus 为节点ID（如 table_employees）或表名/参数名，返回其 depth 跳以内的邻域；未指定时返回整个图。
+    types / node_types 为逗号分隔的边类型 / 节点类型过滤；节点按 offset/limit 分页，
+    每条边只出现在其较晚出现的端点所在的页上。aggregate 未指定时使用 visualization.aggregate_edges。
+    """
+    stored = get_stored_analysis(analysis_id)
+    if aggregate is None:
+        aggregate = visualization_config['aggregate_edges']
+    graph = stored.graph(aggregate)
+    
+    focus_id = None
+    if focus is not None:
+        focus_id = graph.resolve_node(focus)
+        if focus_id is None:
+            raise HTTPException(status_code=404, detail=f"节点不存在: {focus}")
+    
+    subgraph = graph.query(focus_id, depth, parse_name_list(types), parse_name_list(node_types), offset, limit)
+    return {
+        "analysis_id": analysis_id,
+        "focus": focus_id,
+        "depth": depth,
+        "aggregated": aggregate,
+        **subgraph
+    }
+
+@app.get("/api/analyses/{analysis_id}/statements")
+async def query_analysis_statements(
+    analysis_id: str,
+    ids: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """按语句ID（逗号分隔）或分页查询已保存分析中的SQL语句文本，供图中选中的边按需加载"""
+    stored = get_stored_analysis(analysis_id)
+    if ids:
+        try:
+            statement_ids = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids 必须是逗号分隔的语句ID")
+        statements = stored.statements(statement_ids)
+    else:
+        statements = stored.statements()
+    total = len(statements)
+    return {
+        "analysis_id": analysis_id,
+        "statements": [
+            {
+                "id": stmt.statement_id,
+                "type": stmt.statement_type.value,
+                "raw_sql": stmt.raw_sql
+            } for stmt in statements[offset:offset + limit]
+        ],
+        "page": {
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": offset + limit if offset + limit < total else None
+        }
+    }
+
+def build_analysis_data(result) -> Dict[str, Any]:
+    """构建分析结果的响应数据（单个分析与批量分析共用）"""
+    return {
+        "procedure_name": result.sp_structure.name,
+        "parameters": [
+            {
+                "name": p.name,
+                "direction": p.direction,
+                "data_type": p.data_type,
+                "used_in_statements": p.used_in_statements
+            } for p in result.parameters
+        ],
+        "sql_statements": [
+            {
+                "id": stmt.statement_id,
+                "type": stmt.statement_type.value,
+                "raw_sql": stmt.raw_sql,
+                "source_tables": stmt.source_tables,
+                "target_tables": stmt.target_tables,
+                "table_aliases": stmt.table_aliases,
+                "parameters_used": stmt.parameters_used
+            } for stmt in result.sp_structure.sql_statements
+        ],
+        "parameter_usage": result.parameter_usage,
+        "tables": {
+            "physical": {
+                name: {
+                    "fields": table.fields,
+                    "source_sql_ids": table.source_sql_ids
+                } for name, table in result.table_field_analysis.physical_tables.items()
+            },
+            "temporary": {
+                name: {
+                    "fields": table.fields,
+                    "source_sql_ids": table.source_sql_ids
+                } for name, table in result.table_field_analysis.temp_tables.items()
+            }
+        },
+        "join_conditions": [
+            {
+                "left_table": jc.left_table,
+                "left_field": jc.left_field,
+                "right_table": jc.right_table,
+                "right_field": jc.right_field,
+                "join_type": jc.join_type,
+                "condition_text": jc.condition_text,
+                "left_alias": jc.left_alias,
+                "right_alias": jc.right_alias,
+                "syntax": jc.syntax
+            } for jc in result.conditions_and_logic.join_conditions
+        ],
+        "statistics": {
+            "parameter_count": len(result.parameters),
+            "sql_statement_count": len(result.sp_structure.sql_statements),
+            "physical_table_count": len(result.table_field_analysis.physical_tables),
+            "temporary_table_count": len(result.table_field_analysis.temp_tables),
+            "join_condition_count": len(result.conditions_and_logic.join_conditions)
+        }
+    }
+
+def convert_to_visualization_data(result, aggregate_edges: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    转换分析结果为可视化数据格式
+    
+    节点加入时同时登记到按ID的索引中，建边时只做字典查找；连接条件的表名在解析时
+    已按语句的别名映射解析完毕。所有边在对语句的一次遍历中生成，整体与语句数成线性关系。
+    
+    Args:
+        result: 存储过程分析结果
+        aggregate_edges: 是否合并平行边：同一对节点之间的数据流边与参数使用边各合并为一条，
+            data 中给出 statement_ids 与 count；为 None 时使用配置 visualization.aggregate_edges
+    """
+    if aggregate_edges is None:
+        aggregate_edges = visualization_config['aggregate_edges']
+    
+    nodes = []
+    edges = []
+    node_index: Dict[str, Dict[str, Any]] = {}
+    aggregator = EdgeAggregator() if aggregate_edges else None
+    
+    def add_node(node: Dict[str, Any]):
+        node_index[node["id"]] = node
+        nodes.append(node)
     
     # 添加参数节点
     for param in result.parameters:
-        nodes.append({
+        add_node({
             "id": f"param_{param.name}",
             "label": param.name,
             "type": "parameter",
@@ -295,7 +755,7 @@ def convert_to_visualization_data(result) -> Dict[str, Any]:
     
     # 添加物理表节点
     for table_name, table in result.table_field_analysis.physical_tables.items():
-        nodes.append({
+        add_node({
             "id": f"table_{table_name}",
             "label": table_name,
             "type": "physical_table",
@@ -308,7 +768,7 @@ def convert_to_visualization_data(result) -> Dict[str, Any]:
     
     # 添加临时表节点
     for table_name, table in result.table_field_analysis.temp_tables.items():
-        nodes.append({
+        add_node({
             "id": f"table_{table_name}",
             "label": table_name,
             "type": "temp_table",
@@ -319,116 +779,89 @@ def convert_to_visualization_data(result) -> Dict[str, Any]:
             }
         })
     
-    # 添加数据流边
+    # 参数使用索引反转为 语句ID -> 参数名，边的起点与参数节点ID一致
+    params_by_statement: Dict[int, List[str]] = {}
+    for param in result.parameters:
+        for statement_id in result.parameter_usage.get(parameter_key(param.name), ()):
+            params_by_statement.setdefault(statement_id, []).append(param.name)
+    
     for stmt in result.sp_structure.sql_statements:
+        statement_id = stmt.statement_id
+        statement_type = stmt.statement_type.value
+        
+        # 添加数据流边
         for source_table in stmt.source_tables:
             for target_table in stmt.target_tables:
+                if aggregator is not None:
+                    aggregator.add("data_flow", f"table_{source_table}", f"table_{target_table}",
+                                   statement_id, statement_type)
+                    continue
                 edges.append({
-                    "id": f"flow_{stmt.statement_id}_{source_table}_{target_table}",
+                    "id": f"flow_{statement_id}_{source_table}_{target_table}",
                     "source": f"table_{source_table}",
                     "target": f"table_{target_table}",
                     "type": "data_flow",
-                    "label": stmt.statement_type.value,
+                    "label": statement_type,
                     "data": {
-                        "statement_id": stmt.statement_id,
-                        "statement_type": stmt.statement_type.value,
-                        "raw_sql": stmt.raw_sql
+                        "statement_id": statement_id,
+                        "statement_type": statement_type
                     }
                 })
         
         # 添加参数使用边
-        for param_name in stmt.parameters_used:
+        for param_name in params_by_statement.get(statement_id, ()):
             for table_name in stmt.source_tables + stmt.target_tables:
+                if aggregator is not None:
+                    aggregator.add("parameter_usage", f"param_{param_name}", f"table_{table_name}",
+                                   statement_id, statement_type)
+                    continue
                 edges.append({
-                    "id": f"param_{stmt.statement_id}_{param_name}_{table_name}",
+                    "id": f"param_{statement_id}_{param_name}_{table_name}",
                     "source": f"param_{param_name}",
                     "target": f"table_{table_name}",
                     "type": "parameter_usage",
                     "label": "uses",
                     "data": {
-                        "statement_id": stmt.statement_id
+                        "statement_id": statement_id
                     }
                 })
-    
-    # 添加JOIN条件边
-    # 首先创建一个表名映射，将别名映射到实际表名
-    table_alias_map = {}
-    all_table_names = set()
-    
-    # 收集所有表名
-    for table_name in result.table_field_analysis.physical_tables.keys():
-        all_table_names.add(table_name)
-    for table_name in result.table_field_analysis.temp_tables.keys():
-        all_table_names.add(table_name)
-    
-    # 创建别名到表名的映射
-    for table_name in all_table_names:
-        # 尝试匹配别名（通常是表名的第一个字母或前几个字母）
-        table_alias_map[table_name] = table_name  # 完整表名
-        if len(table_name) > 0:
-            table_alias_map[table_name[0]] = table_name  # 首字母别名
-            table_alias_map[table_name[0].lower()] = table_name  # 小写首字母别名
-    
-    # 特殊处理常见的别名模式
-    for table_name in all_table_names:
-        if 'employees' in table_name.lower():
-            table_alias_map['e'] = table_name
-            table_alias_map['emp'] = table_name
-        elif 'departments' in table_name.lower():
-            table_alias_map['d'] = table_name
-            table_alias_map['dept'] = table_name
-        elif 'temp' in table_name.lower():
-            table_alias_map['t'] = table_name
-    
-    for join_cond in result.conditions_and_logic.join_conditions:
-<<<<<<< HEAD
-        # 将别名转换为实际表名
-        left_table = alias_to_table_map.get(join_cond.left_table.lower(), join_cond.left_table)
-        right_table = alias_to_table_map.get(join_cond.right_table.lower(), join_cond.right_table)
         
-        edges.append({
-            "id": f"join_{left_table}_{right_table}",
-            "source": f"table_{left_table}",
-            "target": f"table_{right_table}",
-            "type": "join_condition",
-            "label": f"{join_cond.join_type} JOIN",
-            "data": {
-                "left_field": join_cond.left_field,
-                "right_field": join_cond.right_field,
-                "condition": join_cond.condition_text
-            }
-        })
-=======
-        # 解析表名，优先使用映射，如果没有则使用原名
-        left_table = table_alias_map.get(join_cond.left_table, join_cond.left_table)
-        right_table = table_alias_map.get(join_cond.right_table, join_cond.right_table)
-        
-        # 确保两个表都存在于节点列表中
-        left_node_id = f"table_{left_table}"
-        right_node_id = f"table_{right_table}"
-        
-        # 检查节点是否存在
-        node_ids = {node["id"] for node in nodes}
-        if left_node_id in node_ids and right_node_id in node_ids:
+        # 添加JOIN条件边：两端的表节点都存在时才建边
+        for join_index, join_cond in enumerate(stmt.join_conditions):
+            left_node_id = f"table_{join_cond.left_table}"
+            right_node_id = f"table_{join_cond.right_table}"
+            if left_node_id not in node_index or right_node_id not in node_index:
+                logger.warning(f"跳过JOIN条件：找不到表节点 {join_cond.left_table} 或 {join_cond.right_table}")
+                continue
             edges.append({
-                "id": f"join_{left_table}_{right_table}",
+                "id": f"join_{statement_id}_{join_index}_{join_cond.left_table}_{join_cond.right_table}",
                 "source": left_node_id,
                 "target": right_node_id,
                 "type": "join_condition",
                 "label": f"{join_cond.join_type} JOIN",
                 "data": {
+                    "statement_id": statement_id,
                     "left_field": join_cond.left_field,
                     "right_field": join_cond.right_field,
                     "condition": join_cond.condition_text,
-                    "left_table_alias": join_cond.left_table,
-                    "right_table_alias": join_cond.right_table
+                    "left_table_alias": join_cond.left_alias or join_cond.left_table,
+                    "right_table_alias": join_cond.right_alias or join_cond.right_table,
+                    "syntax": join_cond.syntax
                 }
             })
-        else:
-            # 记录警告，但不创建边
-            logger.warning(f"跳过JOIN条件：找不到表节点 {left_table} 或 {right_table}")
-            logger.warning(f"可用节点: {[node['id'] for node in nodes]}")
->>>>>>> origin/dev
+    
+    # 合并后的边：ID由类型与两端节点确定，数据流边的标签为涉及的语句类型
+    if aggregator is not None:
+        for edge in aggregator:
+            prefix = "flow" if edge.type == "data_flow" else "param"
+            edges.append({
+                "id": f"{prefix}_{edge.source}_{edge.target}",
+                "source": edge.source,
+                "target": edge.target,
+                "type": edge.type,
+                "label": "/".join(edge.statement_types) if edge.type == "data_flow" else "uses",
+                "data": edge.to_data()
+            })
     
     return {
         "nodes": nodes,
@@ -437,6 +870,7 @@ def convert_to_visualization_data(result) -> Dict[str, Any]:
         "metadata": {
             "node_count": len(nodes),
             "edge_count": len(edges),
+            "aggregated": aggregate_edges,
             "generated_at": "2024-12-07"
         }
     }
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import importlib.util
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+# src/main.py 与 backend/main.py 同名，worker 进程中同样按文件路径加载
+SRC_MAIN_PATH = Path(__file__).parent.parent.parent / "src" / "main.py"
+
+# 每个worker进程内的分析器实例（线程模式下为本进程内所有线程共享的实例）
+_worker_analyzer = None
+
+
+def _init_worker(src_main_path: str):
+    """worker进程初始化：加载并创建分析器"""
+    global _worker_analyzer
+    spec = importlib.util.spec_from_file_location("src_main", src_main_path)
+    src_main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(src_main)
+    # 池中的分析不生成可视化数据文件，也不在worker中输出进度
+    _worker_analyzer = src_main.OracleSPAnalyzer(visualize=False)
+
+
+def _analyze_in_worker(sp_text: str):
+    """在worker进程中执行分析"""
+    return _worker_analyzer.analyze(sp_text)
+
+
+class AnalysisPoolBusy(Exception):
+    """分析任务已达到排队上限"""
+
+
+class AnalysisPool:
+    """
+    存储过程分析进程池
+
+    分析是CPU密集型任务，默认放在独立进程中执行以免阻塞事件循环，也不受GIL限制。
+    分析流程本身无状态、可重入，executor 为 "thread" 时改用线程池，
+    所有线程共享同一个分析器实例。
+    同时运行与排队的任务总数不超过 max_workers + max_queue，超出时立即拒绝。
+    """
+
+    # 批量任务等待空闲名额时的轮询间隔（秒）
+    BATCH_RETRY_INTERVAL = 0.05
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: Optional[float],
+                 start_method: str = "spawn", executor: str = "process"):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"不支持的执行器类型: {executor}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.start_method = start_method
+        self.executor = executor
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._capacity = max_workers + max_queue
+        self._slots = threading.BoundedSemaphore(self._capacity)
+        self._futures: Set[Future] = set()   # 已提交且尚未结束的任务，关闭时取消其中未开始的
+        self._counter_lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_config(cls, config) -> "AnalysisPool":
+        """根据配置中的 analysis.* 与 parser.timeout 创建进程池"""
+        pool_config = config.get_analysis_pool_config()
+        return cls(
+            max_workers=pool_config['max_workers'],
+            max_queue=pool_config['max_queue'],
+            timeout=pool_config['timeout'],
+            start_method=pool_config['start_method'],
+            executor=pool_config['executor']
+        )
+
+    def _get_executor(self) -> Executor:
+        """延迟创建进程池，首个请求到达时才启动worker"""
+        with self._executor_lock:
+            if self._executor is None and self.executor == "thread":
+                if _worker_analyzer is None:
+                    _init_worker(str(SRC_MAIN_PATH))
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="analysis"
+                )
+            elif self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(str(SRC_MAIN_PATH),)
+                )
+            return self._executor
+
+    def _acquire_slot(self, blocking: bool) -> bool:
+        if not self._slots.acquire(blocking=blocking):
+            return False
+        with self._counter_lock:
+            self.in_flight += 1
+        return True
+
+    def _release_slot(self, future: Optional[Future]):
+        with self._counter_lock:
+            self.in_flight -= 1
+            self._futures.discard(future)
+        self._slots.release()
+
+    def _submit(self, sp_text: str) -> Future:
+        """提交任务（调用方已占用名额），名额在任务真正结束时释放"""
+        try:
+            future = self._get_executor().submit(_analyze_in_worker, sp_text)
+        except BrokenProcessPool:
+            # worker异常退出后进程池不可再用，重建后重试一次
+            self._reset_executor()
+            try:
+                future = self._get_executor().submit(_analyze_in_worker, sp_text)
+            except BaseException:
+                self._release_slot(None)
+                raise
+        except BaseException:
+            self._release_slot(None)
+            raise
+
+        # 超时返回的请求不会让排队上限失效
+        with self._counter_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._release_slot)
+        return future
+
+    async def _wait(self, future: Future):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    async def analyze(self, sp_text: str):
+        """
+        提交分析任务并等待结果
+
+        Raises:
+            AnalysisPoolBusy: 运行与排队的任务已满
+            asyncio.TimeoutError: 超过 timeout 秒仍未完成
+        """
+        if not self._acquire_slot(blocking=False):
+            self.rejected += 1
+            raise AnalysisPoolBusy()
+        return await self._wait(self._submit(sp_text))
+
+    def run(self, sp_text: str):
+        """
+        同步提交分析任务并等待结果，供后台工作线程调用
+
+        与 analyze 不同，排队已满时阻塞等待空闲名额而不是拒绝。
+
+        Raises:
+            concurrent.futures.TimeoutError: 超过 timeout 秒仍未完成
+        """
+        self._acquire_slot(blocking=True)
+        future = self._submit(sp_text)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            self.timed_out += 1
+            future.cancel()
+            raise
+
+    async def analyze_many(self, sp_texts: Iterable[str]) -> AsyncIterator[Tuple[int, Any, Optional[BaseException]]]:
+        """
+        批量分析，按完成顺序产出 (序号, 结果, 异常)
+
+        批量任务不会因排队已满而被拒绝，而是等待名额；同一批次同时在途的任务
+        不超过 max_workers 个，既能占满所有worker，又不会挤占单个请求的排队名额。
+        迭代提前结束（如客户端断开）时取消尚未完成的任务。
+        """
+        async def run(index: int, future: Future):
+            try:
+                return index, await self._wait(future), None
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                return index, None, e
+
+        pending = set()
+        try:
+            for index, sp_text in enumerate(sp_texts):
+                while len(pending) >= self.max_workers or not self._acquire_slot(blocking=False):
+                    if pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            yield task.result()
+                    else:
+                        await asyncio.sleep(self.BATCH_RETRY_INTERVAL)
+                pending.add(asyncio.ensure_future(run(index, self._submit(sp_text))))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _shutdown_executor(self, wait: bool):
+        """
+        关闭当前进程池（调用方持有 _executor_lock）
+
+        先逐个取消尚未开始的任务再关闭，效果同 Python 3.9+ 的
+        shutdown(cancel_futures=True)，在 3.8 上同样可用。
+        """
+        if self._executor is None:
+            return
+        with self._counter_lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=wait)
+        self._executor = None
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            self._shutdown_executor(wait=False)
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._executor_lock:
+            self._shutdown_executor(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取进程池统计信息"""
+        return {
+            'executor': self.executor,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'timeout': self.timeout,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分析响应的紧凑传输格式（format=compact）
+
+标准响应中大量重复表名、字段名、语句类型等字符串，记录列表逐条重复键名。紧凑格式：
+  - 所有重复出现的字符串放入顶层 strings 字符串表，按下标引用
+  - 记录列表（参数、语句、连接条件、节点、边、表）按列存储，键名只出现一次
+  - 边不带 id，边在各列中的下标即其标识
+
+列的编码方式由 kind 给出，客户端无需预先知道结构即可还原：
+  - "str":   值为字符串表下标（null 保持 null）
+  - "str[]": 值为字符串表下标列表
+  - "raw":   值按原样保存
+列名中的 "." 表示嵌套字段，如 "data.statement_id" 还原为 record["data"]["statement_id"]。
+"""
+
+from itertools import chain, repeat
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FORMAT_NAME = "compact/1"
+
+
+class StringTable:
+    """字符串表：相同字符串只保存一次"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    @property
+    def lookup(self):
+        """已登记字符串 -> 下标的查找函数（C层的字典取值，可直接用于 map）"""
+        return self._index.__getitem__
+
+    def intern_column(self, values: List[Optional[str]], distinct: Iterable[str]) -> List[Optional[int]]:
+        """
+        将一列字符串转换为下标（null 保持 null）
+
+        distinct 为列中不重复的字符串（按首次出现的顺序），先逐个登记，
+        再在C层对整列做字典查找，不为每个值调用一次 intern。
+        """
+        for value in distinct:
+            self.intern(value)
+        lookup = self.lookup
+        if None in values:
+            return [None if value is None else lookup(value) for value in values]
+        return list(map(lookup, values))
+
+
+_STRING_TYPES = {str, type(None)}
+
+
+def _column_names(records: List[Dict[str, Any]]) -> Tuple[List[str], set]:
+    """
+    所有记录中出现过的键（按首次出现的顺序）以及每条记录都有的键
+
+    按键的组合去重后合并，不逐条记录合并键集合。
+    """
+    names: Dict[str, None] = {}
+    common: Optional[set] = None
+    for shape in dict.fromkeys(map(tuple, records)):
+        names.update(dict.fromkeys(shape))
+        common = set(shape) if common is None else common.intersection(shape)
+    return list(names), common or set()
+
+
+def _column_values(records: List[Dict[str, Any]], name: str, common: set) -> List[Any]:
+    """取出一列的值，缺少的键为 null；取值在C层完成，不逐条执行字节码"""
+    if name in common:
+        return list(map(itemgetter(name), records))
+    return list(map(dict.get, records, repeat(name)))
+
+
+def _columns(records: List[Dict[str, Any]], nested: Tuple[str, ...],
+             omit: Tuple[str, ...]) -> List[Tuple[str, List[Any]]]:
+    """按列取出记录的值，nested 中值全为字典的列展开为 "键.子键" 列"""
+    columns = []
+    names, common = _column_names(records)
+    for name in names:
+        if name in omit:
+            continue
+        values = _column_values(records, name, common)
+        if name in nested and set(map(type, values)) == {dict}:
+            sub_names, sub_common = _column_names(values)
+            for sub_name in sub_names:
+                columns.append((f"{name}.{sub_name}", _column_values(values, sub_name, sub_common)))
+        else:
+            columns.append((name, values))
+    return columns
+
+
+def _encode_column(values: List[Any], strings: StringTable) -> Tuple[str, List[Any]]:
+    """
+    确定列的编码方式并编码：只有存在重复时字符串才值得放入字符串表
+
+    Returns:
+        (kind, 编码后的值)
+    """
+    types = set(map(type, values))
+    if types <= _STRING_TYPES and str in types:
+        distinct = dict.fromkeys(values)
+        distinct.pop(None, None)
+        if len(distinct) < len(values) - values.count(None):
+            return "str", strings.intern_column(values, distinct)
+        return "raw", values
+    if types <= {list, type(None)} and list in types:
+        present = [value for value in values if value is not None]
+        items = dict.fromkeys(chain.from_iterable(present))
+        if set(map(type, items)) <= {str}:
+            strings.intern_column([], items)
+            lookup = strings.lookup
+            return "str[]", [None if value is None else list(map(lookup, value)) for value in values]
+    return "raw", values
+
+
+def encode_records(records: List[Dict[str, Any]], strings: StringTable,
+                   nested: Tuple[str, ...] = ("data",), omit: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """
+    将记录列表编码为列存储
+
+    Args:
+        records: 字典列表，各记录的键可以不同（缺少的键记为 null）
+        strings: 共享的字符串表
+        nested: 值为字典时展开为 "键.子键" 列的键
+        omit: 不输出的键
+    """
+    encoded = []
+    for name, values in _columns(records, nested, omit):
+        kind, values = _encode_column(values, strings)
+        encoded.append({"name": name, "kind": kind, "values": values})
+    return {"length": len(records), "columns": encoded}
+
+
+def _encode_table_map(tables: Dict[str, Dict[str, Any]], strings: StringTable) -> Dict[str, Any]:
+    """{表名: {...}} 编码为带 name 列的列存储"""
+    return encode_records([{"name": name, **table} for name, table in tables.items()], strings)
+
+
+def to_compact(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """将标准分析响应（build_analyze_response 的内容）转换为紧凑格式"""
+    strings = StringTable()
+    compact: Dict[str, Any] = {
+        key: value for key, value in payload.items() if key not in ("data", "visualization")
+    }
+    compact["format"] = FORMAT_NAME
+
+    data: Optional[Dict[str, Any]] = payload.get("data")
+    if data is not None:
+        compact_data = dict(data)
+        for key in ("parameters", "sql_statements", "join_conditions"):
+            compact_data[key] = encode_records(data[key], strings)
+        compact_data["tables"] = {
+            kind: _encode_table_map(tables, strings) for kind, tables in data["tables"].items()
+        }
+        compact["data"] = compact_data
+
+    visualization: Optional[Dict[str, Any]] = payload.get("visualization")
+    if visualization is not None:
+        compact_visualization = dict(visualization)
+        compact_visualization["nodes"] = encode_records(visualization["nodes"], strings)
+        compact_visualization["edges"] = encode_records(visualization["edges"], strings, omit=("id",))
+        compact["visualization"] = compact_visualization
+
+    compact["strings"] = strings.strings
+    return compact
+
+
+def decode_records(encoded: Dict[str, Any], strings: List[str]) -> List[Dict[str, Any]]:
+    """encode_records 的逆过程（供客户端参考与测试使用）；值为 null 的列不写入记录"""
+    records: List[Dict[str, Any]] = [{} for _ in range(encoded["length"])]
+    for column in encoded["columns"]:
+        path = column["name"].split(".")
+        kind = column["kind"]
+        for record, value in zip(records, column["values"]):
+            if value is None:
+                continue
+            if kind == "str":
+                value = strings[value]
+            elif kind == "str[]":
+                value = [strings[item] for item in value]
+            target = record
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return records
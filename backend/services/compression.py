@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# 不小于该长度的响应体块在工作线程中压缩，避免阻塞事件循环；小块直接压缩，省去线程切换的开销
+BROTLI_THREAD_THRESHOLD = 64 * 1024
+
+
+def _load_brotli():
+    """brotli 为可选依赖，未安装时只协商 gzip"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """解析 Accept-Encoding 请求头，返回 {编码: q值}（q=0 表示明确拒绝）"""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """
+    按 q 值选择响应编码："br"、"gzip" 或 None（不压缩）
+
+    q 值相同时优先 brotli；未列出的编码按 "*" 的 q 值处理，没有 "*" 时视为不接受。
+    """
+    encodings = accepted_encodings(accept_encoding)
+    default = encodings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli_available else ["gzip"]
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = encodings.get(name, default)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 协商响应压缩
+
+    按 Accept-Encoding 中的 q 值在 br（需安装 brotli，同等速度下比 gzip 更小）与 gzip
+    之间选择，gzip 交给 Starlette 的 GZipMiddleware；两者都不接受时原样返回。
+    小于 minimum_size 的响应与已带 Content-Encoding 的响应不压缩；
+    流式响应（如批量分析的NDJSON）逐块压缩并立即刷出。brotli 压缩大块响应体时在
+    工作线程中进行（见 BROTLI_THREAD_THRESHOLD）。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 5, thread_threshold: int = BROTLI_THREAD_THRESHOLD):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.thread_threshold = thread_threshold
+        self.brotli = _load_brotli()
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""), self.brotli is not None)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.brotli, self.minimum_size, self.brotli_quality,
+                                        self.thread_threshold)
+            await responder(scope, receive, send)
+        elif encoding == "gzip":
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+class BrotliResponder:
+    """单个请求的 brotli 压缩"""
+
+    def __init__(self, app: ASGIApp, brotli, minimum_size: int, quality: int,
+                 thread_threshold: int = BROTLI_THREAD_THRESHOLD):
+        self.app = app
+        self.brotli = brotli
+        self.minimum_size = minimum_size
+        self.quality = quality
+        self.thread_threshold = thread_threshold
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # 响应头要等到看见第一块响应体、确定是否压缩后再发送
+            self.start_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start_message)
+                self.start_message = None
+                await self.send(message)
+                self.passthrough = True
+                return
+            self.compressor = self.brotli.Compressor(quality=self.quality)
+            compressed = await self._compress(body, more_body)
+            headers["Content-Encoding"] = "br"
+            if more_body:
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start_message)
+            self.start_message = None
+        else:
+            compressed = await self._compress(body, more_body)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        """压缩一块响应体，大块在工作线程中压缩（各块依次等待，压缩器不会被并发使用）"""
+        if len(body) >= self.thread_threshold:
+            return await anyio.to_thread.run_sync(self._compress_chunk, body, more_body)
+        return self._compress_chunk(body, more_body)
+
+    def _compress_chunk(self, body: bytes, more_body: bool) -> bytes:
+        """压缩一块响应体：流式响应的中间块刷出已压缩的数据，最后一块结束压缩流"""
+        compressed = self.compressor.process(body)
+        return compressed + (self.compressor.flush() if more_body else self.compressor.finish())
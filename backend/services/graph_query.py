@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+
+class GraphIndex:
+    """
+    可视化图的邻接索引
+
+    对 convert_to_visualization_data 生成的 nodes/edges 建立按节点ID的邻接表，
+    子图查询只遍历焦点节点附近的边，不扫描整个图。
+    """
+
+    def __init__(self, graph: Dict[str, Any]):
+        self.nodes: Dict[str, Dict[str, Any]] = {node["id"]: node for node in graph["nodes"]}
+        self.edges: List[Dict[str, Any]] = graph["edges"]
+        self.adjacency: Dict[str, List[int]] = {node_id: [] for node_id in self.nodes}
+        for position, edge in enumerate(self.edges):
+            source, target = edge["source"], edge["target"]
+            if source in self.adjacency:
+                self.adjacency[source].append(position)
+            if target != source and target in self.adjacency:
+                self.adjacency[target].append(position)
+
+    def resolve_node(self, name: str) -> Optional[str]:
+        """将节点ID或表名/参数名解析为节点ID"""
+        for node_id in (name, f"table_{name}", f"param_{name}"):
+            if node_id in self.nodes:
+                return node_id
+        return None
+
+    def query(self, focus: Optional[str] = None, depth: int = 1,
+              edge_types: Optional[Set[str]] = None, node_types: Optional[Set[str]] = None,
+              offset: int = 0, limit: int = 200) -> Dict[str, Any]:
+        """
+        查询子图并分页
+
+        Args:
+            focus: 焦点节点ID；为 None 时查询整个图
+            depth: 从焦点出发的跳数（不区分边的方向）
+            edge_types: 只保留这些类型的边，None 表示不过滤
+            node_types: 只保留这些类型的节点（焦点节点始终保留），None 表示不过滤
+            offset, limit: 节点分页，焦点查询按距离排序，否则按图中的顺序
+
+        每条边只出现在其两个端点中较晚出现的那个所在的页上，
+        按顺序拼接所有页即得到完整的子图，边不会重复。
+        """
+        def edge_allowed(edge: Dict[str, Any]) -> bool:
+            return edge_types is None or edge["type"] in edge_types
+
+        def node_allowed(node_id: str) -> bool:
+            return node_types is None or self.nodes[node_id]["type"] in node_types
+
+        if focus is None:
+            order = [node_id for node_id in self.nodes if node_allowed(node_id)]
+        else:
+            order = self._neighbourhood(focus, depth, edge_allowed, node_allowed)
+
+        rank = {node_id: position for position, node_id in enumerate(order)}
+        page_end = offset + limit
+        page_edges = []
+        total_edges = 0
+        for position, node_id in enumerate(order):
+            for edge_position in self.adjacency[node_id]:
+                edge = self.edges[edge_position]
+                other = edge["target"] if edge["source"] == node_id else edge["source"]
+                if not edge_allowed(edge) or rank.get(other, position + 1) > position:
+                    continue
+                total_edges += 1
+                if offset <= position < page_end:
+                    page_edges.append(edge)
+
+        return {
+            "nodes": [self.nodes[node_id] for node_id in order[offset:page_end]],
+            "edges": page_edges,
+            "page": {
+                "offset": offset,
+                "limit": limit,
+                "total_nodes": len(order),
+                "total_edges": total_edges,
+                "next_offset": page_end if page_end < len(order) else None
+            }
+        }
+
+    def _neighbourhood(self, focus: str, depth: int, edge_allowed: Callable,
+                       node_allowed: Callable) -> List[str]:
+        """从焦点出发按广度优先收集 depth 跳以内的节点"""
+        order = [focus]
+        seen = {focus}
+        frontier = [focus]
+        for _ in range(depth):
+            next_frontier = []
+            for node_id in frontier:
+                for edge_position in self.adjacency[node_id]:
+                    edge = self.edges[edge_position]
+                    if not edge_allowed(edge):
+                        continue
+                    other = edge["target"] if edge["source"] == node_id else edge["source"]
+                    if other in seen or other not in self.nodes or not node_allowed(other):
+                        continue
+                    seen.add(other)
+                    order.append(other)
+                    next_frontier.append(other)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return order
+
+
+class StoredAnalysis:
+    """
+    保存的分析结果，供图查询接口按需取用
+
+    可视化图及其索引在首次查询时按边的合并模式分别构建，之后的查询直接复用。
+    """
+
+    def __init__(self, result, build_graph: Callable[[Any, bool], Dict[str, Any]]):
+        """
+        Args:
+            result: 存储过程分析结果
+            build_graph: 由分析结果生成可视化图的函数，参数为 (result, aggregate_edges)
+        """
+        self.result = result
+        self._build_graph = build_graph
+        self._indexes: Dict[bool, GraphIndex] = {}
+        self._statements: Optional[Dict[int, Any]] = None
+        self._lock = threading.Lock()
+
+    def graph(self, aggregate_edges: bool) -> GraphIndex:
+        with self._lock:
+            index = self._indexes.get(aggregate_edges)
+            if index is None:
+                index = self._indexes[aggregate_edges] = GraphIndex(self._build_graph(self.result, aggregate_edges))
+            return index
+
+    def statements(self, ids: Optional[Iterable[int]] = None) -> List[Any]:
+        """按语句ID取语句（忽略不存在的ID），未指定时返回全部语句"""
+        sql_statements = self.result.sp_structure.sql_statements
+        if ids is None:
+            return list(sql_statements)
+        if self._statements is None:
+            self._statements = {stmt.statement_id: stmt for stmt in sql_statements}
+        return [self._statements[i] for i in ids if i in self._statements]
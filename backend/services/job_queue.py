@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """排队中的任务已达到上限"""
+
+
+class AnalysisJob:
+    """一次异步分析任务"""
+
+    def __init__(self, sp_text: Optional[str], sequence: int = -1):
+        self.id = uuid.uuid4().hex
+        self.status = JOB_QUEUED
+        self.sequence = sequence  # 入队序号，用于计算排队位置
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self._sp_text = sp_text  # 开始执行后即释放
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueue:
+    """
+    进程内异步分析任务队列
+
+    任务提交后立即返回任务ID，由后台工作线程按提交顺序取出并执行；
+    客户端通过任务ID轮询状态并获取结果，无需保持长连接。
+    已完成的任务在 result_ttl 秒后被清理。
+    """
+
+    def __init__(self, run: Callable[[str], Any], workers: int,
+                 max_pending: int = 100, result_ttl: float = 3600):
+        """
+        Args:
+            run: 执行单次分析的函数，在工作线程中调用
+            workers: 工作线程数
+            max_pending: 排队中的任务上限
+            result_ttl: 已完成任务的保留时间（秒）
+        """
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[AnalysisJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._submitted = 0  # 已入队任务数
+        self._dequeued = 0   # 已被工作线程取出的任务数
+
+    @classmethod
+    def from_config(cls, config, run: Callable[[str], Any], workers: int) -> "JobQueue":
+        """根据配置中的 jobs.* 创建任务队列"""
+        jobs_config = config.get_jobs_config()
+        return cls(run, workers,
+                   max_pending=jobs_config['max_pending'],
+                   result_ttl=jobs_config['result_ttl'])
+
+    def _ensure_workers(self):
+        """延迟启动工作线程，首个任务提交时才创建"""
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"analysis-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, sp_text: str) -> AnalysisJob:
+        """
+        提交分析任务
+
+        Raises:
+            JobQueueFull: 排队中的任务已达到上限
+        """
+        with self._lock:
+            self._prune()
+            if self._submitted - self._dequeued >= self.max_pending:
+                raise JobQueueFull()
+            job = AnalysisJob(sp_text, self._submitted)
+            self._submitted += 1
+            self._jobs[job.id] = job
+            self._ensure_workers()
+        self._queue.put(job)
+        return job
+
+    def complete(self, result: Any) -> AnalysisJob:
+        """登记一个已有结果（如缓存命中）的任务，不进入队列"""
+        job = AnalysisJob(None)
+        job.status = JOB_SUCCEEDED
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """按ID获取任务，不存在或已过期时返回 None"""
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job: AnalysisJob) -> Optional[int]:
+        """排队中的任务前面还有多少个任务，非排队状态返回 None"""
+        if job.status != JOB_QUEUED:
+            return None
+        return max(job.sequence - self._dequeued, 0)
+
+    def _prune(self):
+        """清理过期的已完成任务（调用方持有锁）"""
+        if self.result_ttl is None:
+            return
+        deadline = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        """工作线程：按提交顺序执行任务"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._dequeued += 1
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                sp_text, job._sp_text = job._sp_text, None
+            try:
+                result, error = self.run(sp_text), None
+            except Exception as e:
+                result, error = None, str(e) or type(e).__name__
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.finished_at = time.time()
+                job.status = JOB_SUCCEEDED if error is None else JOB_FAILED
+
+    def shutdown(self):
+        """停止工作线程，排队中的任务不再执行（正在执行的任务由分析进程池的关闭处理）"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        """获取任务队列统计信息"""
+        with self._lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'result_ttl': self.result_ttl,
+            **counts,
+        }
@@ -142,6 +142,8 @@ api_requires = [
     "fastapi[all]>=0.100.0",
     "uvicorn[standard]>=0.20.0",
     "python-multipart>=0.0.5",
+    "orjson>=3.8.0",  # 可选：分析响应的快速JSON编码，未安装时使用标准库 json
+    "brotli>=1.0.9",  # 可选：客户端接受 br 时的响应压缩，未安装时只协商 gzip
 ]
 
 # 获取所有Python包
@@ -239,7 +241,7 @@ setup(
     entry_points={
         "console_scripts": [
             # 主程序入口
-            "oracle-sp-parser=main:main",
+            "oracle-sp-parser=oracle_sp_parser:main",
             
             # Web服务入口  
             "oracle-sp-backend=backend.main:start_server",
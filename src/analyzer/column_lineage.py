@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+字段级血缘引擎
+
+对 INSERT ... SELECT/VALUES、UPDATE ... SET、MERGE 与 CREATE TABLE ... AS SELECT，
+把每个目标列按位置对应到 SELECT 列表（或 SET/VALUES）中的表达式，并找出该表达式
+依赖的源列。列引用通过每个查询块的 FROM 子句解析别名；子查询、内联视图与 WITH
+公用表表达式的输出列递归展开为其底层的源列。无法确定所属表的列（多表查询中
+未加限定的列名）不猜测，直接忽略。
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from models.data_models import FieldLineage
+from parser.plsql_lexer import Token, TokenType, iter_tokens, tokenize, find_matching_paren
+from parser.sql_clauses import (
+    TableRef, column_list, find_top_level, find_top_level_punct, identifier, is_identifier,
+    is_query_start, parse_query, read_table_ref, split_top_level, strip_parens
+)
+from parser.symbol_resolver import symbol_key
+
+ColumnRef = Tuple[str, str]  # (表名, 列名)
+
+class ColumnMapping(NamedTuple):
+    """一个目标列在一条语句中的来源"""
+    target: ColumnRef
+    expression: str
+    sources: List[ColumnRef]
+
+class QueryOutputs(NamedTuple):
+    """查询的输出列（按位置），集合运算各分支的来源按位置合并"""
+    names: List[Optional[str]]
+    expressions: List[str]
+    sources: List[List[ColumnRef]]
+
+# 表达式中不是列引用的关键字、伪列与内置常量
+_EXPRESSION_KEYWORDS = frozenset((
+    'CASE', 'WHEN', 'THEN', 'ELSE', 'END', 'AND', 'OR', 'NOT', 'NULL', 'IS', 'IN', 'LIKE',
+    'ESCAPE', 'BETWEEN', 'EXISTS', 'DISTINCT', 'UNIQUE', 'ALL', 'ANY', 'SOME', 'AS', 'FROM',
+    'BY', 'OVER', 'PARTITION', 'ORDER', 'ASC', 'DESC', 'NULLS', 'FIRST', 'LAST', 'ROWS',
+    'RANGE', 'UNBOUNDED', 'PRECEDING', 'FOLLOWING', 'CURRENT', 'ROW', 'KEEP', 'WITHIN',
+    'GROUP', 'PRIOR', 'LEVEL', 'ROWNUM', 'ROWID', 'SYSDATE', 'SYSTIMESTAMP', 'CURRENT_DATE',
+    'CURRENT_TIMESTAMP', 'LOCALTIMESTAMP', 'USER', 'UID', 'TRUE', 'FALSE', 'DATE', 'TIMESTAMP',
+    'INTERVAL', 'YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND', 'TO', 'LEADING',
+    'TRAILING', 'BOTH', 'DEFAULT', 'SQL', 'NUMBER', 'INTEGER', 'VARCHAR2', 'CHAR', 'CLOB',
+))
+
+# 语句首个关键字 -> 处理方法
+_HANDLERS = {'INSERT': '_insert', 'UPDATE': '_update', 'MERGE': '_merge', 'CREATE': '_create'}
+
+class _Scope:
+    """一个查询块（或DML语句）的名称解析作用域"""
+
+    def __init__(self, tables: List[TableRef], ctes: Dict[str, Tuple[int, int]],
+                 parent: Optional["_Scope"] = None):
+        self.tables = tables
+        self.ctes = ctes
+        self.parent = parent
+        self.by_name: Dict[str, TableRef] = {}
+        for ref in tables:
+            if ref.alias:
+                self.by_name[symbol_key(ref.alias)] = ref
+            elif ref.name:
+                # 没有别名时可以用表名（含或不含模式名）限定列
+                self.by_name.setdefault(symbol_key(ref.name), ref)
+                self.by_name.setdefault(symbol_key(ref.name.rsplit('.', 1)[-1]), ref)
+
+class _LineageResolver:
+    """单条语句的血缘解析，子查询的输出列按token范围缓存"""
+
+    def __init__(self, sql_text: str, tokens: List[Token], excluded: Set[str]):
+        self.sql_text = sql_text
+        self.tokens = tokens
+        self.excluded = excluded  # 语句中引用的参数与变量（查找键），不是列
+        self._outputs: Dict[Tuple[int, int], QueryOutputs] = {}
+        self._derived: Dict[Tuple[int, int], Dict[str, List[ColumnRef]]] = {}
+
+    def text(self, start: int, end: int) -> str:
+        return self.sql_text[self.tokens[start].start:self.tokens[end - 1].end] if end > start else ''
+
+    # ---- 列引用解析 ----
+
+    def expression_sources(self, start: int, end: int, scope: _Scope) -> List[ColumnRef]:
+        """找出 tokens[start:end] 表达式依赖的源列（去重，保持出现顺序）"""
+        tokens = self.tokens
+        sources: Dict[Tuple[str, str], ColumnRef] = {}
+        i = start
+        while i < end:
+            tok = tokens[i]
+            if tok.is_punct('(') and is_query_start(tokens, i + 1, end):
+                # 标量子查询：可以引用外层作用域的列
+                close = find_matching_paren(tokens, i)
+                close = end if close is None or close > end else close
+                for refs in self.query_outputs(i + 1, close, scope, scope.ctes).sources:
+                    for ref in refs:
+                        sources.setdefault((ref[0].upper(), ref[1].upper()), ref)
+                i = close + 1
+                continue
+            if not is_identifier(tok):
+                i += 1
+                continue
+
+            # 限定名 a.b.c
+            j = i
+            while j + 2 < end and tokens[j + 1].is_punct('.') \
+                    and (is_identifier(tokens[j + 2]) or tokens[j + 2].is_punct('*')):
+                j += 2
+            following = tokens[j + 1] if j + 1 < end else None
+            # 函数调用、命名参数、SQL%ROWCOUNT 之类的属性
+            if following is None or not (following.is_punct('(') or following.is_punct('%')
+                                         or (following.type is TokenType.OPERATOR and following.value == '=>')):
+                for ref in self.resolve_column(scope, tokens[i:j + 1:2]):
+                    sources.setdefault((ref[0].upper(), ref[1].upper()), ref)
+            i = j + 1
+        return list(sources.values())
+
+    def resolve_column(self, scope: _Scope, parts: List[Token]) -> List[ColumnRef]:
+        """把列引用（可带限定名）解析为源列"""
+        column = parts[-1]
+        if not is_identifier(column):
+            return []
+        if len(parts) == 1:
+            if column.type is TokenType.WORD and column.norm in _EXPRESSION_KEYWORDS:
+                return []
+            if column.norm in self.excluded:
+                return []
+            return self._resolve_unqualified(scope, column)
+
+        if column.norm in ('NEXTVAL', 'CURRVAL'):
+            return []
+        if len(parts) == 2 and parts[0].norm in self.excluded:
+            return []  # 记录变量的字段
+        qualifier = '.'.join(tok.norm for tok in parts[:-1])
+        while scope is not None:
+            ref = scope.by_name.get(qualifier)
+            if ref is not None:
+                return self._ref_columns(scope, ref, column)
+            scope = scope.parent
+        return []
+
+    def _resolve_unqualified(self, scope: _Scope, column: Token) -> List[ColumnRef]:
+        """未限定的列名：从内向外查找唯一能提供该列的表"""
+        while scope is not None:
+            if len(scope.tables) == 1:
+                return self._ref_columns(scope, scope.tables[0], column)
+            for ref in scope.tables:
+                outputs = self._derived_columns(scope, ref)
+                if outputs is not None and column.norm in outputs:
+                    return outputs[column.norm]
+            if scope.tables:
+                return []  # 多表且无法确定所属表
+            scope = scope.parent
+        return []
+
+    def _ref_columns(self, scope: _Scope, ref: TableRef, column: Token) -> List[ColumnRef]:
+        outputs = self._derived_columns(scope, ref)
+        if outputs is None:
+            return [(ref.name, identifier(column))] if ref.name else []
+        return outputs.get(column.norm, [])
+
+    def _derived_columns(self, scope: _Scope, ref: TableRef) -> Optional[Dict[str, List[ColumnRef]]]:
+        """内联视图或公用表表达式的输出列 -> 源列；基表返回 None"""
+        if ref.query is not None:
+            query_range, parent = ref.query, scope.parent
+        elif ref.name and symbol_key(ref.name) in scope.ctes:
+            # 公用表表达式不能引用使用它的查询中的列
+            query_range, parent = scope.ctes[symbol_key(ref.name)], None
+        elif ref.name is None:
+            return {}
+        else:
+            return None
+
+        derived = self._derived.get(query_range)
+        if derived is None:
+            outputs = self.query_outputs(query_range[0], query_range[1], parent, scope.ctes)
+            derived = {symbol_key(name): sources for name, sources in zip(outputs.names, outputs.sources) if name}
+            self._derived[query_range] = derived
+        return derived
+
+    def query_outputs(self, start: int, end: int, parent: Optional[_Scope],
+                      ctes: Dict[str, Tuple[int, int]]) -> QueryOutputs:
+        """查询各输出列的名称、表达式与源列"""
+        key = (start, end)
+        cached = self._outputs.get(key)
+        if cached is not None:
+            return cached
+
+        # 先登记一个空结果，递归的公用表表达式引用自身时不会无限展开
+        self._outputs[key] = QueryOutputs([], [], [])
+        blocks, own_ctes = parse_query(self.tokens, start, end)
+        if own_ctes:
+            ctes = {**ctes, **own_ctes}
+        names: List[Optional[str]] = []
+        expressions: List[str] = []
+        sources: List[List[ColumnRef]] = []
+        for block_index, block in enumerate(blocks):
+            scope = _Scope(block.tables, ctes, parent)
+            for position, item in enumerate(block.items):
+                if item.star:
+                    break  # * 展开后的列未知，之后的位置无法对应
+                item_sources = self.expression_sources(item.start, item.end, scope)
+                if block_index == 0:
+                    names.append(item.name)
+                    expressions.append(self.text(item.start, item.end))
+                    sources.append(item_sources)
+                elif position < len(sources):
+                    sources[position] = _merge(sources[position], item_sources)
+
+        outputs = QueryOutputs(names, expressions, sources)
+        self._outputs[key] = outputs
+        return outputs
+
+    # ---- 语句 ----
+
+    def mappings(self) -> Iterable[ColumnMapping]:
+        handler = _HANDLERS.get(self.tokens[0].norm) if self.tokens else None
+        return getattr(self, handler)() if handler else ()
+
+    def _map_query(self, target: str, columns: Optional[List[str]], start: int, end: int) -> Iterable[ColumnMapping]:
+        """按位置把查询的输出列对应到目标列；未给出列列表时按输出列名对应"""
+        blocks, ctes = parse_query(self.tokens, start, end)
+        for block in blocks:
+            scope = _Scope(block.tables, ctes)
+            names = columns if columns is not None else [item.name for item in blocks[0].items]
+            for item, column in zip(block.items, names):
+                if item.star:
+                    break
+                if column:
+                    yield ColumnMapping((target, column), self.text(item.start, item.end),
+                                        self.expression_sources(item.start, item.end, scope))
+
+    def _map_values(self, target: str, columns: List[str], start: int, end: int,
+                    scope: _Scope) -> Iterable[ColumnMapping]:
+        """VALUES (表达式, ...) 按位置对应到目标列，start 为 VALUES 之后的左括号"""
+        close = find_matching_paren(self.tokens, start)
+        if close is None:
+            return
+        for (expr_start, expr_end), column in zip(split_top_level(self.tokens, start + 1, close), columns):
+            yield ColumnMapping((target, column), self.text(expr_start, expr_end),
+                                self.expression_sources(expr_start, expr_end, scope))
+
+    def _map_assignments(self, target: str, start: int, end: int, scope: _Scope) -> Iterable[ColumnMapping]:
+        """SET 列 = 表达式, (列1, 列2) = (子查询), ..."""
+        tokens = self.tokens
+        for part_start, part_end in split_top_level(tokens, start, end):
+            eq = find_top_level_punct(tokens, part_start, part_end, '=')
+            if eq >= part_end or eq == part_start:
+                continue
+            if tokens[part_start].is_punct('('):
+                # (c1, c2) = (SELECT a, b FROM ...)
+                close = find_matching_paren(tokens, part_start)
+                if close is None or close >= eq:
+                    continue
+                columns = column_list(tokens, part_start + 1, close)
+                query_start, query_end = strip_parens(tokens, eq + 1, part_end)
+                outputs = self.query_outputs(query_start, query_end, scope, scope.ctes)
+                for column, expression, sources in zip(columns, outputs.expressions, outputs.sources):
+                    yield ColumnMapping((target, column), expression, sources)
+            elif is_identifier(tokens[eq - 1]):
+                yield ColumnMapping((target, identifier(tokens[eq - 1])), self.text(eq + 1, part_end),
+                                    self.expression_sources(eq + 1, part_end, scope))
+
+    def _insert(self) -> Iterable[ColumnMapping]:
+        """INSERT INTO 表 [别名] [(列, ...)] {VALUES (...) | 查询}"""
+        tokens, n = self.tokens, len(self.tokens)
+        if n < 3 or not tokens[1].is_word('INTO'):
+            return  # 多表插入 INSERT ALL/FIRST 暂不支持
+        ref, i = read_table_ref(tokens, 2, n)
+        if ref is None or ref.name is None:
+            return
+
+        columns = None
+        if i < n and tokens[i].is_punct('(') and not is_query_start(tokens, i, n):
+            close = find_matching_paren(tokens, i)
+            if close is None:
+                return
+            columns = column_list(tokens, i + 1, close)
+            i = close + 1
+
+        end = find_top_level(tokens, i, n, 'RETURNING', 'RETURN', 'LOG')
+        if i < end and tokens[i].is_word('VALUES'):
+            if columns and i + 1 < end and tokens[i + 1].is_punct('('):
+                yield from self._map_values(ref.name, columns, i + 1, end, _Scope([], {}))
+        elif is_query_start(tokens, i, end):
+            yield from self._map_query(ref.name, columns, i, end)
+
+    def _update(self) -> Iterable[ColumnMapping]:
+        """UPDATE 表 [别名] SET ..."""
+        tokens, n = self.tokens, len(self.tokens)
+        ref, i = read_table_ref(tokens, 1, n)
+        if ref is None or ref.name is None or i >= n or not tokens[i].is_word('SET'):
+            return
+        end = find_top_level(tokens, i + 1, n, 'WHERE', 'RETURNING', 'RETURN', 'LOG')
+        yield from self._map_assignments(ref.name, i + 1, end, _Scope([ref], {}))
+
+    def _merge(self) -> Iterable[ColumnMapping]:
+        """MERGE INTO 目标 [别名] USING 来源 [别名] ON (...) WHEN [NOT] MATCHED THEN ..."""
+        tokens, n = self.tokens, len(self.tokens)
+        if n < 3 or not tokens[1].is_word('INTO'):
+            return
+        target, i = read_table_ref(tokens, 2, n)
+        if target is None or target.name is None or i >= n or not tokens[i].is_word('USING'):
+            return
+        source, i = read_table_ref(tokens, i + 1, n)
+        scope = _Scope([target] + ([source] if source is not None else []), {})
+
+        when = find_top_level(tokens, i, n, 'WHEN')
+        while when < n:
+            clause_end = find_top_level(tokens, when + 1, n, 'WHEN')
+            action = find_top_level(tokens, when + 1, clause_end, 'UPDATE', 'INSERT')
+            if action + 1 < clause_end and tokens[action].norm == 'UPDATE' and tokens[action + 1].is_word('SET'):
+                set_end = find_top_level(tokens, action + 2, clause_end, 'WHERE', 'DELETE')
+                yield from self._map_assignments(target.name, action + 2, set_end, scope)
+            elif action < clause_end and tokens[action].norm == 'INSERT':
+                j = action + 1
+                if j < clause_end and tokens[j].is_punct('('):
+                    close = find_matching_paren(tokens, j)
+                    if close is not None and close + 2 < clause_end and tokens[close + 1].is_word('VALUES'):
+                        columns = column_list(tokens, j + 1, close)
+                        yield from self._map_values(target.name, columns, close + 2, clause_end, scope)
+            when = clause_end
+
+    def _create(self) -> Iterable[ColumnMapping]:
+        """CREATE [GLOBAL TEMPORARY] TABLE 表 [(列, ...)] ... AS 查询"""
+        tokens, n = self.tokens, len(self.tokens)
+        i = next((k for k in range(1, min(n, 5)) if tokens[k].is_word('TABLE')), None)
+        if i is None or i + 1 >= n or not is_identifier(tokens[i + 1]):
+            return
+        i += 1
+        parts = [identifier(tokens[i])]
+        while i + 2 < n and tokens[i + 1].is_punct('.') and is_identifier(tokens[i + 2]):
+            parts.append(identifier(tokens[i + 2]))
+            i += 2
+        name = '.'.join(parts)
+        i += 1
+
+        columns = None
+        if i < n and tokens[i].is_punct('('):
+            close = find_matching_paren(tokens, i)
+            if close is None:
+                return
+            columns = column_list(tokens, i + 1, close)
+            i = close + 1
+
+        as_index = i
+        while as_index < n:
+            as_index = find_top_level(tokens, as_index, n, 'AS')
+            if as_index < n and is_query_start(tokens, as_index + 1, n):
+                yield from self._map_query(name, columns, as_index + 1, n)
+                return
+            as_index += 1
+
+def _merge(first: List[ColumnRef], second: List[ColumnRef]) -> List[ColumnRef]:
+    """合并两组源列并按不区分大小写去重"""
+    merged: Dict[Tuple[str, str], ColumnRef] = {}
+    for ref in first + second:
+        merged.setdefault((ref[0].upper(), ref[1].upper()), ref)
+    return list(merged.values())
+
+def extract_column_mappings(text: str, excluded: Iterable[str] = (), tokens: Optional[List[Token]] = None,
+                            start: int = 0, end: Optional[int] = None) -> List[ColumnMapping]:
+    """
+    提取一条语句中各目标列的来源
+
+    Args:
+        text: tokens 偏移所对应的文本（未传入 tokens 时即语句文本）
+        excluded: 语句中引用的参数与变量名称，不作为列处理
+        tokens: 已有的token流，例如整个存储过程的token
+        start, end: 语句在 tokens 中的下标范围，默认为全部
+    """
+    if tokens is None:
+        first = next(iter_tokens(text), None)
+        if first is None or first.type is not TokenType.WORD or first.norm not in _HANDLERS:
+            return []
+        tokens = tokenize(text)
+    else:
+        # 切片只复制token引用，不重新分词；表达式文本仍按偏移从 text 中截取
+        tokens = tokens[start:end]
+        if not tokens or tokens[0].type is not TokenType.WORD or tokens[0].norm not in _HANDLERS:
+            return []
+    resolver = _LineageResolver(text, tokens, {symbol_key(name) for name in excluded})
+    return list(resolver.mappings())
+
+class LineageBuilder:
+    """把各语句的列对应关系驻留为列ID，汇总成紧凑的边列表"""
+
+    def __init__(self):
+        self._lineage = FieldLineage()
+        self._ids: Dict[str, int] = {}
+
+    def column_id(self, table: str, column: str) -> int:
+        name = f"{table}.{column}"
+        key = name.upper()
+        column_id = self._ids.get(key)
+        if column_id is None:
+            column_id = self._ids[key] = len(self._lineage.columns)
+            self._lineage.columns.append(name)
+        return column_id
+
+    def add(self, statement_id: int, mapping: ColumnMapping):
+        target_id = self.column_id(*mapping.target)
+        self._lineage.mappings.append((target_id, statement_id, mapping.expression))
+        for source in mapping.sources:
+            self._lineage.edges.append((self.column_id(*source), target_id, statement_id))
+
+    def build(self) -> FieldLineage:
+        return self._lineage
@@ -2,7 +2,16 @@
 # -*- coding: utf-8 -*-
 
 from typing import Dict, Any, List
-import cx_Oracle
+
+def _oracle_error():
+    """
+    返回 cx_Oracle 的异常基类
+
+    cx_Oracle 仅在连接数据库扩展元数据时需要，延迟到实际处理数据库异常时再导入；
+    调用方已传入数据库连接，说明驱动已安装。
+    """
+    import cx_Oracle
+    return cx_Oracle.Error
 
 class MetadataExpander:
     def __init__(self, db_connection=None):
@@ -62,7 +71,7 @@ class MetadataExpander:
                 'foreign_keys': self._get_foreign_keys(table_name)
             }
             
-        except cx_Oracle.Error as error:
+        except _oracle_error() as error:
             print(f"Error expanding metadata for table {table_name}: {error}")
 
     def _get_foreign_keys(self, table_name: str) -> List[Dict[str, str]]:
@@ -96,6 +105,6 @@ class MetadataExpander:
             
             return foreign_keys
             
-        except cx_Oracle.Error as error:
+        except _oracle_error() as error:
             print(f"Error getting foreign keys for table {table_name}: {error}")
             return [] 
\ No newline at end of file
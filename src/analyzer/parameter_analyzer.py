@@ -1,21 +1,41 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import List
-from models.data_models import StoredProcedureStructure, Parameter
+from typing import Dict, Iterable, List, Optional
+from models.data_models import StoredProcedureStructure, Parameter, SQLStatement
+from parser.symbol_resolver import symbol_key
+
+def parameter_key(name: str) -> str:
+    """参数使用索引的键：与解析器符号表一致，未加引号的名称不区分大小写（统一为大写）"""
+    return symbol_key(name)
 
 class ParameterAnalyzer:
     """参数分析器 - 识别和分析存储过程参数的使用情况"""
-    
-    def extract_parameters(self, sp_structure: StoredProcedureStructure) -> List[Parameter]:
-        """提取并分析参数使用情况"""
-        parameters = sp_structure.parameters
-        
-        # 分析每个参数在哪些SQL语句中被使用
+
+    def build_usage_index(self, sql_statements: Iterable[SQLStatement]) -> Dict[str, List[int]]:
+        """
+        构建参数使用倒排索引：参数名（见 parameter_key）-> 使用该参数的语句ID列表
+
+        只遍历一次所有语句，语句ID按语句顺序排列且不重复。
+        """
+        index: Dict[str, List[int]] = {}
+        for stmt in sql_statements:
+            for key in {parameter_key(name) for name in stmt.parameters_used}:
+                index.setdefault(key, []).append(stmt.statement_id)
+        return index
+
+    def analyze(self, parameters: List[Parameter], sql_statements: List[SQLStatement],
+                usage_index: Optional[Dict[str, List[int]]] = None) -> List[Parameter]:
+        """根据使用索引填充每个参数的 used_in_statements（未传入索引时现场构建）"""
+        if usage_index is None:
+            usage_index = self.build_usage_index(sql_statements)
+
         for param in parameters:
-            param.used_in_statements = []
-            for stmt in sp_structure.sql_statements:
-                if param.name in stmt.parameters_used:
-                    param.used_in_statements.append(stmt.statement_id)
-        
-        return parameters 
\ No newline at end of file
+            param.used_in_statements = list(usage_index.get(parameter_key(param.name), ()))
+
+        return parameters
+
+    def extract_parameters(self, sp_structure: StoredProcedureStructure,
+                           usage_index: Optional[Dict[str, List[int]]] = None) -> List[Parameter]:
+        """提取并分析参数使用情况"""
+        return self.analyze(sp_structure.parameters, sp_structure.sql_statements, usage_index)
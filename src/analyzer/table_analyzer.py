@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from typing import List, Dict, Any, Set
-import re
+from parser.patterns import CREATE_TABLE
 
 class TableAnalyzer:
     def __init__(self):
@@ -41,8 +41,7 @@ class TableAnalyzer:
         识别临时表
         """
         # 匹配CREATE GLOBAL TEMPORARY TABLE
-        temp_table_pattern = r'CREATE\s+(?:GLOBAL\s+TEMPORARY\s+)?TABLE\s+([^\s(]+)'
-        matches = re.finditer(temp_table_pattern, sql_text, re.IGNORECASE)
+        matches = CREATE_TABLE.finditer(sql_text)
         for match in matches:
             self.temp_tables.add(match.group(1))
 
@@ -1,20 +1,54 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import Dict, List
+from typing import Dict, Set, Tuple
 from models.data_models import (
-    StoredProcedureStructure, TableFieldAnalysis, Table, 
-    FieldReference, SQLStatementType
+    StoredProcedureStructure, TableFieldAnalysis, Table, SQLStatementType
 )
+from analyzer.column_lineage import LineageBuilder, extract_column_mappings
+
+class TableRegistry:
+    """
+    表登记簿：物理表与临时表登记在同一个字典中，按表名一次查找
+
+    表按首次出现的顺序登记，是否为临时表在登记时确定；
+    分析结束时再按类型拆分为物理表与临时表两个字典。
+    """
+    
+    def __init__(self, temp_table_names: Set[str]):
+        self.temp_table_names = temp_table_names
+        self._tables: Dict[str, Table] = {}
+    
+    def register(self, table_name: str) -> Table:
+        """获取表对象，不存在时按名称是否为临时表创建"""
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = Table(
+                name=table_name,
+                is_temporary=table_name in self.temp_table_names
+            )
+        return table
+    
+    def add_field(self, table_name: str, field_name: str):
+        """向已登记的表添加字段，未登记的表忽略"""
+        table = self._tables.get(table_name)
+        if table is not None:
+            table.add_field(field_name)
+    
+    def split(self) -> Tuple[Dict[str, Table], Dict[str, Table]]:
+        """按类型拆分为 (物理表, 临时表)，各自保持登记顺序"""
+        physical_tables = {}
+        temp_tables = {}
+        for name, table in self._tables.items():
+            (temp_tables if table.is_temporary else physical_tables)[name] = table
+        return physical_tables, temp_tables
 
 class TableFieldAnalyzer:
     """表字段分析器 - 分析表和字段的关系，构建表对象"""
     
     def analyze(self, sp_structure: StoredProcedureStructure) -> TableFieldAnalysis:
         """分析表和字段关系"""
-        physical_tables = {}
-        temp_tables = {}
-        field_lineage = {}
+        lineage = LineageBuilder()
         
         # 首先识别所有临时表
         temp_table_names = set()
@@ -23,92 +57,66 @@ class TableFieldAnalyzer:
                 for table_name in stmt.target_tables:
                     temp_table_names.add(table_name)
         
+        registry = TableRegistry(temp_table_names)
+        
         # 遍历所有SQL语句，构建表和字段信息
         for stmt in sp_structure.sql_statements:
             # 处理目标表（被写入的表）
             for table_name in stmt.target_tables:
-                is_temp = table_name in temp_table_names
-                
-                if is_temp:
-                    if table_name not in temp_tables:
-                        temp_tables[table_name] = Table(
-                            name=table_name,
-                            is_temporary=True
-                        )
-                    temp_tables[table_name].source_sql_ids.append(stmt.statement_id)
-                else:
-                    if table_name not in physical_tables:
-                        physical_tables[table_name] = Table(
-                            name=table_name,
-                            is_temporary=False
-                        )
-                    physical_tables[table_name].source_sql_ids.append(stmt.statement_id)
+                registry.register(table_name).source_sql_ids.append(stmt.statement_id)
             
             # 处理源表（被读取的表）
             for table_name in stmt.source_tables:
-                is_temp = table_name in temp_table_names
-                
-                if is_temp:
-                    if table_name not in temp_tables:
-                        temp_tables[table_name] = Table(
-                            name=table_name,
-                            is_temporary=True
-                        )
-                else:
-                    # 只有不是临时表且不在物理表中时才添加
-                    if table_name not in physical_tables:
-                        physical_tables[table_name] = Table(
-                            name=table_name,
-                            is_temporary=False
-                        )
+                registry.register(table_name)
             
             # 添加字段信息
-            self._add_fields_to_tables(stmt, physical_tables, temp_tables)
+            self._add_fields_to_tables(stmt, registry)
             
             # 分析字段血缘关系
-            self._analyze_field_lineage(stmt, field_lineage)
+            self._analyze_field_lineage(stmt, lineage, registry)
         
+        physical_tables, temp_tables = registry.split()
         return TableFieldAnalysis(
             physical_tables=physical_tables,
             temp_tables=temp_tables,
-            field_lineage=field_lineage
+            field_lineage=lineage.build()
         )
     
-    def _add_fields_to_tables(self, stmt, physical_tables: Dict[str, Table], temp_tables: Dict[str, Table]):
+    def _add_fields_to_tables(self, stmt, registry: TableRegistry):
         """向表对象添加字段信息"""
-        all_tables = {**physical_tables, **temp_tables}
-        
         # 从读取的字段中推断表字段
         for field_ref in stmt.fields_read:
-            if field_ref.table_name in all_tables:
-                all_tables[field_ref.table_name].add_field(field_ref.field_name)
+            registry.add_field(field_ref.table_name, field_ref.field_name)
         
         # 从写入的字段中推断表字段
         for field_ref in stmt.fields_written:
-            if field_ref.table_name in all_tables:
-                all_tables[field_ref.table_name].add_field(field_ref.field_name)
+            registry.add_field(field_ref.table_name, field_ref.field_name)
         
         # 从JOIN条件中推断字段
         for join_cond in stmt.join_conditions:
-            if join_cond.left_table in all_tables:
-                all_tables[join_cond.left_table].add_field(join_cond.left_field)
-            if join_cond.right_table in all_tables:
-                all_tables[join_cond.right_table].add_field(join_cond.right_field)
+            registry.add_field(join_cond.left_table, join_cond.left_field)
+            registry.add_field(join_cond.right_table, join_cond.right_field)
         
         # 从WHERE条件中推断字段
         for where_cond in stmt.where_conditions:
             for field_ref in where_cond.field_references:
-                if field_ref.table_name in all_tables:
-                    all_tables[field_ref.table_name].add_field(field_ref.field_name)
+                registry.add_field(field_ref.table_name, field_ref.field_name)
     
-    def _analyze_field_lineage(self, stmt, field_lineage: Dict[str, List[FieldReference]]):
-        """分析字段血缘关系"""
-        # 这里可以实现更复杂的字段血缘分析
-        # 例如，INSERT语句中的字段映射关系
-        if stmt.statement_type == SQLStatementType.INSERT:
-            # 简化的血缘分析，实际需要更复杂的解析
-            for written_field in stmt.fields_written:
-                lineage_key = f"{written_field.table_name}.{written_field.field_name}"
-                if lineage_key not in field_lineage:
-                    field_lineage[lineage_key] = []
-                field_lineage[lineage_key].extend(stmt.fields_read) 
\ No newline at end of file
+    def _analyze_field_lineage(self, stmt, lineage: LineageBuilder, registry: TableRegistry):
+        """分析字段血缘关系：目标列对应的表达式及其依赖的源列"""
+        if stmt.statement_type.value in ('SELECT', 'DELETE'):
+            return
+        excluded = stmt.parameters_used + stmt.variables_used
+        token_range = stmt.token_range
+        if token_range is not None:
+            # 复用解析时整个存储过程的token流
+            source, tokens, start, end = token_range
+            mappings = extract_column_mappings(source, excluded, tokens, start, end)
+        else:
+            mappings = extract_column_mappings(stmt.raw_sql, excluded)
+        for mapping in mappings:
+            lineage.add(stmt.statement_id, mapping)
+            # 血缘中出现的列也是所属表的字段
+            registry.add_field(*mapping.target)
+            for source in mapping.sources:
+                registry.add_field(*source)
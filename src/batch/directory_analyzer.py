@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录批量分析
+
+遍历输入目录中的存储过程源文件，按程序单元在进程池中并行分析，
+每个单元的分析结果写入输出目录，并统计吞吐量。
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from parser import PARSER_VERSION
+from parser.unit_splitter import iter_analysis_units
+from utils.helpers import get_file_hash, read_file, read_json, sanitize_filename, write_file, write_json
+
+# 参与分析的源文件扩展名
+SOURCE_EXTENSIONS = ('.sql', '.pls', '.pkb')
+
+# 每个任务块包含的源码字节数；超过该大小的单个文件在主进程中按单元切分后分散到多个worker
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+
+# 输出目录中的清单、汇总与聚合血缘文件
+MANIFEST_FILE = 'manifest.json'
+SUMMARY_FILE = 'summary.json'
+LINEAGE_FILE = 'lineage.json'
+
+# 每个worker进程内的分析器实例
+_worker_analyzer = None
+
+
+def _init_worker():
+    """worker进程初始化：创建不生成可视化的分析器，并屏蔽逐个单元的进度输出"""
+    global _worker_analyzer
+    from main import OracleSPAnalyzer
+
+    sys.stdout = open(os.devnull, 'w')
+    _worker_analyzer = OracleSPAnalyzer(visualize=False)
+    # 批量分析中每个单元只出现一次，进程内缓存只会占用内存
+    _worker_analyzer.cache = None
+
+
+def iter_source_files(input_dir: Union[str, Path]) -> Iterator[Path]:
+    """按路径顺序遍历目录中的存储过程源文件"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SOURCE_EXTENSIONS):
+                yield Path(root) / name
+
+
+def unit_output_path(output_dir: Union[str, Path], rel_path: str, index: int, name: Optional[str]) -> Path:
+    """单元分析结果的输出路径：<输出目录>/<源文件相对路径>/<序号>_<单元名>.json"""
+    return Path(output_dir) / rel_path / f"{index:04d}_{sanitize_filename(name or 'anonymous')}.json"
+
+
+def iter_work_chunks(input_dir: Union[str, Path], rel_paths: Iterable[str],
+                     chunk_bytes: int) -> Iterator[List[tuple]]:
+    """
+    将待分析的文件划分为任务块
+
+    任务块中的条目为 ("file", 相对路径)，由worker读取并切分；超过 chunk_bytes 的大文件
+    （如大型包体）在主进程中切分，条目为 ("unit", 相对路径, 序号, 类型, 名称, 文本)；
+    读取失败的文件条目为 ("error", 相对路径, 错误信息)。
+    """
+    input_dir = Path(input_dir)
+    chunk: List[tuple] = []
+    size = 0
+
+    for rel_path in rel_paths:
+        path = input_dir / rel_path
+        file_size = path.stat().st_size
+
+        if file_size <= chunk_bytes:
+            chunk.append(('file', rel_path))
+            size += file_size
+        else:
+            try:
+                text = read_file(path)
+            except (OSError, UnicodeDecodeError) as e:
+                chunk.append(('error', rel_path, str(e)))
+                continue
+            for index, unit in enumerate(iter_analysis_units(text)):
+                chunk.append(('unit', rel_path, index, unit.kind, unit.name, text[unit.start:unit.end]))
+                size += unit.end - unit.start
+                if size >= chunk_bytes:
+                    yield chunk
+                    chunk, size = [], 0
+
+        if size >= chunk_bytes:
+            yield chunk
+            chunk, size = [], 0
+
+    if chunk:
+        yield chunk
+
+
+def _empty_row(rel_path: str, index: Optional[int], kind: Optional[str], name: Optional[str],
+               error: Optional[str] = None) -> Dict[str, Any]:
+    return {'file': rel_path, 'index': index, 'kind': kind, 'name': name, 'output': None,
+            'statements': 0, 'source_tables': [], 'target_tables': [], 'error': error}
+
+
+def _analyze_unit(rel_path: str, index: int, kind: str, name: Optional[str],
+                  text: str, output_dir: str) -> Dict[str, Any]:
+    """分析单个程序单元并写出结果"""
+    row = _empty_row(rel_path, index, kind, name)
+    try:
+        analysis = _worker_analyzer.analyze(text)
+        if name is None:
+            row['name'] = analysis.sp_structure.name
+        output_path = unit_output_path(output_dir, rel_path, index, row['name'])
+        write_file(output_path, analysis.model_dump_json(indent=2))
+        statements = analysis.sp_structure.sql_statements
+        row['output'] = output_path.relative_to(output_dir).as_posix()
+        row['statements'] = len(statements)
+        # 单元级别的读写表，用于聚合血缘，增量分析时无需重新读取结果文件
+        row['source_tables'] = sorted({t for stmt in statements for t in stmt.source_tables})
+        row['target_tables'] = sorted({t for stmt in statements for t in stmt.target_tables})
+    except Exception as e:
+        row['error'] = str(e)
+    return row
+
+
+def _analyze_chunk(chunk: List[tuple], input_dir: str, output_dir: str) -> List[Dict[str, Any]]:
+    """在worker进程中分析一个任务块，返回每个单元的结果摘要"""
+    rows = []
+    for item in chunk:
+        if item[0] == 'error':
+            rows.append(_empty_row(item[1], None, None, None, item[2]))
+            continue
+
+        if item[0] == 'unit':
+            rows.append(_analyze_unit(item[1], item[2], item[3], item[4], item[5], output_dir))
+            continue
+
+        rel_path = item[1]
+        try:
+            text = read_file(Path(input_dir) / rel_path)
+        except (OSError, UnicodeDecodeError) as e:
+            rows.append(_empty_row(rel_path, None, None, None, str(e)))
+            continue
+        for index, unit in enumerate(iter_analysis_units(text)):
+            rows.append(_analyze_unit(rel_path, index, unit.kind, unit.name,
+                                      text[unit.start:unit.end], output_dir))
+    return rows
+
+
+def load_manifest(output_dir: Union[str, Path]) -> Dict[str, Any]:
+    """读取输出目录中的清单，不存在或已损坏时返回空清单"""
+    try:
+        manifest = read_json(Path(output_dir) / MANIFEST_FILE)
+    except (OSError, ValueError):
+        return {'files': {}}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('files'), dict):
+        return {'files': {}}
+    return manifest
+
+
+def build_lineage(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, List[str]]]:
+    """由各单元的读写表汇总表级血缘：表名 → 读取(readers)/写入(writers)该表的单元"""
+    lineage: Dict[str, Dict[str, List[str]]] = {}
+    for row in rows:
+        if row['error'] is not None:
+            continue
+        unit = f"{row['file']}:{row['name']}"
+        for table in row.get('source_tables', []):
+            lineage.setdefault(table, {'readers': [], 'writers': []})['readers'].append(unit)
+        for table in row.get('target_tables', []):
+            lineage.setdefault(table, {'readers': [], 'writers': []})['writers'].append(unit)
+    return dict(sorted(lineage.items()))
+
+
+def _remove_outputs(output_dir: Path, rows: Iterable[Dict[str, Any]]):
+    """删除已失效的单元结果文件"""
+    for row in rows:
+        if row.get('output'):
+            try:
+                (output_dir / row['output']).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]):
+    """先写临时文件再替换，中断时不会留下半写的清单"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    write_json(tmp_path, data)
+    os.replace(tmp_path, path)
+
+
+def analyze_directory(input_dir: Union[str, Path], output_dir: Union[str, Path],
+                      jobs: Optional[int] = None,
+                      chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                      incremental: bool = True) -> Dict[str, Any]:
+    """
+    并行分析目录中的所有存储过程源文件
+
+    输出目录中的清单（manifest.json）记录每个源文件的哈希、解析器版本和单元结果。
+    增量模式下，大小与修改时间均未变化、或内容哈希未变化且解析器版本相同的文件
+    直接沿用上次的结果，只重新分析新增、变化以及上次分析失败的文件；已删除或变化文件的旧结果被清理。
+    表级聚合血缘（lineage.json）由清单中各单元的读写表重新汇总，无需重新读取结果文件。
+
+    任务块按需提交，同时在途的任务块不超过 2 * jobs 个，内存占用与目录大小无关。
+
+    Args:
+        input_dir: 输入目录
+        output_dir: 输出目录
+        jobs: 工作进程数，默认为CPU核数
+        chunk_bytes: 每个任务块包含的源码字节数
+        incremental: 是否跳过未变化的文件，为 False 时全部重新分析
+
+    Returns:
+        Dict[str, Any]: 汇总信息，包括文件数、单元数、跳过与失败数、耗时与吞吐量
+    """
+    jobs = jobs or os.cpu_count() or 1
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    previous = load_manifest(output_dir)['files']
+    files: Dict[str, Dict[str, Any]] = {}
+    changed: List[str] = []
+    reused_rows: List[Dict[str, Any]] = []
+    total_bytes = 0
+    changed_bytes = 0
+
+    for path in iter_source_files(input_dir):
+        rel_path = path.relative_to(input_dir).as_posix()
+        stat = path.stat()
+        total_bytes += stat.st_size
+        entry = previous.pop(rel_path, None)
+
+        digest = None
+        if incremental and entry is not None and entry.get('parser_version') == PARSER_VERSION:
+            unchanged = entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+            if not unchanged:
+                # 修改时间变化但内容未变（如重新检出）时同样跳过
+                digest = get_file_hash(path, 'sha256')
+                unchanged = digest == entry.get('hash')
+            # 上次失败的文件（含读取失败、worker异常等暂时性错误）总是重新分析
+            if unchanged and not any(row['error'] is not None for row in entry.get('units', [])):
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                files[rel_path] = entry
+                reused_rows.extend(entry['units'])
+                continue
+
+        if entry is not None:
+            _remove_outputs(output_dir, entry.get('units', []))
+        files[rel_path] = {
+            'hash': digest or get_file_hash(path, 'sha256'),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'parser_version': PARSER_VERSION,
+            'units': [],
+        }
+        changed.append(rel_path)
+        changed_bytes += stat.st_size
+
+    # 清单中剩余的条目对应已删除的源文件
+    for entry in previous.values():
+        _remove_outputs(output_dir, entry.get('units', []))
+
+    new_rows: List[Dict[str, Any]] = []
+    if changed:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+            pending = set()
+            for chunk in iter_work_chunks(input_dir, changed, chunk_bytes):
+                if len(pending) >= jobs * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        new_rows.extend(future.result())
+                pending.add(executor.submit(_analyze_chunk, chunk, str(input_dir), str(output_dir)))
+            for future in pending:
+                new_rows.extend(future.result())
+
+    elapsed = time.perf_counter() - start
+    sort_key = lambda row: (row['file'], row['index'] if row['index'] is not None else -1)
+    new_rows.sort(key=sort_key)
+    for row in new_rows:
+        files[row['file']]['units'].append(row)
+    rows = sorted(reused_rows + new_rows, key=sort_key)
+    analyzed_units = sum(1 for row in new_rows if row['index'] is not None)
+
+    summary = {
+        'input_dir': str(input_dir),
+        'output_dir': str(output_dir),
+        'jobs': jobs,
+        'files': len(files),
+        'bytes': total_bytes,
+        'units': sum(1 for row in rows if row['index'] is not None),
+        'failed': sum(1 for row in rows if row['error'] is not None),
+        'analyzed_files': len(changed),
+        'analyzed_units': analyzed_units,
+        'skipped_files': len(files) - len(changed),
+        'removed_files': len(previous),
+        'elapsed': elapsed,
+        'units_per_second': analyzed_units / elapsed if elapsed else 0.0,
+        'mb_per_second': changed_bytes / (1024 * 1024) / elapsed if elapsed else 0.0,
+        'results': rows,
+    }
+    _write_json_atomic(output_dir / MANIFEST_FILE, {'parser_version': PARSER_VERSION, 'files': files})
+    write_json(output_dir / LINEAGE_FILE, build_lineage(rows))
+    write_json(output_dir / SUMMARY_FILE, summary)
+    return summary
@@ -4,6 +4,7 @@
 import sys
 import os
 from pathlib import Path
+from typing import Iterator, Optional, Tuple
 
 # 添加当前目录到Python路径
 current_dir = Path(__file__).parent
@@ -15,6 +16,10 @@ from analyzer.table_field_analyzer import TableFieldAnalyzer
 from analyzer.condition_analyzer import ConditionAnalyzer
 from visualizer.interactive_visualizer import InteractiveVisualizer
 from models.data_models import StoredProcedureAnalysis, StoredProcedureStructure
+from parser import PARSER_VERSION
+from parser.unit_splitter import SourceUnit, iter_analysis_units
+from utils.cache import AnalysisCache, DiskAnalysisCache, procedure_hash
+from utils.config import config
 
 class OracleSPAnalyzer:
     """
@@ -22,12 +27,26 @@ class OracleSPAnalyzer:
     专注于数据流向、字段联系和匹配条件分析
     """
     
-    def __init__(self):
+    def __init__(self, cache: Optional[AnalysisCache] = None,
+                 persistent_cache: Optional[DiskAnalysisCache] = None,
+                 visualize: bool = True):
+        """
+        Args:
+            cache: 分析结果缓存，未指定时按配置中的 cache.* 创建（cache.enabled 为 false 时不缓存）
+            persistent_cache: 持久化缓存，未指定时在 cache.persistent 为 true 时按配置创建
+            visualize: 是否在每次分析后生成可视化数据（批量分析时关闭）
+        """
+        self.visualize = visualize
         self.sp_parser = StoredProcedureParser()
         self.param_analyzer = ParameterAnalyzer()
         self.table_field_analyzer = TableFieldAnalyzer()
         self.condition_analyzer = ConditionAnalyzer()
-        self.visualizer = InteractiveVisualizer()
+        self.visualizer = InteractiveVisualizer(
+            aggregate_edges=config.get_visualization_config()['aggregate_edges']
+        )
+        self.cache = cache if cache is not None else AnalysisCache.from_config(config)
+        self.persistent_cache = persistent_cache if persistent_cache is not None else \
+            DiskAnalysisCache.from_config(config, StoredProcedureAnalysis, PARSER_VERSION)
 
     def analyze(self, sp_text: str) -> StoredProcedureAnalysis:
         """
@@ -40,6 +59,14 @@ class OracleSPAnalyzer:
         6. 使用实体表、临时表对象，sql逻辑和匹配条件进行可视化
         """
         
+        # 相同内容（忽略行尾空白与换行差异）的存储过程直接返回缓存的分析结果
+        caching = self.cache is not None or self.persistent_cache is not None
+        cache_key = procedure_hash(sp_text) if caching else None
+        cached = self._get_cached(cache_key) if caching else None
+        if cached is not None:
+            print("命中分析缓存，跳过重复分析")
+            return cached
+        
         print("开始分析存储过程...")
         
         # 1. 解析存储过程结构
@@ -55,8 +82,9 @@ class OracleSPAnalyzer:
             variable_declarations=sp_parsed.variable_declarations
         )
         
-        # 2. 识别外来参数
-        parameters = self.param_analyzer.extract_parameters(sp_structure)
+        # 2. 识别外来参数（参数使用索引随结果保存，供可视化与API复用）
+        parameter_usage = self.param_analyzer.build_usage_index(sp_structure.sql_statements)
+        parameters = self.param_analyzer.extract_parameters(sp_structure, parameter_usage)
         print(f"识别到 {len(parameters)} 个参数")
         
         # 3. 分析表和字段关系
@@ -67,19 +95,71 @@ class OracleSPAnalyzer:
         conditions_and_logic = self.condition_analyzer.analyze(sp_structure)
         print(f"提取到 {len(conditions_and_logic.join_conditions)} 个连接条件")
         
+        # 各分析步骤已复用完解析时的token流，释放后缓存中的结果不再持有
+        for stmt in sp_structure.sql_statements:
+            stmt.release_tokens()
+        
         # 5. 构建最终分析结果
         analysis_result = StoredProcedureAnalysis(
             sp_structure=sp_structure,
             parameters=parameters,
             table_field_analysis=table_field_analysis,
-            conditions_and_logic=conditions_and_logic
+            conditions_and_logic=conditions_and_logic,
+            parameter_usage=parameter_usage
         )
         
         # 6. 生成交互式可视化
-        self.visualizer.create_interactive_visualization(analysis_result)
+        if self.visualize:
+            self.visualizer.create_interactive_visualization(analysis_result)
+        
+        if caching:
+            self._put_cached(cache_key, analysis_result)
         
         return analysis_result
 
+    def analyze_units(self, source_text: str) -> Iterator[Tuple[SourceUnit, StoredProcedureAnalysis]]:
+        """
+        逐个分析源文件中的所有程序单元
+
+        适用于包含多个 CREATE PROCEDURE/FUNCTION/PACKAGE BODY/TRIGGER 的DDL导出文件，
+        每切分出一个单元就分析并产出 (单元, 分析结果)，包体按成员子程序分别分析。
+        """
+        for unit in iter_analysis_units(source_text):
+            yield unit, self.analyze(source_text[unit.start:unit.end])
+
+    def get_cached_analysis(self, sp_text: str) -> Optional[StoredProcedureAnalysis]:
+        """只查询缓存中已有的分析结果，不执行分析"""
+        if self.cache is None and self.persistent_cache is None:
+            return None
+        return self._get_cached(procedure_hash(sp_text))
+
+    def cache_analysis(self, sp_text: str, analysis_result: StoredProcedureAnalysis):
+        """将在其他进程中得到的分析结果写入本进程的内存缓存"""
+        if self.cache is not None:
+            self.cache.put(procedure_hash(sp_text), analysis_result)
+
+    def _get_cached(self, cache_key: str) -> Optional[StoredProcedureAnalysis]:
+        """依次查询进程内缓存和持久化缓存"""
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if self.persistent_cache is not None:
+            cached = self.persistent_cache.get(cache_key)
+            if cached is not None:
+                # 回填进程内缓存，后续请求无需再反序列化
+                if self.cache is not None:
+                    self.cache.put(cache_key, cached)
+                return cached
+        return None
+
+    def _put_cached(self, cache_key: str, analysis_result: StoredProcedureAnalysis):
+        """写入进程内缓存和持久化缓存"""
+        if self.cache is not None:
+            self.cache.put(cache_key, analysis_result)
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(cache_key, analysis_result)
+
     def start_web_interface(self, analysis_result: StoredProcedureAnalysis = None):
         """启动Web界面"""
         self.visualizer.start_web_interface(analysis_result)
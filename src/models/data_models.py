@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import List, Dict, Any, Optional, Set
-from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Set, Tuple
+from pydantic import BaseModel, Field, PrivateAttr, computed_field, model_validator
 from enum import Enum
 
 # 为了向后兼容，添加别名
@@ -41,13 +41,16 @@ class FieldReference(BaseModel):
     alias: Optional[str] = None
 
 class JoinCondition(BaseModel):
-    """连接条件"""
+    """连接条件（left_table/right_table 为解析别名后的实际表名）"""
     left_table: str
     left_field: str
     right_table: str
     right_field: str
-    join_type: str  # INNER, LEFT, RIGHT, FULL
+    join_type: str  # INNER, LEFT, RIGHT, FULL, CROSS
     condition_text: str
+    left_alias: Optional[str] = None   # 条件中左侧列的限定名（别名或表名）
+    right_alias: Optional[str] = None  # 条件中右侧列的限定名
+    syntax: str = "ANSI"  # ANSI: JOIN ... ON；ORACLE: WHERE 子句中的连接（含 (+) 外连接）
 
 class WhereCondition(BaseModel):
     """WHERE条件"""
@@ -74,29 +77,96 @@ class Parameter(BaseModel):
         )
 
 class SQLStatement(BaseModel):
-    """SQL语句"""
+    """
+    SQL语句
+    
+    语句文本可以直接通过 raw_sql 传入，也可以通过 source（整个存储过程的共享文本）
+    与 span（起止偏移）引用，后者在访问 raw_sql 时才截取，避免每条语句各持一份副本。
+    """
     statement_id: int
     statement_type: StatementType
-    raw_sql: str
+    span: Optional[Tuple[int, int]] = None
     source_tables: List[str] = Field(default_factory=list)
     target_tables: List[str] = Field(default_factory=list)
     fields_read: List[FieldReference] = Field(default_factory=list)
     fields_written: List[FieldReference] = Field(default_factory=list)
     join_conditions: List[JoinCondition] = Field(default_factory=list)
+    table_aliases: Dict[str, str] = Field(default_factory=dict)  # 限定名（大写）-> 表名，解析时确定
     where_conditions: List[WhereCondition] = Field(default_factory=list)
     parameters_used: List[str] = Field(default_factory=list)
+    variables_used: List[str] = Field(default_factory=list)  # 语句中引用的局部变量
+    
+    _raw_sql: Optional[str] = PrivateAttr(default=None)
+    _source: Optional[str] = PrivateAttr(default=None)
+    _tokens: Optional[List[Any]] = PrivateAttr(default=None)       # source 的token流（不序列化）
+    _token_span: Optional[Tuple[int, int]] = PrivateAttr(default=None)
+    
+    @model_validator(mode='wrap')
+    @classmethod
+    def _bind_sql_text(cls, data: Any, handler):
+        """接收 raw_sql 或 source + span 两种文本来源"""
+        if isinstance(data, SQLStatement):
+            return data
+        statement = handler(data)
+        raw_sql = data.get('raw_sql') if isinstance(data, dict) else None
+        source = data.get('source') if isinstance(data, dict) else None
+        if raw_sql is None and (source is None or statement.span is None):
+            raise ValueError("SQLStatement 需要 raw_sql，或同时提供 source 与 span")
+        statement._raw_sql = raw_sql
+        statement._source = source if raw_sql is None else None
+        return statement
+    
+    @computed_field
+    @property
+    def raw_sql(self) -> str:
+        """语句文本（按偏移引用时延迟截取）"""
+        if self._raw_sql is not None:
+            return self._raw_sql
+        start, end = self.span
+        return self._source[start:end]
+    
+    def bind_tokens(self, tokens: List[Any], token_span: Tuple[int, int]):
+        """关联解析时 source 的token流与语句在其中的下标范围，后续分析直接复用，不再重新分词"""
+        self._tokens = tokens
+        self._token_span = token_span
+    
+    def release_tokens(self):
+        """分析完成后释放token流，缓存中的分析结果不持有"""
+        self._tokens = None
+        self._token_span = None
+    
+    @property
+    def token_range(self) -> Optional[Tuple[str, List[Any], int, int]]:
+        """(source, tokens, start, end)，语句未关联token流时为 None"""
+        if self._tokens is None or self._source is None:
+            return None
+        return (self._source, self._tokens, *self._token_span)
 
 class Table(BaseModel):
-    """表对象"""
+    """
+    表对象
+    
+    fields 保持插入顺序，另有一个集合索引用于 add_field 的去重判断，
+    使逐个添加字段为 O(1)。
+    """
     name: str
     is_temporary: bool = False
     fields: List[str] = Field(default_factory=list)
-    source_sql_ids: List[str] = Field(default_factory=list)
+    source_sql_ids: List[int] = Field(default_factory=list)
+    
+    _field_set: Optional[Set[str]] = PrivateAttr(default=None)
+    _indexed_count: int = PrivateAttr(default=0)  # 建立索引时 fields 的长度
     
     def add_field(self, field_name: str):
         """添加字段（确保不重复）"""
-        if field_name not in self.fields:
+        # 首次调用或 fields 被直接修改过时重建索引
+        if self._field_set is None or self._indexed_count != len(self.fields):
+            self._field_set = set(self.fields)
+            self._indexed_count = len(self.fields)
+        if field_name not in self._field_set:
+            self._field_set.add(field_name)
             self.fields.append(field_name)
+            self._indexed_count += 1
 
 # 为了兼容测试，添加TableInfo别名
 class TableInfo(BaseModel):
@@ -123,11 +193,43 @@ class StoredProcedureStructure(BaseModel):
     cursor_declarations: List[Dict[str, Any]] = Field(default_factory=list)
     variable_declarations: List[Dict[str, Any]] = Field(default_factory=list)
 
+class FieldLineage(BaseModel):
+    """
+    字段级血缘
+    
+    每个列以 "表名.列名" 驻留为一个整数ID（即在 columns 中的下标），
+    mappings 记录目标列在某条语句中对应的表达式，edges 记录目标列依赖的源列，
+    两者都只保存列ID，不为每个目标列重复保存字段对象。列名不区分大小写。
+    """
+    columns: List[str] = Field(default_factory=list)
+    mappings: List[Tuple[int, int, str]] = Field(default_factory=list)  # (目标列ID, 语句ID, 表达式)
+    edges: List[Tuple[int, int, int]] = Field(default_factory=list)     # (源列ID, 目标列ID, 语句ID)
+    
+    _column_ids: Optional[Dict[str, int]] = PrivateAttr(default=None)
+    
+    def column_id(self, column: str) -> Optional[int]:
+        """按 "表名.列名" 查找列ID"""
+        if self._column_ids is None or len(self._column_ids) != len(self.columns):
+            self._column_ids = {name.upper(): i for i, name in enumerate(self.columns)}
+        return self._column_ids.get(column.upper())
+    
+    def sources_of(self, column: str) -> List[str]:
+        """目标列直接依赖的源列"""
+        column_id = self.column_id(column)
+        ids = dict.fromkeys(source for source, target, _ in self.edges if target == column_id)
+        return [self.columns[i] for i in ids]
+    
+    def targets_of(self, column: str) -> List[str]:
+        """直接依赖该源列的目标列"""
+        column_id = self.column_id(column)
+        ids = dict.fromkeys(target for source, target, _ in self.edges if source == column_id)
+        return [self.columns[i] for i in ids]
+
 class TableFieldAnalysis(BaseModel):
     """表字段分析结果"""
     physical_tables: Dict[str, Table]
     temp_tables: Dict[str, Table]
-    field_lineage: Dict[str, List[FieldReference]]  # 字段血缘关系
+    field_lineage: FieldLineage = Field(default_factory=FieldLineage)  # 字段血缘关系
 
 class ConditionsAndLogic(BaseModel):
     """条件和逻辑分析结果"""
@@ -141,6 +243,7 @@ class StoredProcedureAnalysis(BaseModel):
     parameters: List[Parameter]
     table_field_analysis: TableFieldAnalysis
     conditions_and_logic: ConditionsAndLogic
+    parameter_usage: Dict[str, List[int]] = Field(default_factory=dict)  # 参数名（大写）-> 使用该参数的语句ID
 
 class AnalysisResult(BaseModel):
     """分析结果（兼容别名）"""
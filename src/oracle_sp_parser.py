@@ -21,43 +21,53 @@ VERSION_INFO = {
     "release": "stable"
 }
 
-# 导出主要组件
-try:
-    from .parser import StoredProcedureParser, SQLStatementParser
-    from .analyzer import ParameterAnalyzer, TableAnalyzer, ConditionAnalyzer
-    from .models import Parameter, SQLStatement, StoredProcedure, AnalysisResult
-    from .utils import FileProcessor, ConfigManager
-    from .visualizer import DependencyVisualizer
-    
-    __all__ = [
-        # 解析器
-        "StoredProcedureParser",
-        "SQLStatementParser",
-        
-        # 分析器
-        "ParameterAnalyzer", 
-        "TableAnalyzer",
-        "ConditionAnalyzer",
-        
-        # 数据模型
-        "Parameter",
-        "SQLStatement", 
-        "StoredProcedure",
-        "AnalysisResult",
-        
-        # 工具类
-        "FileProcessor",
-        "ConfigManager",
-        "DependencyVisualizer",
-        
-        # 版本信息
-        "__version__",
-        "VERSION_INFO"
-    ]
-    
-except ImportError:
-    # 如果某些模块还未实现，暂时跳过
-    __all__ = ["__version__", "VERSION_INFO"]
+# 导出主要组件：名称 -> 所在模块。首次访问时才导入对应模块，
+# 避免 import oracle_sp_parser（以及命令行启动、工作进程启动）加载全部子包
+_LAZY_EXPORTS = {
+    # 解析器
+    "StoredProcedureParser": "parser.sp_parser",
+    "SQLStatementParser": "parser.sql_parser",
+
+    # 分析器
+    "ParameterAnalyzer": "analyzer.parameter_analyzer",
+    "TableAnalyzer": "analyzer.table_analyzer",
+    "ConditionAnalyzer": "analyzer.condition_analyzer",
+
+    # 数据模型
+    "Parameter": "models.data_models",
+    "SQLStatement": "models.data_models",
+    "StoredProcedure": "models.data_models",
+    "AnalysisResult": "models.data_models",
+}
+
+__all__ = [*_LAZY_EXPORTS, "__version__", "VERSION_INFO"]
+
+
+def _ensure_src_path():
+    """作为独立模块使用时 src 目录下的子包不带包前缀导入"""
+    import sys
+    from pathlib import Path
+
+    src_dir = str(Path(__file__).parent)
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    _ensure_src_path()
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
 
 
 def get_version():
@@ -76,3 +86,52 @@ def info():
     print(f"Author: {__author__}")
     print(f"License: {__license__}")
     print(f"Email: {__email__}")
+
+
+def main(argv=None) -> int:
+    """
+    命令行入口
+
+    用法:
+        python -m oracle_sp_parser analyze-dir data/input -j 8
+    """
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(prog="oracle_sp_parser", description="Oracle存储过程解析和分析工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze_dir = subparsers.add_parser("analyze-dir", help="并行分析目录中的所有存储过程源文件")
+    analyze_dir.add_argument("input_dir", help="输入目录（.sql/.pls/.pkb 文件）")
+    analyze_dir.add_argument("-o", "--output-dir", default="data/output", help="输出目录，默认 data/output")
+    analyze_dir.add_argument("-j", "--jobs", type=int, default=0, help="工作进程数，默认为CPU核数")
+    analyze_dir.add_argument("--chunk-size", default="1MB", help="每个任务块的源码大小，默认 1MB")
+    analyze_dir.add_argument("--full", action="store_true", help="忽略清单，重新分析所有文件")
+
+    args = parser.parse_args(argv)
+
+    _ensure_src_path()
+    from batch.directory_analyzer import analyze_directory
+    from utils.config import Config
+    from utils.helpers import format_file_size
+
+    if not Path(args.input_dir).is_dir():
+        print(f"❌ 输入目录不存在: {args.input_dir}")
+        return 2
+
+    summary = analyze_directory(args.input_dir, args.output_dir, jobs=args.jobs or None,
+                                chunk_bytes=Config.parse_size(args.chunk_size),
+                                incremental=not args.full)
+
+    print(f"✅ 分析完成: {summary['files']} 个文件（{format_file_size(summary['bytes'])}），"
+          f"{summary['units']} 个程序单元，失败 {summary['failed']} 个，耗时 {summary['elapsed']:.2f} 秒")
+    print(f"♻️ 增量分析: 重新分析 {summary['analyzed_files']} 个文件（{summary['analyzed_units']} 个单元），"
+          f"跳过未变化文件 {summary['skipped_files']} 个，清理已删除文件 {summary['removed_files']} 个")
+    print(f"⚡ 吞吐量: {summary['units_per_second']:.1f} 过程/秒，{summary['mb_per_second']:.2f} MB/秒"
+          f"（{summary['jobs']} 个工作进程）")
+    print(f"💾 结果已写入 {summary['output_dir']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,2 @@
+# 解析器版本：解析结果的结构或内容发生变化时递增，用于使持久化缓存中的旧结果失效
+PARSER_VERSION = "2.5.0"
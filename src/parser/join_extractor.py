@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JOIN 条件提取
+
+在语句的token流上解析每个 FROM 子句（含子查询中的），建立语句级的别名映射
+（别名或表名 -> 表名），再把连接条件解析为以实际表名表示的 JoinCondition：
+  - ANSI 语法：[INNER|LEFT|RIGHT|FULL] JOIN ... ON a.x = b.y [AND ...]
+  - Oracle 语法：FROM a, b WHERE a.x = b.y(+)，(+) 所在一侧为可空的一侧
+别名在解析阶段即已确定，下游不需要再从语句文本中推断。
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models.data_models import JoinCondition
+from parser.plsql_lexer import Token, TokenType, find_matching_paren, tokenize
+from parser.sql_clauses import (
+    QUERY_CLAUSES, TableRef, find_top_level, find_top_level_punct, identifier,
+    is_identifier, is_query_start, parse_from_clause, read_table_ref, split_conjuncts,
+    strip_parens,
+)
+
+# WHERE 之后结束 WHERE 条件的子句关键字
+_AFTER_WHERE = tuple(clause for clause in QUERY_CLAUSES if clause != 'WHERE')
+
+class StatementJoins(NamedTuple):
+    """一条语句的别名映射与连接条件"""
+    aliases: Dict[str, str]  # 限定名查找键（见 alias_key）-> 表名
+    conditions: List[JoinCondition]
+
+class _FromScope(NamedTuple):
+    """一个 FROM 子句：表引用与 WHERE 条件的token范围"""
+    refs: List[TableRef]
+    where: Optional[Tuple[int, int]]
+
+class _Column(NamedTuple):
+    """连接条件一侧的列引用"""
+    qualifier: Optional[str]  # 限定名原写法（别名或表名）；未限定时为 None
+    field: str
+    outer: bool               # 是否带 Oracle 外连接标记 (+)
+
+def alias_key(name: str) -> str:
+    """别名映射的查找键：限定名不区分大小写"""
+    return name.upper()
+
+def _ref_key(ref: TableRef) -> Optional[str]:
+    """表引用在条件中被引用时使用的限定名：有别名时为别名，否则为表名"""
+    if ref.alias:
+        return alias_key(ref.alias)
+    return alias_key(ref.name) if ref.name else None
+
+def _read_column(tokens: List[Token], start: int, end: int) -> Optional[_Column]:
+    """tokens[start:end] 恰好是 [限定名.]列名[(+)] 时返回列引用，否则返回 None"""
+    start, end = strip_parens(tokens, start, end)
+    outer = False
+    if end - start >= 4 and tokens[end - 3].is_punct('(') and tokens[end - 2].is_punct('+') \
+            and tokens[end - 1].is_punct(')'):
+        outer = True
+        end -= 3
+
+    parts = []
+    index = start
+    while index < end and is_identifier(tokens[index]):
+        parts.append(identifier(tokens[index]))
+        index += 1
+        if index == end:
+            return _Column('.'.join(parts[:-1]) or None, parts[-1], outer)
+        if not tokens[index].is_punct('.'):
+            return None
+        index += 1
+    return None
+
+def _column_equality(tokens: List[Token], start: int, end: int) -> Optional[Tuple[_Column, _Column]]:
+    """条件为 列 = 列 时返回两侧的列引用"""
+    start, end = strip_parens(tokens, start, end)
+    equals = find_top_level_punct(tokens, start, end, '=')
+    if equals >= end:
+        return None
+    left = _read_column(tokens, start, equals)
+    right = _read_column(tokens, equals + 1, end)
+    if left is None or right is None:
+        return None
+    return left, right
+
+def _statement_targets(tokens: List[Token], start: int, end: int) -> List[TableRef]:
+    """DML 语句头部的表引用：UPDATE 目标表、MERGE INTO 目标表与 USING 来源（DELETE FROM 由 FROM 子句处理）"""
+    if start >= end:
+        return []
+    head = tokens[start]
+    if head.is_word('UPDATE'):
+        ref, _ = read_table_ref(tokens, start + 1, end)
+        return [ref] if ref else []
+    if head.is_word('MERGE') and start + 1 < end and tokens[start + 1].is_word('INTO'):
+        target, index = read_table_ref(tokens, start + 2, end)
+        refs = [target] if target else []
+        if index < end and tokens[index].is_word('USING'):
+            source, _ = read_table_ref(tokens, index + 1, end)
+            if source:
+                refs.append(source)
+        return refs
+    return []
+
+def _from_scopes(tokens: List[Token], start: int, end: int) -> List[_FromScope]:
+    """找出语句中所有查询的 FROM 子句（跳过 EXTRACT(YEAR FROM x) 之类函数参数中的 FROM）"""
+    scopes = []
+    open_parens: List[int] = []
+    for i in range(start, end):
+        tok = tokens[i]
+        if tok.type is TokenType.PUNCT:
+            if tok.value == '(':
+                open_parens.append(i)
+            elif tok.value == ')' and open_parens:
+                open_parens.pop()
+            continue
+        if not tok.is_word('FROM'):
+            continue
+
+        bound = end
+        if open_parens:
+            if not is_query_start(tokens, open_parens[-1] + 1, end):
+                continue
+            close = find_matching_paren(tokens, open_parens[-1])
+            bound = close if close is not None else end
+
+        refs = parse_from_clause(tokens, i + 1, bound)
+        clause_end = find_top_level(tokens, i + 1, bound, *QUERY_CLAUSES)
+        where = None
+        if clause_end < bound and tokens[clause_end].is_word('WHERE'):
+            where = (clause_end + 1, find_top_level(tokens, clause_end + 1, bound, *_AFTER_WHERE))
+        scopes.append(_FromScope(refs, where))
+    return scopes
+
+def extract_joins(text: str, tokens: Optional[List[Token]] = None,
+                  start: int = 0, end: Optional[int] = None) -> StatementJoins:
+    """
+    提取一条语句的别名映射与连接条件
+
+    Args:
+        text: tokens 偏移所对应的文本（未传入 tokens 时即语句文本）
+        tokens: 已有的token流，例如整个存储过程的token
+        start, end: 语句在 tokens 中的下标范围，默认为全部
+    """
+    if tokens is None:
+        tokens = tokenize(text)
+    if end is None:
+        end = len(tokens)
+
+    # 先收集所有表引用建立语句级别名映射，关联子查询中引用的外层别名也能解析
+    scopes = _from_scopes(tokens, start, end)
+    aliases: Dict[str, str] = {}
+    for ref in _statement_targets(tokens, start, end) + [ref for scope in scopes for ref in scope.refs]:
+        key = _ref_key(ref)
+        if key and ref.name:
+            aliases.setdefault(key, ref.name)
+
+    conditions: List[JoinCondition] = []
+
+    def add(column_pair: Tuple[_Column, _Column], tables: Tuple[str, str], join_type: str,
+            cond_start: int, cond_end: int, syntax: str):
+        left, right = column_pair
+        conditions.append(JoinCondition(
+            left_table=tables[0],
+            left_field=left.field,
+            right_table=tables[1],
+            right_field=right.field,
+            join_type=join_type,
+            condition_text=text[tokens[cond_start].start:tokens[cond_end - 1].end],
+            left_alias=left.qualifier,
+            right_alias=right.qualifier,
+            syntax=syntax
+        ))
+
+    for scope in scopes:
+        # 本层 FROM 中的限定名优先；内联视图的别名遮蔽同名的外层别名，但不对应实际表
+        local: Dict[str, Optional[str]] = {}
+        for ref in scope.refs:
+            key = _ref_key(ref)
+            if key:
+                local.setdefault(key, ref.name)
+
+        def resolve(column: _Column, local_only: bool) -> Optional[str]:
+            if column.qualifier is None:
+                return None
+            key = alias_key(column.qualifier)
+            if key in local:
+                return local[key]
+            return None if local_only else aliases.get(key)
+
+        for ref in scope.refs:
+            if ref.condition is None:
+                continue
+            for cond_start, cond_end in split_conjuncts(tokens, *strip_parens(tokens, *ref.condition)):
+                pair = _column_equality(tokens, cond_start, cond_end)
+                if pair is None:
+                    continue
+                tables = (resolve(pair[0], False), resolve(pair[1], False))
+                if tables[0] and tables[1]:
+                    add(pair, tables, ref.join_type, cond_start, cond_end, "ANSI")
+
+        # WHERE 中的连接只在本层 FROM 的两个不同表引用之间识别，关联子查询的条件不计入
+        if scope.where is None or len(scope.refs) < 2:
+            continue
+        for cond_start, cond_end in split_conjuncts(tokens, *scope.where):
+            pair = _column_equality(tokens, cond_start, cond_end)
+            if pair is None:
+                continue
+            left, right = pair
+            tables = (resolve(left, True), resolve(right, True))
+            if not (tables[0] and tables[1]) or alias_key(left.qualifier) == alias_key(right.qualifier):
+                continue
+            if left.outer == right.outer:
+                join_type = "INNER"
+            else:
+                join_type = "LEFT" if right.outer else "RIGHT"
+            add(pair, tables, join_type, cond_start, cond_end, "ORACLE")
+
+    return StatementJoins(aliases, conditions)
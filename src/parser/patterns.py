@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+预编译正则表达式注册表
+
+解析器、分析器与后端中按语句或按参数调用的正则统一在此模块加载时编译一次，
+调用处直接使用编译后的模式对象，避免每次调用都经过 re 模块的缓存查找与参数解析。
+词法分析器的主扫描模式与其分组映射紧密相关，仍定义在 plsql_lexer 中。
+"""
+
+import re
+
+# :参数名 形式的绑定变量
+BIND_PARAMETER = re.compile(r':(\w+)')
+
+# 文本预处理：单行注释、多行注释与连续空白
+LINE_COMMENT = re.compile(r'--.*?\n')
+BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+WHITESPACE = re.compile(r'\s+')
+
+# CREATE [GLOBAL TEMPORARY] TABLE 表名
+CREATE_TABLE = re.compile(r'CREATE\s+(?:GLOBAL\s+TEMPORARY\s+)?TABLE\s+([^\s(]+)', re.IGNORECASE)
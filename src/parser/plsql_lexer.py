@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+from enum import Enum
+from typing import Iterator, List, NamedTuple, Optional
+
+class TokenType(Enum):
+    """PL/SQL词法单元类型"""
+    WORD = "WORD"                  # 关键字或普通标识符
+    QUOTED_IDENT = "QUOTED_IDENT"  # "双引号标识符"
+    STRING = "STRING"              # '字符串'、N'...'、q'[...]'
+    NUMBER = "NUMBER"
+    BIND = "BIND"                  # :name 绑定变量
+    OPERATOR = "OPERATOR"          # := => || <= >= <> != 等
+    PUNCT = "PUNCT"                # ( ) , ; . 以及单字符运算符
+    COMMENT = "COMMENT"            # -- 单行注释 与 /* 多行注释 */
+    OTHER = "OTHER"
+
+class Token(NamedTuple):
+    """词法单元，start/end 为其在原始文本中的偏移"""
+    type: TokenType
+    value: str
+    start: int
+    end: int
+    norm: str  # WORD为大写形式，QUOTED_IDENT为去引号后的内容，其余同value
+
+    def is_word(self, *words: str) -> bool:
+        """判断是否为指定关键字之一（不区分大小写）"""
+        return self.type is TokenType.WORD and self.norm in words
+
+    def is_punct(self, char: str) -> bool:
+        """判断是否为指定标点"""
+        return self.type is TokenType.PUNCT and self.value == char
+
+# 主扫描模式：各分支按优先级排列，一次 match 产生一个词法单元
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<qstring>[nN]?[qQ]'(?:\[.*?\]|\{.*?\}|\(.*?\)|<.*?>|(?P<qd>[^\s\[{(<]).*?(?P=qd))(?:'|\Z))
+  | (?P<string>[nN]?'(?:[^']|'')*(?:'|\Z))
+  | (?P<qident>"[^"]*(?:"|\Z))
+  | (?P<bind>:[^\W\d][\w$#]*)
+  | (?P<number>(?:\d+(?:\.(?!\.)\d*)?|\.\d+)(?:[eE][+-]?\d+)?[fFdD]?)
+  | (?P<word>[^\W\d][\w$#]*)
+  | (?P<operator>:=|=>|\|\||<=|>=|<>|!=|\^=|~=|\.\.|\*\*)
+  | (?P<punct>[(),;.%@=<>+\-*/|!^&:\[\]{}?])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+_GROUP_TYPES = {
+    'comment': TokenType.COMMENT,
+    'qstring': TokenType.STRING,
+    'string': TokenType.STRING,
+    'qident': TokenType.QUOTED_IDENT,
+    'bind': TokenType.BIND,
+    'number': TokenType.NUMBER,
+    'word': TokenType.WORD,
+    'operator': TokenType.OPERATOR,
+    'punct': TokenType.PUNCT,
+    'other': TokenType.OTHER,
+}
+
+def iter_tokens(text: str, start: int = 0, end: Optional[int] = None,
+                include_comments: bool = False) -> Iterator[Token]:
+    """
+    逐个产出 text[start:end] 范围内的词法单元，偏移相对于整个 text，不复制文本
+
+    Args:
+        text: 源代码文本
+        start: 起始偏移
+        end: 结束偏移，默认为文本末尾
+        include_comments: 是否产出注释单元
+    """
+    match = _TOKEN_PATTERN.match
+    group_types = _GROUP_TYPES
+    pos = start
+    length = len(text) if end is None else end
+
+    while pos < length:
+        m = match(text, pos, length)
+        kind = m.lastgroup
+        tok_end = m.end()
+
+        if kind != 'ws' and (include_comments or kind != 'comment'):
+            value = m.group()
+            if kind == 'word':
+                norm = value.upper()
+            elif kind == 'qident':
+                norm = value[1:-1] if value.endswith('"') and len(value) > 1 else value[1:]
+            else:
+                norm = value
+            yield Token(group_types[kind], value, pos, tok_end, norm)
+
+        pos = tok_end
+
+def tokenize(text: str, include_comments: bool = False) -> List[Token]:
+    """
+    对PL/SQL文本进行单遍词法分析
+
+    Args:
+        text: 源代码文本
+        include_comments: 是否在结果中保留注释单元
+
+    Returns:
+        List[Token]: 按出现顺序排列的词法单元（不含空白）
+    """
+    return list(iter_tokens(text, include_comments=include_comments))
+
+def find_matching_paren(tokens: List[Token], open_index: int) -> Optional[int]:
+    """返回与 tokens[open_index] 处左括号匹配的右括号下标"""
+    depth = 0
+    for i in range(open_index, len(tokens)):
+        tok = tokens[i]
+        if tok.type is TokenType.PUNCT:
+            if tok.value == '(':
+                depth += 1
+            elif tok.value == ')':
+                depth -= 1
+                if depth == 0:
+                    return i
+    return None
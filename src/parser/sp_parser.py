@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlparse
-import re
 from typing import List, Dict, Any, Optional
 from models.data_models import (
     StoredProcedureStructure, SQLStatement, SQLStatementType, 
     Parameter, FieldReference, JoinCondition, WhereCondition, StoredProcedure
 )
+from parser.patterns import LINE_COMMENT, BLOCK_COMMENT, WHITESPACE
+from parser.plsql_lexer import Token, TokenType, tokenize, find_matching_paren
+from parser.statement_splitter import iter_statement_spans, iter_declarations, skip_declarations
+from parser.symbol_resolver import SymbolTable, resolve_references, merge_names
 
 class StoredProcedureParser:
     """
@@ -15,21 +17,21 @@ class StoredProcedureParser:
     专注于解析存储过程的结构，识别SQL语句、参数、变量等
     """
     
-    def __init__(self):
-        """初始化解析器"""
-        self.analysis_result = None
-        self.logger = None
-        self.procedure_name = None
-        self.parameters = []
-        self.sql_statements = []
-        self.raw_code = ""
-        self.cursor_declarations = []
-        self.variable_declarations = []
-
+    # 可以解析的程序单元类型
+    UNIT_KEYWORDS = ('PROCEDURE', 'FUNCTION', 'TRIGGER')
+    
+    # 声明区中不属于变量声明的起始关键字
+    NON_VARIABLE_DECLARATIONS = (
+        'CURSOR', 'TYPE', 'SUBTYPE', 'PROCEDURE', 'FUNCTION', 'PRAGMA'
+    )
+    
     def parse(self, procedure_text: str) -> "StoredProcedure":
         """
         解析存储过程文本
         
+        解析过程中的中间结果都是局部变量，解析器实例不保存任何状态，
+        同一个实例可以被多个线程同时调用。
+        
         Args:
             procedure_text: 存储过程的SQL文本
             
@@ -39,30 +41,21 @@ class StoredProcedureParser:
         from models.data_models import StoredProcedure, Parameter, SQLStatement
         
         try:
-            self.raw_code = procedure_text
-            
-            # 提取存储过程名称
-            self.procedure_name = self._extract_procedure_name(procedure_text)
-            
-            # 提取参数
-            self.parameters = self._extract_parameters(procedure_text)
+            # 词法分析只做一次，后续所有提取步骤共享同一个token流
+            tokens = tokenize(procedure_text)
             
-            # 提取SQL语句
-            self.sql_statements = self._extract_sql_statements(procedure_text)
-            
-            # 提取游标声明
-            self.cursor_declarations = self._extract_cursor_declarations(procedure_text)
-            
-            # 提取变量声明
-            self.variable_declarations = self._extract_variable_declarations(procedure_text)
+            # 参数与变量声明构成符号表，用于识别语句中对它们的引用
+            parameters = self._extract_parameters(procedure_text, tokens)
+            variable_declarations = self._extract_variable_declarations(procedure_text, tokens)
+            symbols = SymbolTable.from_declarations(parameters, variable_declarations)
             
             # 创建存储过程对象
             procedure = StoredProcedure(
-                name=self.procedure_name,
-                parameters=self.parameters,
-                sql_statements=self.sql_statements,
-                cursor_declarations=self.cursor_declarations,
-                variable_declarations=self.variable_declarations,
+                name=self._extract_procedure_name(procedure_text, tokens),
+                parameters=parameters,
+                sql_statements=self._extract_sql_statements(procedure_text, tokens, symbols),
+                cursor_declarations=self._extract_cursor_declarations(procedure_text, tokens),
+                variable_declarations=variable_declarations,
                 raw_code=procedure_text
             )
             
@@ -74,139 +67,287 @@ class StoredProcedureParser:
     def _preprocess_text(self, text: str) -> str:
         """预处理文本，清理注释和格式化"""
         # 移除单行注释
-        text = re.sub(r'--.*?\n', '\n', text)
+        text = LINE_COMMENT.sub('\n', text)
         # 移除多行注释
-        text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+        text = BLOCK_COMMENT.sub('', text)
         # 标准化空白字符
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE.sub(' ', text)
         return text.strip()
 
-    def _extract_procedure_name(self, procedure_text: str) -> str:
+    def _find_header(self, tokens: List[Token]) -> Optional[int]:
+        """
+        定位 CREATE [OR REPLACE] PROCEDURE/FUNCTION/TRIGGER 之后名称token的下标
+
+        从包体中拆出的成员子程序没有 CREATE，以 PROCEDURE/FUNCTION 开头。
+        """
+        for i, tok in enumerate(tokens):
+            if not tok.is_word('CREATE'):
+                continue
+            j = i + 1
+            # 跳过 OR REPLACE / EDITIONABLE / NONEDITIONABLE 等修饰
+            while j < len(tokens) and tokens[j].is_word('OR', 'REPLACE', 'EDITIONABLE', 'NONEDITIONABLE'):
+                j += 1
+            if j + 1 < len(tokens) and tokens[j].is_word(*self.UNIT_KEYWORDS):
+                if tokens[j + 1].type in (TokenType.WORD, TokenType.QUOTED_IDENT):
+                    return j + 1
+        if (len(tokens) > 1 and tokens[0].is_word('PROCEDURE', 'FUNCTION')
+                and tokens[1].type in (TokenType.WORD, TokenType.QUOTED_IDENT)):
+            return 1
+        return None
+
+    def _skip_qualified_name(self, tokens: List[Token], index: int) -> int:
+        """跳过 schema.name 形式的限定名，返回其最后一段的下标"""
+        while (index + 2 < len(tokens) and tokens[index + 1].is_punct('.')
+               and tokens[index + 2].type in (TokenType.WORD, TokenType.QUOTED_IDENT)):
+            index += 2
+        return index
+
+    def _extract_procedure_name(self, procedure_text: str, tokens: Optional[List[Token]] = None) -> str:
         """提取存储过程名称"""
-        # 匹配 CREATE [OR REPLACE] PROCEDURE procedure_name
-        pattern = r'CREATE\s+(?:OR\s+REPLACE\s+)?PROCEDURE\s+(\w+)'
-        match = re.search(pattern, procedure_text, re.IGNORECASE)
+        if tokens is None:
+            tokens = tokenize(procedure_text)
         
-        if match:
-            return match.group(1)
+        # 匹配 CREATE [OR REPLACE] PROCEDURE [schema.]procedure_name
+        name_index = self._find_header(tokens)
+        if name_index is not None:
+            name_token = tokens[self._skip_qualified_name(tokens, name_index)]
+            return name_token.norm if name_token.type is TokenType.QUOTED_IDENT else name_token.value
         
         # 如果没有找到，返回默认名称
         return "unknown_procedure"
 
-    def _extract_parameters(self, procedure_text: str) -> List["Parameter"]:
+    def _extract_parameters(self, procedure_text: str, tokens: Optional[List[Token]] = None) -> List["Parameter"]:
         """提取存储过程参数"""
-        from models.data_models import Parameter
-        import re
+        if tokens is None:
+            tokens = tokenize(procedure_text)
         
         parameters = []
         
-        # 匹配参数定义 (param_name IN/OUT/INOUT datatype)
-        # 简化的正则表达式，匹配括号内的参数
-        param_pattern = r'\(\s*([^)]+)\s*\)'
-        proc_match = re.search(r'PROCEDURE\s+\w+\s*' + param_pattern, procedure_text, re.IGNORECASE | re.DOTALL)
+        name_index = self._find_header(tokens)
+        if name_index is None:
+            return parameters
         
-        if proc_match:
-            param_text = proc_match.group(1)
-            
-            # 分割参数（按逗号）
-            param_list = [p.strip() for p in param_text.split(',')]
-            
-            for param_def in param_list:
-                if param_def.strip():
-                    param = self._parse_single_parameter(param_def)
-                    if param:
-                        parameters.append(param)
+        open_index = self._skip_qualified_name(tokens, name_index) + 1
+        if open_index >= len(tokens) or not tokens[open_index].is_punct('('):
+            return parameters
+        close_index = find_matching_paren(tokens, open_index)
+        if close_index is None:
+            return parameters
+        
+        # 按括号深度为1的逗号分割参数，避免误拆 NUMBER(10,2)
+        depth = 0
+        param_start = open_index + 1
+        for i in range(open_index + 1, close_index + 1):
+            tok = tokens[i]
+            if tok.is_punct('('):
+                depth += 1
+            elif tok.is_punct(')') and depth > 0:
+                depth -= 1
+            elif depth == 0 and (tok.is_punct(',') or i == close_index):
+                param = self._parse_single_parameter(procedure_text, tokens[param_start:i])
+                if param:
+                    parameters.append(param)
+                param_start = i + 1
         
         return parameters
 
-    def _parse_single_parameter(self, param_def: str) -> Optional["Parameter"]:
-        """解析单个参数定义"""
-        from models.data_models import Parameter
-        import re
+    def _parse_single_parameter(self, procedure_text: str, param_tokens: List[Token]) -> Optional["Parameter"]:
+        """解析单个参数定义: param_name [IN|OUT|IN OUT] [NOCOPY] datatype [:= | DEFAULT value]"""
+        if len(param_tokens) < 2 or param_tokens[0].type not in (TokenType.WORD, TokenType.QUOTED_IDENT):
+            return None
         
-        # 匹配格式: param_name [IN|OUT|INOUT] datatype
-        pattern = r'(\w+)\s+(IN|OUT|INOUT)?\s*(\w+(?:\(\d+\))?)'
-        match = re.search(pattern, param_def.strip(), re.IGNORECASE)
+        param_name = param_tokens[0].value
+        index = 1
         
-        if match:
-            param_name = match.group(1)
-            direction = (match.group(2) or "IN").upper()
-            data_type = match.group(3)
-            
-            return Parameter(
-                name=param_name,
-                direction=direction,
-                data_type=data_type
-            )
+        direction = "IN"
+        if param_tokens[index].is_word('IN'):
+            index += 1
+            if index < len(param_tokens) and param_tokens[index].is_word('OUT'):
+                direction = "INOUT"
+                index += 1
+        elif param_tokens[index].is_word('OUT', 'INOUT'):
+            direction = param_tokens[index].norm
+            index += 1
+        if index < len(param_tokens) and param_tokens[index].is_word('NOCOPY'):
+            index += 1
+        if index >= len(param_tokens):
+            return None
         
-        return None
+        # 数据类型截止到 DEFAULT 或 := 之前
+        type_end = len(param_tokens)
+        default_value = None
+        for i in range(index, len(param_tokens)):
+            tok = param_tokens[i]
+            if tok.is_word('DEFAULT') or (tok.type is TokenType.OPERATOR and tok.value == ':='):
+                type_end = i
+                if i + 1 < len(param_tokens):
+                    default_value = procedure_text[param_tokens[i + 1].start:param_tokens[-1].end]
+                break
+        if type_end == index:
+            return None
+        
+        data_type = procedure_text[param_tokens[index].start:param_tokens[type_end - 1].end]
+        
+        return Parameter(
+            name=param_name,
+            direction=direction,
+            data_type=data_type,
+            default_value=default_value
+        )
 
-    def _extract_sql_statements(self, procedure_text: str) -> List["SQLStatement"]:
-        """提取存储过程中的SQL语句"""
+    def _extract_sql_statements(self, procedure_text: str, tokens: Optional[List[Token]] = None,
+                                symbols: Optional[SymbolTable] = None) -> List["SQLStatement"]:
+        """
+        提取存储过程中的SQL语句
+        
+        除 :name 绑定变量外，还根据符号表识别语句中不带冒号直接引用的参数与变量
+        （如 WHERE department_id = p_dept_id），未传入符号表时根据声明现场构建。
+        """
         from models.data_models import SQLStatement, StatementType
         from parser.sql_parser import SQLStatementParser
         
+        if tokens is None:
+            tokens = tokenize(procedure_text)
+        if symbols is None:
+            symbols = SymbolTable.from_declarations(
+                self._extract_parameters(procedure_text, tokens),
+                self._extract_variable_declarations(procedure_text, tokens)
+            )
+        
         statements = []
         
-        # 提取BEGIN...END之间的内容
-        begin_match = re.search(r'BEGIN\s+(.*)\s+END', procedure_text, re.IGNORECASE | re.DOTALL)
-        if begin_match:
-            body = begin_match.group(1)
-            
-            # 简单地按分号分割语句
-            sql_lines = [line.strip() for line in body.split(';') if line.strip()]
-            
-            parser = SQLStatementParser()
+        begin_index = self._find_body_begin(tokens)
+        if begin_index is None:
+            return statements
+        
+        parser = SQLStatementParser()
+        
+        # 按块结构切分语句，只得到偏移量，需要时才截取文本
+        spans = iter_statement_spans(tokens, begin_index)
+        
+        for i, span in enumerate(spans):
+            # 单独的 NULL; / END; 不是SQL语句，直接根据token判断，无需截取文本
+            if span.token_end - span.token_start == 1 and tokens[span.token_start].is_word('NULL', 'END'):
+                continue
+                
+            # 语句只保存对共享源文本的偏移引用
+            text_span = (span.start, span.end)
+            try:
+                stmt = parser.parse(procedure_text[span.start:span.end], source=procedure_text, span=text_span,
+                                    tokens=tokens, token_span=(span.token_start, span.token_end))
+                stmt.statement_id = i + 1  # 重新编号
+                statements.append(stmt)
+            except Exception:
+                # 如果解析失败，创建一个基本的语句对象
+                stmt = SQLStatement(
+                    statement_id=i + 1,
+                    statement_type=StatementType.OTHER,
+                    source=procedure_text,
+                    span=text_span,
+                    source_tables=[],
+                    target_tables=[]
+                )
+                statements.append(stmt)
             
-            for i, sql_line in enumerate(sql_lines):
-                if sql_line.upper().strip() in ['', 'NULL', 'END']:
-                    continue
-                    
-                try:
-                    stmt = parser.parse(sql_line)
-                    stmt.statement_id = i + 1  # 重新编号
-                    statements.append(stmt)
-                except:
-                    # 如果解析失败，创建一个基本的语句对象
-                    stmt = SQLStatement(
-                        statement_id=i + 1,
-                        statement_type=StatementType.OTHER,
-                        raw_sql=sql_line,
-                        source_tables=[],
-                        target_tables=[]
-                    )
-                    statements.append(stmt)
+            references = resolve_references(tokens, span.token_start, span.token_end, symbols)
+            stmt.parameters_used = merge_names(stmt.parameters_used, references.parameters)
+            stmt.variables_used = references.variables
         
         return statements
 
-    def _extract_cursor_declarations(self, text: str) -> List[Dict[str, Any]]:
+    def _declaration_start(self, tokens: List[Token]) -> Optional[int]:
+        """返回声明区（IS/AS 或 DECLARE 之后）首个token的下标"""
+        name_index = self._find_header(tokens)
+        if name_index is None:
+            return next((i + 1 for i, tok in enumerate(tokens) if tok.is_word('DECLARE')), None)
+        
+        i = self._skip_qualified_name(tokens, name_index) + 1
+        if i < len(tokens) and tokens[i].is_punct('('):
+            close_index = find_matching_paren(tokens, i)
+            i = close_index + 1 if close_index is not None else i
+        # 函数的 RETURN 子句、触发器的触发事件都在 IS/AS 或 DECLARE 之前；
+        # 触发器 REFERENCING NEW AS n 中的 AS 不是声明区的开始
+        while i < len(tokens):
+            tok = tokens[i]
+            if tok.is_word('BEGIN'):
+                return None
+            if tok.is_word('IS', 'DECLARE') or (tok.is_word('AS') and not tokens[i - 1].is_word('NEW', 'OLD', 'PARENT')):
+                return i + 1
+            i += 1
+        return None
+
+    def _find_body_begin(self, tokens: List[Token]) -> Optional[int]:
+        """定位过程主体的BEGIN，跳过声明区中嵌套子程序自身的BEGIN"""
+        section_start = self._declaration_start(tokens)
+        if section_start is not None:
+            begin_index = skip_declarations(tokens, section_start)
+        else:
+            begin_index = next((i for i, tok in enumerate(tokens) if tok.is_word('BEGIN')), len(tokens))
+        return begin_index if begin_index < len(tokens) else None
+
+    def _split_declarations(self, tokens: List[Token]) -> List[List[Token]]:
+        """将声明区按分号切分为单条声明"""
+        section_start = self._declaration_start(tokens)
+        if section_start is None:
+            return []
+        return [tokens[start:end] for start, end in iter_declarations(tokens, section_start)]
+
+    def _extract_cursor_declarations(self, text: str, tokens: Optional[List[Token]] = None) -> List[Dict[str, Any]]:
         """提取游标声明"""
-        cursors = []
+        if tokens is None:
+            tokens = tokenize(text)
         
-        cursor_pattern = r'CURSOR\s+(\w+)\s+IS\s+(.*?);'
-        matches = re.finditer(cursor_pattern, text, re.IGNORECASE | re.DOTALL)
+        cursors = []
         
-        for match in matches:
+        # CURSOR name [(params)] [RETURN type] IS select_statement;
+        for decl in self._split_declarations(tokens):
+            if len(decl) < 4 or not decl[0].is_word('CURSOR'):
+                continue
+            is_index = next((i for i in range(2, len(decl)) if decl[i].is_word('IS')), None)
+            if is_index is None or is_index + 1 >= len(decl):
+                continue
             cursors.append({
-                'name': match.group(1),
-                'definition': match.group(2).strip()
+                'name': decl[1].value,
+                'definition': text[decl[is_index + 1].start:decl[-1].end]
             })
         
         return cursors
 
-    def _extract_variable_declarations(self, text: str) -> List[Dict[str, Any]]:
+    def _extract_variable_declarations(self, text: str, tokens: Optional[List[Token]] = None) -> List[Dict[str, Any]]:
         """提取变量声明"""
-        variables = []
+        if tokens is None:
+            tokens = tokenize(text)
         
-        # 匹配变量声明
-        var_pattern = r'(\w+)\s+(\w+(?:\([^)]+\))?)\s*(?::=\s*([^;]+))?;'
-        matches = re.finditer(var_pattern, text, re.IGNORECASE)
+        variables = []
         
-        for match in matches:
+        # name [CONSTANT] datatype [NOT NULL] [:= | DEFAULT initial_value];
+        for decl in self._split_declarations(tokens):
+            if len(decl) < 2 or decl[0].type not in (TokenType.WORD, TokenType.QUOTED_IDENT):
+                continue
+            if decl[0].is_word(*self.NON_VARIABLE_DECLARATIONS):
+                continue
+            
+            type_start = 2 if decl[1].is_word('CONSTANT') else 1
+            if type_start >= len(decl):
+                continue
+            type_end = len(decl)
+            initial_value = None
+            for i in range(type_start, len(decl)):
+                tok = decl[i]
+                if tok.is_word('DEFAULT') or (tok.type is TokenType.OPERATOR and tok.value == ':='):
+                    type_end = i
+                    if i + 1 < len(decl):
+                        initial_value = text[decl[i + 1].start:decl[-1].end]
+                    break
+            if type_end - type_start >= 2 and decl[type_end - 2].is_word('NOT') and decl[type_end - 1].is_word('NULL'):
+                type_end -= 2
+            if type_end <= type_start:
+                continue
+            
             variables.append({
-                'name': match.group(1),
-                'type': match.group(2),
-                'initial_value': match.group(3).strip() if match.group(3) else None
+                'name': decl[0].value,
+                'type': text[decl[type_start].start:decl[type_end - 1].end],
+                'initial_value': initial_value
             })
         
         return variables
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQL子句的token级解析工具
+
+在一条语句的token流上定位顶层关键字、按顶层逗号切分、解析 FROM 子句中的表引用
+与 SELECT 列表。所有函数只处理 tokens[start:end] 范围内的下标，不复制文本；
+“顶层”指不在括号内、也不在 CASE ... END 表达式内。
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from parser.plsql_lexer import Token, TokenType, find_matching_paren
+
+# 查询中 FROM 子句之后的子句关键字（顶层出现时结束 FROM 子句）
+QUERY_CLAUSES = (
+    'WHERE', 'GROUP', 'HAVING', 'ORDER', 'CONNECT', 'START', 'UNION', 'INTERSECT',
+    'MINUS', 'MODEL', 'FOR', 'FETCH', 'OFFSET',
+)
+
+# DML 语句中的子句关键字
+DML_CLAUSES = ('SET', 'ON', 'USING', 'VALUES', 'SELECT', 'RETURNING', 'RETURN', 'LOG', 'WHEN')
+
+# 连接类型关键字
+JOIN_KEYWORDS = ('JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS', 'NATURAL')
+
+# 集合运算
+SET_OPERATORS = ('UNION', 'INTERSECT', 'MINUS')
+
+# 不能作为表别名或列别名的关键字
+_NON_ALIAS = frozenset(QUERY_CLAUSES + DML_CLAUSES + JOIN_KEYWORDS + (
+    'AS', 'FROM', 'INTO', 'PARTITION', 'SAMPLE', 'PIVOT', 'UNPIVOT', 'END', 'AND', 'OR',
+    'NOT', 'IS', 'NULL', 'IN', 'LIKE', 'BETWEEN', 'ELSE', 'THEN', 'DEFAULT',
+))
+
+# 出现在列别名之前时说明表达式尚未结束的关键字
+_OPERATOR_WORDS = frozenset(('AND', 'OR', 'NOT', 'IS', 'IN', 'LIKE', 'BETWEEN', 'WHEN',
+                             'THEN', 'ELSE', 'CASE', 'PRIOR', 'DISTINCT', 'ALL', 'ANY', 'SOME'))
+
+class TableRef(NamedTuple):
+    """FROM 子句（或 DML 目标）中的一个表引用"""
+    name: Optional[str]                     # 表名（含模式名，如 hr.employees）；子查询等为 None
+    alias: Optional[str]                    # 别名
+    join_type: Optional[str] = None         # 以 JOIN 连接时的连接类型；逗号分隔或首个表为 None
+    query: Optional[Tuple[int, int]] = None      # 子查询的token范围（不含括号）
+    condition: Optional[Tuple[int, int]] = None  # JOIN ... ON 条件的token范围
+
+class SelectItem(NamedTuple):
+    """SELECT 列表中的一项"""
+    start: int           # 表达式起始token下标
+    end: int             # 表达式结束token下标（不含别名）
+    name: Optional[str]  # 输出列名：别名，或单独的列引用的列名；无法确定时为 None
+    star: bool = False   # * 或 别名.*
+
+class QueryBlock(NamedTuple):
+    """一个 SELECT 查询块（集合运算的一个分支）"""
+    items: List[SelectItem]
+    tables: List[TableRef]
+    where: Optional[Tuple[int, int]]  # WHERE 条件的token范围
+
+def identifier(tok: Token) -> str:
+    """标识符的显示名称：普通标识符保持原写法，双引号标识符去掉引号"""
+    return tok.norm if tok.type is TokenType.QUOTED_IDENT else tok.value
+
+def is_identifier(tok: Token) -> bool:
+    return tok.type is TokenType.WORD or tok.type is TokenType.QUOTED_IDENT
+
+def find_top_level(tokens: List[Token], start: int, end: int, *words: str) -> int:
+    """返回 tokens[start:end] 中第一个顶层关键字的下标，找不到时返回 end"""
+    paren_depth = 0
+    case_depth = 0
+    for i in range(start, end):
+        tok = tokens[i]
+        if tok.type is TokenType.PUNCT:
+            if tok.value == '(':
+                paren_depth += 1
+            elif tok.value == ')':
+                paren_depth -= 1
+        elif tok.type is TokenType.WORD and paren_depth == 0:
+            if tok.norm == 'CASE':
+                case_depth += 1
+            elif tok.norm == 'END' and case_depth:
+                case_depth -= 1
+            elif case_depth == 0 and tok.norm in words:
+                return i
+    return end
+
+def find_top_level_punct(tokens: List[Token], start: int, end: int, char: str) -> int:
+    """返回 tokens[start:end] 中第一个顶层标点的下标，找不到时返回 end"""
+    depth = 0
+    for i in range(start, end):
+        tok = tokens[i]
+        if tok.type is not TokenType.PUNCT:
+            continue
+        if tok.value == '(':
+            depth += 1
+        elif tok.value == ')':
+            depth -= 1
+        elif depth == 0 and tok.value == char:
+            return i
+    return end
+
+def split_top_level(tokens: List[Token], start: int, end: int, separator: str = ',') -> List[Tuple[int, int]]:
+    """按顶层分隔符切分 tokens[start:end]，返回各段的 (起, 止) 下标"""
+    parts = []
+    depth = 0
+    part_start = start
+    for i in range(start, end):
+        tok = tokens[i]
+        if tok.type is not TokenType.PUNCT:
+            continue
+        if tok.value == '(':
+            depth += 1
+        elif tok.value == ')':
+            depth -= 1
+        elif depth == 0 and tok.value == separator:
+            parts.append((part_start, i))
+            part_start = i + 1
+    if part_start < end:
+        parts.append((part_start, end))
+    return parts
+
+def split_conjuncts(tokens: List[Token], start: int, end: int) -> List[Tuple[int, int]]:
+    """按顶层 AND 切分条件（BETWEEN x AND y 中的 AND 不切分）"""
+    parts = []
+    part_start = start
+    index = start
+    between = False
+    while True:
+        index = find_top_level(tokens, index, end, 'AND', 'BETWEEN')
+        if index >= end:
+            break
+        if tokens[index].norm == 'BETWEEN':
+            between = True
+        elif between:
+            between = False
+        else:
+            parts.append((part_start, index))
+            part_start = index + 1
+        index += 1
+    if part_start < end:
+        parts.append((part_start, end))
+    return parts
+
+def strip_parens(tokens: List[Token], start: int, end: int) -> Tuple[int, int]:
+    """去掉包裹整个范围的括号，如 ((SELECT ...)) -> SELECT ..."""
+    while end - start >= 2 and tokens[start].is_punct('(') and find_matching_paren(tokens, start) == end - 1:
+        start += 1
+        end -= 1
+    return start, end
+
+def is_query_start(tokens: List[Token], index: int, end: int) -> bool:
+    """tokens[index] 是否为查询的开始（SELECT、WITH，或括号包裹的查询）"""
+    while index < end and tokens[index].is_punct('('):
+        index += 1
+    return index < end and tokens[index].is_word('SELECT', 'WITH')
+
+def column_list(tokens: List[Token], start: int, end: int) -> List[str]:
+    """解析 (列1, 列2, ...) 形式的列名列表（start 为左括号之后），限定名只保留列名"""
+    columns = []
+    for part_start, part_end in split_top_level(tokens, start, end):
+        # 每项以（可限定的）列名开头，之后可以有约束等修饰
+        index = part_start
+        if not is_identifier(tokens[index]):
+            continue
+        while index + 2 < part_end and tokens[index + 1].is_punct('.') and is_identifier(tokens[index + 2]):
+            index += 2
+        columns.append(identifier(tokens[index]))
+    return columns
+
+def read_table_ref(tokens: List[Token], index: int, end: int) -> Tuple[Optional[TableRef], int]:
+    """
+    从 tokens[index] 读取一个表引用：表名[@dblink] [AS] [别名]，或 (子查询) [别名]
+
+    Returns:
+        (表引用, 表引用之后的下标)；不是表引用时返回 (None, index)
+    """
+    if index >= end:
+        return None, index
+
+    name = None
+    query = None
+    tok = tokens[index]
+    if tok.is_punct('('):
+        close = find_matching_paren(tokens, index)
+        if close is None or close >= end:
+            return None, index
+        inner = strip_parens(tokens, index + 1, close)
+        query = inner if is_query_start(tokens, inner[0], inner[1]) else None
+        index = close + 1
+    elif tok.is_word('TABLE', 'LATERAL') and index + 1 < end and tokens[index + 1].is_punct('('):
+        close = find_matching_paren(tokens, index + 1)
+        if close is None or close >= end:
+            return None, index
+        index = close + 1
+    elif is_identifier(tok) and not (tok.type is TokenType.WORD and tok.norm in _NON_ALIAS):
+        parts = [identifier(tok)]
+        index += 1
+        while index + 1 < end and tokens[index].is_punct('.') and is_identifier(tokens[index + 1]):
+            parts.append(identifier(tokens[index + 1]))
+            index += 2
+        name = '.'.join(parts)
+        # @dblink
+        if index + 1 < end and tokens[index].is_punct('@') and is_identifier(tokens[index + 1]):
+            index += 2
+            while index + 1 < end and tokens[index].is_punct('.') and is_identifier(tokens[index + 1]):
+                index += 2
+    else:
+        return None, index
+
+    # PARTITION (p) / SAMPLE (n)
+    while index + 1 < end and tokens[index].is_word('PARTITION', 'SUBPARTITION', 'SAMPLE') \
+            and tokens[index + 1].is_punct('('):
+        close = find_matching_paren(tokens, index + 1)
+        index = close + 1 if close is not None else end
+
+    alias = None
+    if index < end and tokens[index].is_word('AS'):
+        index += 1
+    if index < end and is_identifier(tokens[index]) \
+            and not (tokens[index].type is TokenType.WORD and tokens[index].norm in _NON_ALIAS):
+        alias = identifier(tokens[index])
+        index += 1
+
+    return TableRef(name, alias, query=query), index
+
+def _join_type(tokens: List[Token], start: int, join_index: int) -> str:
+    """根据 JOIN 之前的修饰关键字确定连接类型"""
+    words = {tokens[i].norm for i in range(start, join_index)}
+    for join_type in ('LEFT', 'RIGHT', 'FULL', 'CROSS'):
+        if join_type in words:
+            return join_type
+    return 'INNER'
+
+def parse_from_clause(tokens: List[Token], start: int, end: int) -> List[TableRef]:
+    """
+    解析 FROM 子句（start 为 FROM 之后）中的所有表引用
+
+    支持逗号分隔与 ANSI JOIN（INNER/LEFT/RIGHT/FULL [OUTER]/CROSS/NATURAL JOIN ... ON/USING），
+    JOIN 引入的表记录连接类型与 ON 条件的token范围。
+    """
+    end = find_top_level(tokens, start, end, *QUERY_CLAUSES)
+    refs: List[TableRef] = []
+
+    for item_start, item_end in split_top_level(tokens, start, end):
+        ref, index = read_table_ref(tokens, item_start, item_end)
+        if ref is not None:
+            refs.append(ref)
+
+        while index < item_end:
+            modifiers_start = index
+            while index < item_end and tokens[index].is_word(*JOIN_KEYWORDS) and not tokens[index].is_word('JOIN'):
+                index += 1
+            if index >= item_end or not tokens[index].is_word('JOIN'):
+                index = max(index, modifiers_start + 1)
+                continue
+            join_type = _join_type(tokens, modifiers_start, index)
+            ref, index = read_table_ref(tokens, index + 1, item_end)
+            if ref is None:
+                continue
+
+            condition = None
+            if index < item_end and tokens[index].is_word('ON'):
+                cond_end = find_top_level(tokens, index + 1, item_end, *JOIN_KEYWORDS)
+                condition = (index + 1, cond_end)
+                index = cond_end
+            elif index < item_end and tokens[index].is_word('USING') \
+                    and index + 1 < item_end and tokens[index + 1].is_punct('('):
+                close = find_matching_paren(tokens, index + 1)
+                index = close + 1 if close is not None else item_end
+            refs.append(ref._replace(join_type=join_type, condition=condition))
+
+    return refs
+
+def parse_select_list(tokens: List[Token], start: int, end: int) -> List[SelectItem]:
+    """解析 SELECT 列表（start 为 SELECT 之后，end 为顶层 FROM/INTO）"""
+    if start < end and tokens[start].is_word('DISTINCT', 'UNIQUE', 'ALL'):
+        start += 1
+
+    items = []
+    for item_start, item_end in split_top_level(tokens, start, end):
+        last = tokens[item_end - 1]
+        if last.is_punct('*'):
+            items.append(SelectItem(item_start, item_end, None, star=True))
+            continue
+
+        # 列别名：表达式之后的 [AS] 标识符
+        name = None
+        expr_end = item_end
+        if item_end - item_start >= 2 and is_identifier(last) \
+                and not (last.type is TokenType.WORD and last.norm in _NON_ALIAS) \
+                and _ends_expression(tokens[item_end - 2]):
+            name = identifier(last)
+            expr_end = item_end - 1
+            if expr_end - item_start >= 2 and tokens[expr_end - 1].is_word('AS'):
+                expr_end -= 1
+        elif is_identifier(last) and (item_end - item_start == 1 or tokens[item_end - 2].is_punct('.')):
+            # 单独的列引用，输出列名即列名
+            name = identifier(last)
+        items.append(SelectItem(item_start, expr_end, name))
+    return items
+
+def _ends_expression(tok: Token) -> bool:
+    """tok 之后的标识符能否是列别名：tok 须是 AS 或能结束一个表达式的token"""
+    if tok.type is TokenType.WORD:
+        return tok.norm not in _OPERATOR_WORDS
+    if tok.type is TokenType.PUNCT:
+        return tok.value == ')'
+    return tok.type is not TokenType.OPERATOR
+
+def parse_query(tokens: List[Token], start: int, end: int) -> Tuple[List[QueryBlock], Dict[str, Tuple[int, int]]]:
+    """
+    解析一个查询：[WITH 公用表表达式] SELECT ... [UNION ... SELECT ...]
+
+    Returns:
+        (各集合运算分支的查询块, 公用表表达式 名称键 -> 查询token范围)
+    """
+    start, end = strip_parens(tokens, start, end)
+    ctes: Dict[str, Tuple[int, int]] = {}
+
+    # WITH name [(cols)] AS (query) [, ...]
+    if start < end and tokens[start].is_word('WITH'):
+        index = start + 1
+        while index < end and is_identifier(tokens[index]):
+            name_tok = tokens[index]
+            index += 1
+            if index < end and tokens[index].is_punct('('):
+                close = find_matching_paren(tokens, index)
+                index = close + 1 if close is not None else end
+            if index + 1 >= end or not tokens[index].is_word('AS') or not tokens[index + 1].is_punct('('):
+                break
+            close = find_matching_paren(tokens, index + 1)
+            if close is None:
+                break
+            ctes[name_tok.norm] = strip_parens(tokens, index + 2, close)
+            index = close + 1
+            if index < end and tokens[index].is_punct(','):
+                index += 1
+            else:
+                break
+        start = index
+
+    blocks = []
+    branch_start = start
+    while branch_start < end:
+        branch_end = find_top_level(tokens, branch_start, end, *SET_OPERATORS)
+        block = _parse_query_block(tokens, branch_start, branch_end)
+        if block is not None:
+            blocks.append(block)
+        branch_start = branch_end + 1
+        if branch_start < end and tokens[branch_start].is_word('ALL'):
+            branch_start += 1
+    return blocks, ctes
+
+def _parse_query_block(tokens: List[Token], start: int, end: int) -> Optional[QueryBlock]:
+    """解析单个 SELECT 查询块"""
+    start, end = strip_parens(tokens, start, end)
+    if start >= end or not tokens[start].is_word('SELECT'):
+        return None
+
+    from_index = find_top_level(tokens, start + 1, end, 'FROM', 'INTO')
+    items = parse_select_list(tokens, start + 1, from_index)
+    if from_index < end and tokens[from_index].is_word('INTO'):
+        from_index = find_top_level(tokens, from_index + 1, end, 'FROM')
+    tables = parse_from_clause(tokens, from_index + 1, end) if from_index < end else []
+
+    where = None
+    where_index = find_top_level(tokens, from_index, end, 'WHERE')
+    if where_index < end:
+        where_end = find_top_level(tokens, where_index + 1, end,
+                                   'GROUP', 'HAVING', 'ORDER', 'CONNECT', 'START', 'MODEL', 'FOR', 'FETCH', 'OFFSET')
+        where = (where_index + 1, where_end)
+    return QueryBlock(items, tables, where)
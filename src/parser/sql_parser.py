@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import sqlparse
-from typing import List, Dict, Any
-from models.data_models import SQLStatement, StatementType
+from typing import List, Dict, Any, Optional, Tuple
+from models.data_models import SQLStatement, StatementType, JoinCondition
+from parser.join_extractor import extract_joins
+from parser.patterns import BIND_PARAMETER
+from parser.plsql_lexer import Token
 
 class SQLParser:
     def __init__(self):
@@ -74,36 +77,57 @@ class SQLParser:
         # 实现条件提取逻辑
         return conditions
 
+_DML_KEYWORDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+def _mentions_create_table(sql_text: str) -> bool:
+    """语句中（包括 EXECUTE IMMEDIATE 的动态SQL字符串中）出现 CREATE ... TABLE"""
+    sql_upper = sql_text.upper()
+    return 'CREATE' in sql_upper and 'TABLE' in sql_upper
+
 class SQLStatementParser:
     """SQL语句解析器（兼容测试）"""
     
     def __init__(self):
         self.statement_counter = 0
     
-    def parse(self, sql_text: str) -> SQLStatement:
-        """解析单个SQL语句"""
+    def parse(self, sql_text: str, source: Optional[str] = None, span: Optional[Tuple[int, int]] = None,
+              tokens: Optional[List[Token]] = None, token_span: Optional[Tuple[int, int]] = None) -> SQLStatement:
+        """
+        解析单个SQL语句
+        
+        Args:
+            sql_text: 语句文本
+            source: 语句所在的完整源文本，与span同时提供时语句只保存偏移引用
+            span: 语句在source中的 (start, end) 偏移
+            tokens: source 的token流，与token_span同时提供时直接复用，不再对语句重新分词
+            token_span: 语句在tokens中的 (start, end) 下标
+        """
         self.statement_counter += 1
         
-        # 简单的语句类型检测
-        sql_upper = sql_text.upper().strip()
+        # 简单的语句类型检测：有token流时直接使用首个关键字的规范形式，不再复制并大写整个语句
+        if tokens is not None and token_span is not None:
+            keyword = tokens[token_span[0]].norm if token_span[0] < token_span[1] else ''
+        else:
+            sql_upper = sql_text.upper().strip()
+            keyword = next((word for word in _DML_KEYWORDS if sql_upper.startswith(word)), '')
         
-        if sql_upper.startswith('SELECT'):
+        if keyword == 'SELECT':
             stmt_type = StatementType.SELECT
             source_tables = self._extract_table_names(sql_text)
             target_tables = []
-        elif sql_upper.startswith('INSERT'):
+        elif keyword == 'INSERT':
             stmt_type = StatementType.INSERT
             source_tables = self._extract_source_tables_from_insert(sql_text)
             target_tables = self._extract_target_tables_from_insert(sql_text)
-        elif sql_upper.startswith('UPDATE'):
+        elif keyword == 'UPDATE':
             stmt_type = StatementType.UPDATE
             target_tables = self._extract_table_names(sql_text)
             source_tables = target_tables  # UPDATE既读又写
-        elif sql_upper.startswith('DELETE'):
+        elif keyword == 'DELETE':
             stmt_type = StatementType.DELETE
             target_tables = self._extract_table_names(sql_text)
             source_tables = []
-        elif 'CREATE' in sql_upper and 'TABLE' in sql_upper:
+        elif _mentions_create_table(sql_text):
             stmt_type = StatementType.CREATE_TABLE
             target_tables = self._extract_created_table_name(sql_text)
             source_tables = self._extract_source_tables_from_create(sql_text)
@@ -112,15 +136,26 @@ class SQLStatementParser:
             source_tables = []
             target_tables = []
         
-        return SQLStatement(
+        text_ref = {'source': source, 'span': span} if source is not None and span is not None else {'raw_sql': sql_text}
+        
+        if tokens is not None and token_span is not None and source is not None:
+            joins = extract_joins(source, tokens, *token_span)
+        else:
+            joins = extract_joins(sql_text)
+        
+        statement = SQLStatement(
             statement_id=self.statement_counter,
             statement_type=stmt_type,
-            raw_sql=sql_text,
+            **text_ref,
             source_tables=source_tables,
             target_tables=target_tables,
-            join_conditions=self._extract_join_conditions(sql_text),
+            join_conditions=joins.conditions,
+            table_aliases=joins.aliases,
             parameters_used=self._extract_parameters(sql_text)
         )
+        if tokens is not None and token_span is not None and source is not None:
+            statement.bind_tokens(tokens, token_span)
+        return statement
     
     def _extract_table_names(self, sql_text: str) -> List[str]:
         """提取表名"""
@@ -169,23 +204,17 @@ class SQLStatementParser:
             return self._extract_table_names(select_part)
         return []
     
-    def _extract_join_conditions(self, sql_text: str) -> List[str]:
-        """提取JOIN条件"""
-        # 简化的JOIN条件提取
-        conditions = []
-        if 'JOIN' in sql_text.upper() and 'ON' in sql_text.upper():
-            # 这里应该有更复杂的逻辑来解析JOIN条件
-            conditions.append("JOIN condition extracted")
-        return conditions
+    def _extract_join_conditions(self, sql_text: str) -> List[JoinCondition]:
+        """提取JOIN条件（ANSI JOIN ... ON 与 Oracle WHERE 连接），表名已按语句中的别名解析"""
+        return extract_joins(sql_text).conditions
     
     def _extract_parameters(self, sql_text: str) -> List[str]:
         """提取参数"""
         # 查找?占位符或:参数名
         parameters = []
-        import re
         
         # 查找:参数名格式
-        param_matches = re.findall(r':(\w+)', sql_text)
+        param_matches = BIND_PARAMETER.findall(sql_text)
         parameters.extend(param_matches)
         
         # 查找?占位符（假设按顺序命名）
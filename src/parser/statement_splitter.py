@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Iterator, List, NamedTuple, Tuple
+from parser.plsql_lexer import Token, TokenType
+
+class StatementSpan(NamedTuple):
+    """语句在原始文本中的位置（不含结尾分号）"""
+    start: int        # 文本起始偏移
+    end: int          # 文本结束偏移
+    token_start: int  # 首个token下标
+    token_end: int    # 结尾分号token下标（不含）
+    depth: int        # 所在块的嵌套深度，过程主体为1
+
+# 块栈中的块类型
+_BLOCK = 'BLOCK'
+_HANDLER = 'HANDLER'
+_IF = 'IF'
+_LOOP = 'LOOP'
+_CASE = 'CASE'
+
+# FORALL 头部之后可以出现的DML关键字
+_FORALL_DML = ('INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXECUTE')
+
+def _skip_to_semicolon(tokens: List[Token], index: int) -> int:
+    """返回从index开始的第一个分号下标"""
+    n = len(tokens)
+    while index < n and not tokens[index].is_punct(';'):
+        index += 1
+    return index
+
+def _skip_to_word(tokens: List[Token], index: int, *words: str) -> int:
+    """
+    返回从index开始第一个处于顶层（不在括号或CASE表达式内）的关键字下标，
+    用于跳过 IF/ELSIF/WHEN 的条件以及 WHILE/FOR 循环头
+    """
+    n = len(tokens)
+    paren_depth = 0
+    case_depth = 0
+    while index < n:
+        tok = tokens[index]
+        if tok.type is TokenType.PUNCT:
+            if tok.value == '(':
+                paren_depth += 1
+            elif tok.value == ')':
+                paren_depth -= 1
+        elif tok.type is TokenType.WORD and paren_depth == 0:
+            if tok.norm == 'CASE':
+                case_depth += 1
+            elif tok.norm == 'END' and case_depth:
+                case_depth -= 1
+            elif case_depth == 0 and tok.norm in words:
+                return index
+        index += 1
+    return n
+
+def skip_block(tokens: List[Token], begin_index: int) -> int:
+    """
+    跳过以 tokens[begin_index] (BEGIN) 开始的整个块，返回其 END 后分号的下标
+
+    BEGIN/CASE 计为开启，END 与 END CASE 计为关闭，END IF/END LOOP 不影响深度，
+    因此SQL中的CASE表达式也能正确配对。
+    """
+    n = len(tokens)
+    depth = 0
+    index = begin_index
+    while index < n:
+        tok = tokens[index]
+        if tok.type is TokenType.WORD:
+            if tok.norm in ('BEGIN', 'CASE'):
+                depth += 1
+            elif tok.norm == 'END':
+                if index + 1 < n and tokens[index + 1].is_word('IF', 'LOOP'):
+                    index += 1
+                else:
+                    if index + 1 < n and tokens[index + 1].is_word('CASE'):
+                        index += 1
+                    depth -= 1
+                    if depth == 0:
+                        return _skip_to_semicolon(tokens, index + 1)
+        index += 1
+    return n
+
+def _skip_subprogram(tokens: List[Token], index: int) -> int:
+    """跳过声明区内嵌套的 PROCEDURE/FUNCTION 定义，返回其结尾分号下标"""
+    n = len(tokens)
+    paren_depth = 0
+    while index < n:
+        tok = tokens[index]
+        if tok.is_punct('('):
+            paren_depth += 1
+        elif tok.is_punct(')'):
+            paren_depth -= 1
+        elif tok.is_punct(';'):
+            # 前置声明
+            return index
+        elif paren_depth == 0 and tok.is_word('IS', 'AS'):
+            if index + 1 < n and tokens[index + 1].is_word('LANGUAGE', 'EXTERNAL'):
+                return _skip_to_semicolon(tokens, index + 1)
+            return skip_block(tokens, skip_declarations(tokens, index + 1))
+        index += 1
+    return n
+
+def iter_declarations(tokens: List[Token], index: int) -> Iterator[Tuple[int, int]]:
+    """
+    遍历声明区中的顶层声明，直到遇到块的 BEGIN
+
+    Yields:
+        (首个token下标, 结尾分号下标)；嵌套子程序作为一条声明整体返回
+    """
+    n = len(tokens)
+    while index < n and not tokens[index].is_word('BEGIN'):
+        if tokens[index].is_word('PROCEDURE', 'FUNCTION'):
+            end = _skip_subprogram(tokens, index)
+        else:
+            end = _skip_to_semicolon(tokens, index)
+        if end > index:
+            yield index, end
+        index = end + 1
+
+def skip_declarations(tokens: List[Token], index: int) -> int:
+    """跳过声明区，返回块 BEGIN 的下标（不存在时为 len(tokens)）"""
+    for _, end in iter_declarations(tokens, index):
+        index = end + 1
+    return min(index, len(tokens))
+
+def iter_statement_spans(tokens: List[Token], begin_index: int) -> Iterator[StatementSpan]:
+    """
+    以流式方式切分 tokens[begin_index] (BEGIN) 开始的块中的可执行语句
+
+    跟踪 BEGIN/END、IF/END IF、LOOP/END LOOP、CASE/END CASE 以及异常处理器的嵌套，
+    控制结构本身不产生语句，只产出其中的叶子语句；遇到与最外层 BEGIN 配对的 END 时结束。
+    只返回偏移量，不复制任何文本。
+    """
+    n = len(tokens)
+    stack = [_BLOCK]
+    index = begin_index + 1
+
+    while index < n and stack:
+        tok = tokens[index]
+
+        if tok.is_punct(';'):
+            index += 1
+            continue
+
+        # <<label>>
+        if (tok.is_punct('<') and index + 4 < n and tokens[index + 1].is_punct('<')
+                and tokens[index + 3].is_punct('>') and tokens[index + 4].is_punct('>')):
+            index += 5
+            continue
+
+        if tok.type is TokenType.WORD:
+            word = tok.norm
+            top = stack[-1]
+
+            if word == 'BEGIN':
+                stack.append(_BLOCK)
+                index += 1
+                continue
+            if word == 'DECLARE':
+                stack.append(_BLOCK)
+                index = skip_declarations(tokens, index + 1) + 1
+                continue
+            if word == 'END':
+                stack.pop()
+                index = _skip_to_semicolon(tokens, index + 1) + 1
+                continue
+            if word == 'EXCEPTION' and top == _BLOCK:
+                stack[-1] = _HANDLER
+                index += 1
+                continue
+            if word == 'IF':
+                stack.append(_IF)
+                index = _skip_to_word(tokens, index + 1, 'THEN') + 1
+                continue
+            if word == 'ELSIF' and top == _IF:
+                index = _skip_to_word(tokens, index + 1, 'THEN') + 1
+                continue
+            if word == 'WHEN' and top in (_CASE, _HANDLER):
+                index = _skip_to_word(tokens, index + 1, 'THEN') + 1
+                continue
+            if word == 'ELSE' and top in (_IF, _CASE):
+                index += 1
+                continue
+            if word == 'CASE':
+                stack.append(_CASE)
+                index = _skip_to_word(tokens, index + 1, 'WHEN')
+                continue
+            if word == 'LOOP':
+                stack.append(_LOOP)
+                index += 1
+                continue
+            if word in ('WHILE', 'FOR'):
+                stack.append(_LOOP)
+                index = _skip_to_word(tokens, index + 1, 'LOOP') + 1
+                continue
+            if word == 'FORALL':
+                index = _skip_to_word(tokens, index + 1, *_FORALL_DML)
+                if index >= n:
+                    break
+
+        # 叶子语句：PL/SQL中分号只会出现在语句结尾（字符串与注释已由词法分析排除）
+        end = _skip_to_semicolon(tokens, index)
+        yield StatementSpan(tokens[index].start, tokens[end - 1].end, index, end, len(stack))
+        index = end + 1
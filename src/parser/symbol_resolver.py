@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from parser.plsql_lexer import Token, TokenType
+
+# 符号类型
+PARAMETER = "PARAMETER"
+VARIABLE = "VARIABLE"
+
+class Symbol(NamedTuple):
+    """声明的符号"""
+    name: str  # 声明时的写法
+    kind: str  # PARAMETER / VARIABLE
+
+class References(NamedTuple):
+    """一段token中引用到的符号（按首次出现的顺序，不重复）"""
+    parameters: List[str]
+    variables: List[str]
+
+def symbol_key(name: str) -> str:
+    """
+    符号查找键，与 Token.norm 的规则一致
+
+    未加引号的标识符不区分大小写，统一为大写；"双引号标识符"区分大小写，取引号内的内容。
+    """
+    if len(name) >= 2 and name[0] == '"' and name[-1] == '"':
+        return name[1:-1]
+    return name.upper()
+
+class SymbolTable:
+    """
+    存储过程的符号表：参数与局部变量
+
+    按查找键保存，引用解析时每个标识符token只需一次哈希查找。
+    同名符号以先声明的为准（参数先于变量声明）。
+    """
+
+    def __init__(self):
+        self._symbols: Dict[str, Symbol] = {}
+
+    @classmethod
+    def from_declarations(cls, parameters: Iterable, variables: Iterable[Dict]) -> "SymbolTable":
+        """根据解析得到的参数列表与变量声明构建符号表"""
+        table = cls()
+        for param in parameters:
+            table.declare(param.name, PARAMETER)
+        for variable in variables:
+            table.declare(variable['name'], VARIABLE)
+        return table
+
+    def declare(self, name: str, kind: str):
+        self._symbols.setdefault(symbol_key(name), Symbol(name, kind))
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        return self._symbols.get(symbol_key(name))
+
+    def resolve_token(self, tok: Token) -> Optional[Symbol]:
+        """解析单个标识符或绑定变量token，不是已声明的符号时返回 None"""
+        if tok.type is TokenType.WORD or tok.type is TokenType.QUOTED_IDENT:
+            return self._symbols.get(tok.norm)
+        if tok.type is TokenType.BIND:
+            return self._symbols.get(symbol_key(tok.value[1:]))
+        return None
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+def resolve_references(tokens: List[Token], start: int, end: int, symbols: SymbolTable) -> References:
+    """
+    找出 tokens[start:end] 中引用的参数与变量
+
+    只扫描一遍token：标识符（含不带冒号的裸引用和 :name 绑定变量）在符号表中查找。
+    以下情况不视为引用：
+      - 点号之后的名称（别名.列名、模式.表名）
+      - 命名参数写法 name => value 中的形参名
+    """
+    parameters: Dict[str, None] = {}
+    variables: Dict[str, None] = {}
+    if not len(symbols):
+        return References([], [])
+
+    for i in range(start, end):
+        tok = tokens[i]
+        symbol = symbols.resolve_token(tok)
+        if symbol is None:
+            continue
+        if tok.type is not TokenType.BIND:
+            if i > start and tokens[i - 1].is_punct('.'):
+                continue
+            if i + 1 < end and tokens[i + 1].type is TokenType.OPERATOR and tokens[i + 1].value == '=>':
+                continue
+        (parameters if symbol.kind == PARAMETER else variables)[symbol.name] = None
+
+    return References(list(parameters), list(variables))
+
+def merge_names(*groups: Iterable[str]) -> List[str]:
+    """合并多组名称，按查找键去重并保留首次出现的写法"""
+    merged: Dict[str, str] = {}
+    for group in groups:
+        for name in group:
+            merged.setdefault(symbol_key(name), name)
+    return list(merged.values())
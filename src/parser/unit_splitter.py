@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from parser.plsql_lexer import Token, TokenType, iter_tokens
+from parser.statement_splitter import iter_declarations
+
+class SourceUnit(NamedTuple):
+    """源文件中的一个程序单元（偏移相对于整个源文本）"""
+    kind: str                     # PROCEDURE / FUNCTION / PACKAGE / PACKAGE BODY / TRIGGER / ANONYMOUS
+    name: Optional[str]           # 单元名称；包体成员为 包名.成员名
+    start: int                    # 文本起始偏移
+    end: int                      # 文本结束偏移（不含 / 结束符）
+    package: Optional[str] = None # 所属包名，仅包体成员有值
+
+# CREATE 与单元类型之间可以出现的修饰关键字
+_HEADER_MODIFIERS = ('OR', 'REPLACE', 'EDITIONABLE', 'NONEDITIONABLE')
+_UNIT_KINDS = ('PROCEDURE', 'FUNCTION', 'PACKAGE', 'TRIGGER')
+
+# 可以直接分析的单元类型
+ANALYZABLE_KINDS = ('PROCEDURE', 'FUNCTION', 'TRIGGER')
+
+def _identifier(tok: Token) -> str:
+    return tok.norm if tok.type is TokenType.QUOTED_IDENT else tok.value
+
+def _read_header(tokens: Iterator[Token]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    读取 CREATE 之后的单元头部，返回 (单元类型, 名称)
+
+    不是程序单元（如 CREATE TABLE）时单元类型为 None。只消费到名称为止。
+    """
+    tok = next(tokens, None)
+    while tok is not None and tok.is_word(*_HEADER_MODIFIERS):
+        tok = next(tokens, None)
+    if tok is None or not tok.is_word(*_UNIT_KINDS):
+        return None, None
+
+    kind = tok.norm
+    tok = next(tokens, None)
+    if kind == 'PACKAGE' and tok is not None and tok.is_word('BODY'):
+        kind = 'PACKAGE BODY'
+        tok = next(tokens, None)
+    if tok is None or tok.type not in (TokenType.WORD, TokenType.QUOTED_IDENT):
+        return kind, None
+
+    # schema.name 只保留最后一段
+    name = _identifier(tok)
+    while True:
+        dot = next(tokens, None)
+        if dot is None or not dot.is_punct('.'):
+            break
+        tok = next(tokens, None)
+        if tok is None or tok.type not in (TokenType.WORD, TokenType.QUOTED_IDENT):
+            break
+        name = _identifier(tok)
+    return kind, name
+
+def _is_terminator(text: str, tok: Token) -> bool:
+    """判断 / 是否独占一行（SQL*Plus 的单元结束符）"""
+    if not tok.is_punct('/'):
+        return False
+    line_start = text.rfind('\n', 0, tok.start) + 1
+    line_end = text.find('\n', tok.end)
+    if line_end < 0:
+        line_end = len(text)
+    return not text[line_start:tok.start].strip() and not text[tok.end:line_end].strip()
+
+def iter_source_units(text: str) -> Iterator[SourceUnit]:
+    """
+    以流式方式切分源文件（如整个schema的DDL导出）中的程序单元
+
+    单元以 CREATE [OR REPLACE] PROCEDURE/FUNCTION/PACKAGE [BODY]/TRIGGER 开始，
+    以独占一行的 / 或下一个单元头部结束。不属于任何单元的内容（如 / 之后的
+    CREATE TABLE、GRANT 等）被忽略。边扫描边产出，只返回偏移量，不复制文本。
+    """
+    tokens = iter_tokens(text)
+    current = None  # (kind, name, start)
+    last_end = 0
+
+    for tok in tokens:
+        if tok.is_word('CREATE'):
+            kind, name = _read_header(tokens)
+            if kind is not None:
+                if current is not None:
+                    yield SourceUnit(current[0], current[1], current[2], last_end)
+                current = (kind, name, tok.start)
+                last_end = tok.end
+                continue
+        elif current is not None and _is_terminator(text, tok):
+            yield SourceUnit(current[0], current[1], current[2], last_end)
+            current = None
+            continue
+
+        if current is not None:
+            last_end = tok.end
+
+    if current is not None:
+        yield SourceUnit(current[0], current[1], current[2], last_end)
+
+def iter_package_members(text: str, unit: SourceUnit) -> Iterator[SourceUnit]:
+    """产出包体中定义的各个过程与函数（跳过前置声明与包体中的其他声明）"""
+    tokens: List[Token] = list(iter_tokens(text, unit.start, unit.end))
+    is_index = next((i for i, tok in enumerate(tokens) if tok.is_word('IS', 'AS')), None)
+    if is_index is None:
+        return
+
+    for start, end in iter_declarations(tokens, is_index + 1):
+        head = tokens[start]
+        if not head.is_word('PROCEDURE', 'FUNCTION') or start + 1 >= len(tokens) or end >= len(tokens):
+            continue
+        # 只有带 IS/AS 主体的才是定义，前置声明以分号直接结束
+        depth = 0
+        has_body = False
+        for tok in tokens[start + 2:end]:
+            if tok.is_punct('('):
+                depth += 1
+            elif tok.is_punct(')'):
+                depth -= 1
+            elif depth == 0 and tok.is_word('IS', 'AS'):
+                has_body = True
+                break
+        if has_body:
+            member = _identifier(tokens[start + 1])
+            yield SourceUnit(head.norm, f"{unit.name}.{member}", head.start, tokens[end].end, unit.name)
+
+def iter_analysis_units(text: str) -> Iterator[SourceUnit]:
+    """
+    产出源文件中所有可以单独分析的单元
+
+    过程、函数和触发器直接产出；包体展开为其中的各个过程与函数；包规范没有
+    可执行代码，跳过。文本中没有任何单元头部时，将整个文本作为一个匿名单元。
+    """
+    found = False
+    for unit in iter_source_units(text):
+        found = True
+        if unit.kind in ANALYZABLE_KINDS:
+            yield unit
+        elif unit.kind == 'PACKAGE BODY':
+            yield from iter_package_members(text, unit)
+
+    if not found and text.strip():
+        yield SourceUnit('ANONYMOUS', None, 0, len(text))
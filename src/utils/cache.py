@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+分析结果缓存模块
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Type, Union
+
+
+def normalize_procedure_text(text: str) -> str:
+    """规范化存储过程文本：统一换行符，去掉行尾空白和首尾空白"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(line.rstrip() for line in text.split('\n')).strip()
+
+
+def procedure_hash(text: str) -> str:
+    """计算规范化后存储过程文本的SHA-256哈希，作为缓存键"""
+    return hashlib.sha256(normalize_procedure_text(text).encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    进程内分析结果缓存（LRU + TTL）
+
+    超过 max_size 时淘汰最久未使用的条目，超过 ttl 秒的条目在读取时失效。
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["AnalysisCache"]:
+        """根据配置创建缓存，cache.enabled 为 false 时返回 None"""
+        cache_config = config.get_cache_config()
+        if not cache_config['enabled']:
+            return None
+        return cls(max_size=cache_config['max_size'], ttl=cache_config['ttl'])
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """写入缓存并按LRU淘汰"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class DiskAnalysisCache:
+    """
+    基于SQLite的持久化分析结果缓存
+
+    以 (内容哈希, 解析器版本) 为键保存序列化后的分析结果，可被同一台机器上的
+    多个后端worker进程共享，服务重启后依然有效。解析器版本变化时旧结果自动失效。
+    """
+
+    def __init__(self, path: Union[str, Path], model: Type, parser_version: str,
+                 max_size: int = 1000, ttl: Optional[float] = 3600):
+        """
+        Args:
+            path: SQLite数据库文件路径
+            model: 缓存值的pydantic模型类型，用于序列化与反序列化
+            parser_version: 解析器版本，参与缓存键
+            max_size: 最多保留的条目数
+            ttl: 条目有效期（秒），None 表示不过期
+        """
+        self.path = Path(path)
+        self.model = model
+        self.parser_version = parser_version
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._init_db()
+
+    @classmethod
+    def from_config(cls, config, model: Type, parser_version: str) -> Optional["DiskAnalysisCache"]:
+        """根据配置创建持久化缓存，cache.enabled 或 cache.persistent 为 false 时返回 None"""
+        cache_config = config.get_cache_config()
+        if not (cache_config['enabled'] and cache_config['persistent']):
+            return None
+        return cls(
+            cache_config['path'], model, parser_version,
+            max_size=cache_config['max_size'], ttl=cache_config['ttl']
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程/进程使用独立连接（fork 后不复用父进程的连接）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self):
+        """创建缓存表（其他解析器版本的旧结果不会命中，并随容量淘汰逐步清除）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT NOT NULL,
+                parser_version TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (key, parser_version)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_created ON analysis_cache (created_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回 None"""
+        row = self._connect().execute(
+            "SELECT payload, created_at FROM analysis_cache WHERE key = ? AND parser_version = ?",
+            (key, self.parser_version)
+        ).fetchone()
+        if row is None or (self.ttl is not None and time.time() - row[1] >= self.ttl):
+            self.misses += 1
+            return None
+        try:
+            value = self.model.model_validate_json(zlib.decompress(row[0]))
+        except (ValueError, zlib.error):
+            # 无法还原的条目（如模型结构已变化）视为未命中，随后会被新结果覆盖
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """写入缓存，超过 max_size 时删除最早写入的条目"""
+        payload = zlib.compress(value.model_dump_json().encode('utf-8'))
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_cache (key, parser_version, created_at, payload) VALUES (?, ?, ?, ?)",
+            (key, self.parser_version, time.time(), payload)
+        )
+        conn.execute(
+            "DELETE FROM analysis_cache WHERE rowid IN "
+            "(SELECT rowid FROM analysis_cache ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+
+    def clear(self):
+        """清空缓存和统计"""
+        self._connect().execute("DELETE FROM analysis_cache")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息（命中计数为当前进程内的统计）"""
+        total = self.hits + self.misses
+        return {
+            'path': str(self.path),
+            'parser_version': self.parser_version,
+            'size': len(self),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -82,6 +82,92 @@ class Config:
             'password': self.get('DB_PASSWORD'),
         }
     
+    def get_cache_config(self) -> Dict[str, Any]:
+        """获取缓存配置（显式设置的 CACHE_ENABLED/CACHE_TTL 环境变量优先于配置文件）"""
+        cache_section = self.get('cache') or {}
+        enabled = cache_section.get('enabled', self.get('CACHE_ENABLED'))
+        ttl = cache_section.get('ttl', self.get('CACHE_TTL'))
+        if 'CACHE_ENABLED' in os.environ:
+            enabled = self.get('CACHE_ENABLED')
+        if 'CACHE_TTL' in os.environ:
+            ttl = self.get('CACHE_TTL')
+        return {
+            'enabled': bool(enabled),
+            'ttl': int(ttl),
+            'max_size': int(cache_section.get('max_size', 1000)),
+            'persistent': bool(cache_section.get('persistent', False)),
+            'path': cache_section.get('path', 'data/output/analysis_cache.sqlite3'),
+        }
+    
+    def get_analysis_pool_config(self) -> Dict[str, Any]:
+        """获取分析进程池配置，单次分析超时取自 parser.timeout"""
+        pool_section = self.get('analysis') or {}
+        parser_section = self.get('parser') or {}
+        timeout = parser_section.get('timeout')
+        return {
+            'max_workers': int(pool_section.get('max_workers', 0)) or os.cpu_count() or 1,
+            'max_queue': int(pool_section.get('max_queue', 16)),
+            'start_method': pool_section.get('start_method', 'spawn'),
+            'executor': pool_section.get('executor', 'process'),
+            'timeout': float(timeout) if timeout else None,
+        }
+    
+    def get_jobs_config(self) -> Dict[str, Any]:
+        """获取异步分析任务配置"""
+        jobs_section = self.get('jobs') or {}
+        return {
+            'max_pending': int(jobs_section.get('max_pending', 100)),
+            'result_ttl': float(jobs_section.get('result_ttl', 3600)),
+        }
+    
+    def get_analysis_store_config(self) -> Dict[str, Any]:
+        """获取已完成分析的保存配置（供 /api/analyses/{id}/graph 等查询接口使用）"""
+        store_section = self.get('analyses') or {}
+        return {
+            'max_size': int(store_section.get('max_size', 100)),
+            'ttl': float(store_section.get('ttl', 3600)),
+        }
+    
+    def get_compression_config(self) -> Dict[str, Any]:
+        """获取响应压缩配置"""
+        compression_section = self.get('compression') or {}
+        return {
+            'enabled': bool(compression_section.get('enabled', True)),
+            'minimum_size': int(compression_section.get('minimum_size', 1024)),
+            'gzip_level': int(compression_section.get('gzip_level', 6)),
+            'brotli_quality': int(compression_section.get('brotli_quality', 5)),
+        }
+    
+    def get_visualization_config(self) -> Dict[str, Any]:
+        """获取可视化配置"""
+        visualization_section = self.get('visualization') or {}
+        return {
+            'aggregate_edges': bool(visualization_section.get('aggregate_edges', False)),
+        }
+    
+    def get_upload_config(self) -> Dict[str, Any]:
+        """获取上传配置，max_size 换算为字节数（显式设置的 MAX_FILE_SIZE 环境变量优先）"""
+        upload_section = self.get('upload') or {}
+        max_size = upload_section.get('max_size', self.get('MAX_FILE_SIZE'))
+        if 'MAX_FILE_SIZE' in os.environ:
+            max_size = self.get('MAX_FILE_SIZE')
+        return {
+            'max_size': self.parse_size(max_size),
+            'allowed_extensions': upload_section.get('allowed_extensions', ['.sql', '.txt']),
+            'path': upload_section.get('path', 'data/input/'),
+        }
+    
+    @staticmethod
+    def parse_size(size: Any) -> int:
+        """将 "10MB"、"512KB"、1024 等形式的大小换算为字节数"""
+        if isinstance(size, (int, float)):
+            return int(size)
+        text = str(size).strip().upper()
+        for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024), ('B', 1)):
+            if text.endswith(unit):
+                return int(float(text[:-len(unit)].strip()) * factor)
+        return int(text)
+    
     def get_app_config(self) -> Dict[str, Any]:
         """获取应用配置"""
         return {
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+JSON序列化模块
+
+分析结果的响应与可视化数据文件统一经由此处编码为UTF-8字节。
+安装了 orjson 时使用 orjson（约快一个数量级），未安装时回退到标准库 json，
+两者输出的内容相同：不转义非ASCII字符，非字符串的键转换为字符串。
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+_UNSET = object()
+_orjson: Any = _UNSET
+
+
+def _load_orjson():
+    """首次使用时尝试导入 orjson，未安装时返回 None"""
+    global _orjson
+    if _orjson is _UNSET:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson = orjson
+    return _orjson
+
+
+def backend_name() -> str:
+    """当前使用的编码器名称：orjson 或 json"""
+    return "orjson" if _load_orjson() is not None else "json"
+
+
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    """
+    将由 dict/list/str/数值/None 组成的数据编码为JSON字节
+
+    Args:
+        data: 待编码的数据
+        pretty: 是否缩进两格输出，默认输出紧凑格式
+    """
+    orjson = _load_orjson()
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dump(data: Any, file_path: Union[str, Path], pretty: bool = False):
+    """将数据编码为JSON写入文件"""
+    with open(file_path, 'wb') as f:
+        f.write(dumps(data, pretty=pretty))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Iterator, List, Tuple
+
+class AggregatedEdge:
+    """合并后的边：同一对节点之间同类型的所有平行边"""
+    __slots__ = ('type', 'source', 'target', 'statement_ids', 'statement_types')
+
+    def __init__(self, edge_type: str, source: str, target: str):
+        self.type = edge_type
+        self.source = source
+        self.target = target
+        self.statement_ids: List[int] = []           # 涉及的语句ID（按出现顺序，不重复）
+        self.statement_types: Dict[str, int] = {}    # 语句类型 -> 语句数
+
+    @property
+    def count(self) -> int:
+        """合并的语句数"""
+        return len(self.statement_ids)
+
+    def to_data(self) -> Dict:
+        """边的紧凑数据：语句ID列表与计数"""
+        return {
+            "statement_ids": self.statement_ids,
+            "count": self.count,
+            "statement_types": self.statement_types
+        }
+
+class EdgeAggregator:
+    """
+    平行边合并器
+
+    按 (边类型, 起点, 终点) 合并逐语句产生的边，边数与不同的关系数成正比，
+    而不是与语句数成正比。同一语句对同一条边的重复贡献只记一次。
+    """
+
+    def __init__(self):
+        self._edges: Dict[Tuple[str, str, str], AggregatedEdge] = {}
+
+    def add(self, edge_type: str, source: str, target: str, statement_id: int, statement_type: str):
+        key = (edge_type, source, target)
+        edge = self._edges.get(key)
+        if edge is None:
+            edge = self._edges[key] = AggregatedEdge(edge_type, source, target)
+        # 语句按顺序遍历，重复贡献一定紧跟在同一语句之后
+        if edge.statement_ids and edge.statement_ids[-1] == statement_id:
+            return
+        edge.statement_ids.append(statement_id)
+        edge.statement_types[statement_type] = edge.statement_types.get(statement_type, 0) + 1
+
+    def __iter__(self) -> Iterator[AggregatedEdge]:
+        return iter(self._edges.values())
+
+    def __len__(self) -> int:
+        return len(self._edges)
@@ -2,9 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import networkx as nx
-import matplotlib.pyplot as plt
 from typing import Dict, Any
-import pygraphviz as pgv
 
 class GraphGenerator:
     def __init__(self):
@@ -47,7 +45,7 @@ class GraphGenerator:
         """
         保存生成的图表
         """
-        # 使用pygraphviz生成更美观的图
+        # 使用pygraphviz生成更美观的图（to_agraph 内部按需导入 pygraphviz）
         A = nx.nx_agraph.to_agraph(self.graph)
         A.layout(prog='dot')
         
@@ -62,6 +60,9 @@ class GraphGenerator:
         """
         绘制并保存图表
         """
+        # matplotlib 为可选的绘图依赖，导入开销大，在绘图时才加载
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(12, 8))
         pos = nx.spring_layout(graph)
         nx.draw(
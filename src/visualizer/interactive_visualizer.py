@@ -1,46 +1,73 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
-import networkx as nx
+import os
+import threading
 from typing import Dict, List, Any
+from pydantic import TypeAdapter
 from models.data_models import (
     StoredProcedureAnalysis, VisualizationNode, VisualizationEdge
 )
+from analyzer.parameter_analyzer import parameter_key
+from utils import serialization
+from visualizer.edge_aggregator import EdgeAggregator
 
-class InteractiveVisualizer:
-    """交互式可视化器 - 生成可视化数据和简单的图形输出"""
+# 节点与边列表整体转换为字典，在 pydantic-core 中一次完成，不逐个调用 .dict()
+_NODE_LIST = TypeAdapter(List[VisualizationNode])
+_EDGE_LIST = TypeAdapter(List[VisualizationEdge])
+
+class VisualizationContext:
+    """单次可视化的图数据，每次调用独立创建，可视化器本身不保存状态"""
     
     def __init__(self):
+        # networkx 导入较慢，仅在实际生成可视化时加载（批量分析的工作进程不需要）
+        import networkx as nx
         self.graph = nx.DiGraph()
-        self.nodes = []
-        self.edges = []
+        self.nodes: List[VisualizationNode] = []
+        self.edges: List[VisualizationEdge] = []
+
+class InteractiveVisualizer:
+    """交互式可视化器 - 生成可视化数据和简单的图形输出"""
     
-    def create_interactive_visualization(self, analysis: StoredProcedureAnalysis):
+    def __init__(self, output_path: str = "visualization_data.json", aggregate_edges: bool = False,
+                 pretty_json: bool = False):
+        """
+        Args:
+            output_path: 可视化数据文件路径
+            aggregate_edges: 是否将同一对节点之间的数据流边与参数使用边合并为一条，
+                边属性中给出语句ID列表与计数
+            pretty_json: 可视化数据文件是否缩进输出（便于阅读，文件更大、写入更慢）
+        """
+        self.output_path = output_path
+        self.aggregate_edges = aggregate_edges
+        self.pretty_json = pretty_json
+    
+    def create_interactive_visualization(self, analysis: StoredProcedureAnalysis) -> VisualizationContext:
         """创建可视化数据"""
-        self._build_graph(analysis)
-        self._save_visualization_data(analysis)
+        ctx = self._build_graph(analysis)
+        self._save_visualization_data(ctx, analysis)
         self._print_ascii_graph(analysis)
+        return ctx
     
-    def _build_graph(self, analysis: StoredProcedureAnalysis):
+    def _build_graph(self, analysis: StoredProcedureAnalysis) -> VisualizationContext:
         """构建可视化图"""
-        self.graph.clear()
-        self.nodes = []
-        self.edges = []
+        ctx = VisualizationContext()
         
         # 添加表节点
-        self._add_table_nodes(analysis)
+        self._add_table_nodes(ctx, analysis)
         
         # 添加参数节点
-        self._add_parameter_nodes(analysis)
+        self._add_parameter_nodes(ctx, analysis)
         
         # 添加数据流边
-        self._add_data_flow_edges(analysis)
+        self._add_data_flow_edges(ctx, analysis)
         
         # 添加连接条件边
-        self._add_join_edges(analysis)
+        self._add_join_edges(ctx, analysis)
+        
+        return ctx
     
-    def _add_table_nodes(self, analysis: StoredProcedureAnalysis):
+    def _add_table_nodes(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
         """添加表节点"""
         # 物理表
         for table_name, table in analysis.table_field_analysis.physical_tables.items():
@@ -54,8 +81,8 @@ class InteractiveVisualizer:
                     "color": "green"  # 绿色表示物理表
                 }
             )
-            self.nodes.append(node)
-            self.graph.add_node(node.id, **node.properties)
+            ctx.nodes.append(node)
+            ctx.graph.add_node(node.id, **node.properties)
         
         # 临时表
         for table_name, table in analysis.table_field_analysis.temp_tables.items():
@@ -69,10 +96,10 @@ class InteractiveVisualizer:
                     "color": "orange"  # 橙色表示临时表
                 }
             )
-            self.nodes.append(node)
-            self.graph.add_node(node.id, **node.properties)
+            ctx.nodes.append(node)
+            ctx.graph.add_node(node.id, **node.properties)
     
-    def _add_parameter_nodes(self, analysis: StoredProcedureAnalysis):
+    def _add_parameter_nodes(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
         """添加参数节点"""
         for param in analysis.parameters:
             node = VisualizationNode(
@@ -86,11 +113,15 @@ class InteractiveVisualizer:
                     "color": "blue"  # 蓝色表示参数
                 }
             )
-            self.nodes.append(node)
-            self.graph.add_node(node.id, **node.properties)
+            ctx.nodes.append(node)
+            ctx.graph.add_node(node.id, **node.properties)
     
-    def _add_data_flow_edges(self, analysis: StoredProcedureAnalysis):
+    def _add_data_flow_edges(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
         """添加数据流边"""
+        if self.aggregate_edges:
+            self._add_aggregated_edges(ctx, analysis)
+            return
+        
         for stmt in analysis.sp_structure.sql_statements:
             # 从源表到目标表的数据流
             for source_table in stmt.source_tables:
@@ -101,27 +132,66 @@ class InteractiveVisualizer:
                         label=f"SQL-{stmt.statement_id}",
                         type="data_flow",
                         properties={
-                            "statement_type": stmt.statement_type.value,
-                            "raw_sql": stmt.raw_sql
+                            "statement_id": stmt.statement_id,
+                            "statement_type": stmt.statement_type.value
                         }
                     )
-                    self.edges.append(edge)
-                    self.graph.add_edge(edge.source, edge.target, **edge.properties)
-            
-            # 参数到表的关联
-            for param_name in stmt.parameters_used:
+                    ctx.edges.append(edge)
+                    ctx.graph.add_edge(edge.source, edge.target, **edge.properties)
+        
+        # 参数到表的关联：按参数使用索引查找语句，边的起点与参数节点ID一致
+        statements = {stmt.statement_id: stmt for stmt in analysis.sp_structure.sql_statements}
+        for param in analysis.parameters:
+            for statement_id in analysis.parameter_usage.get(parameter_key(param.name), ()):
+                stmt = statements[statement_id]
                 for table_name in stmt.source_tables + stmt.target_tables:
                     edge = VisualizationEdge(
-                        source=f"param_{param_name}",
+                        source=f"param_{param.name}",
                         target=f"table_{table_name}",
                         label="uses",
                         type="parameter_usage",
-                        properties={"statement_id": stmt.statement_id}
+                        properties={"statement_id": statement_id}
                     )
-                    self.edges.append(edge)
-                    self.graph.add_edge(edge.source, edge.target, **edge.properties)
+                    ctx.edges.append(edge)
+                    ctx.graph.add_edge(edge.source, edge.target, **edge.properties)
+    
+    def _add_aggregated_edges(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
+        """添加合并后的数据流边与参数使用边：每对节点之间每种类型只有一条边"""
+        params_by_statement: Dict[int, List[str]] = {}
+        for param in analysis.parameters:
+            for statement_id in analysis.parameter_usage.get(parameter_key(param.name), ()):
+                params_by_statement.setdefault(statement_id, []).append(param.name)
+        
+        aggregator = EdgeAggregator()
+        for stmt in analysis.sp_structure.sql_statements:
+            statement_type = stmt.statement_type.value
+            for source_table in stmt.source_tables:
+                for target_table in stmt.target_tables:
+                    aggregator.add("data_flow", f"table_{source_table}", f"table_{target_table}",
+                                   stmt.statement_id, statement_type)
+            for param_name in params_by_statement.get(stmt.statement_id, ()):
+                for table_name in stmt.source_tables + stmt.target_tables:
+                    aggregator.add("parameter_usage", f"param_{param_name}", f"table_{table_name}",
+                                   stmt.statement_id, statement_type)
+        
+        for aggregated in aggregator:
+            if aggregated.type == "data_flow":
+                label = "SQL-" + ",".join(map(str, aggregated.statement_ids[:3]))
+                if aggregated.count > 3:
+                    label += f" (+{aggregated.count - 3})"
+            else:
+                label = "uses"
+            edge = VisualizationEdge(
+                source=aggregated.source,
+                target=aggregated.target,
+                label=label,
+                type=aggregated.type,
+                properties=aggregated.to_data()
+            )
+            ctx.edges.append(edge)
+            ctx.graph.add_edge(edge.source, edge.target, **edge.properties)
     
-    def _add_join_edges(self, analysis: StoredProcedureAnalysis):
+    def _add_join_edges(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
         """添加JOIN连接边"""
         for join_cond in analysis.conditions_and_logic.join_conditions:
             edge = VisualizationEdge(
@@ -135,14 +205,22 @@ class InteractiveVisualizer:
                     "condition": join_cond.condition_text
                 }
             )
-            self.edges.append(edge)
-            self.graph.add_edge(edge.source, edge.target, **edge.properties)
+            ctx.edges.append(edge)
+            ctx.graph.add_edge(edge.source, edge.target, **edge.properties)
     
-    def _save_visualization_data(self, analysis: StoredProcedureAnalysis):
+    def _save_visualization_data(self, ctx: VisualizationContext, analysis: StoredProcedureAnalysis):
         """保存可视化数据"""
         viz_data = {
-            "nodes": [node.dict() for node in self.nodes],
-            "edges": [edge.dict() for edge in self.edges],
+            "nodes": _NODE_LIST.dump_python(ctx.nodes),
+            "edges": _EDGE_LIST.dump_python(ctx.edges),
+            # 边只引用语句ID，SQL文本在此处集中保存一份
+            "statements": [
+                {
+                    "id": stmt.statement_id,
+                    "type": stmt.statement_type.value,
+                    "raw_sql": stmt.raw_sql
+                } for stmt in analysis.sp_structure.sql_statements
+            ],
             "metadata": {
                 "procedure_name": analysis.sp_structure.name,
                 "parameter_count": len(analysis.parameters),
@@ -152,8 +230,10 @@ class InteractiveVisualizer:
             }
         }
         
-        with open("visualization_data.json", "w", encoding="utf-8") as f:
-            json.dump(viz_data, f, ensure_ascii=False, indent=2)
+        # 先写入临时文件再原子替换，并发分析时不会产生半写的文件
+        tmp_path = f"{self.output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        serialization.dump(viz_data, tmp_path, pretty=self.pretty_json)
+        os.replace(tmp_path, self.output_path)
     
     def _print_ascii_graph(self, analysis: StoredProcedureAnalysis):
         """打印ASCII图形"""
@@ -207,6 +287,6 @@ class InteractiveVisualizer:
     def start_web_interface(self, analysis: StoredProcedureAnalysis = None):
         """简化版界面，只打印信息"""
         print("\n📊 可视化完成！")
-        print("💾 数据已保存到 visualization_data.json")
+        print(f"💾 数据已保存到 {self.output_path}")
         print("📋 ASCII图形已在上方显示")
-        print("\n💡 提示: 可以使用其他工具（如Gephi、Cytoscape等）导入 visualization_data.json 进行高级可视化") 
\ No newline at end of file
+        print(f"\n💡 提示: 可以使用其他工具（如Gephi、Cytoscape等）导入 {self.output_path} 进行高级可视化") 
\ No newline at end of file
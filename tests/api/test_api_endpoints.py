@@ -88,6 +88,21 @@ class TestAPIEndpoints:
         assert stats["sql_statement_count"] >= 3
         assert stats["physical_table_count"] >= 3
     
+    def test_data_flow_edges_reference_statements(self, sample_complex_procedure):
+        """测试数据流边只引用语句ID而不复制SQL文本"""
+        payload = {"stored_procedure": sample_complex_procedure}
+        response = self.client.post("/api/analyze", json=payload)
+        
+        assert response.status_code == 200
+        data = response.json()
+        statement_ids = {stmt["id"] for stmt in data["data"]["sql_statements"]}
+        
+        flow_edges = [e for e in data["visualization"]["edges"] if e["type"] == "data_flow"]
+        assert len(flow_edges) >= 1
+        for edge in flow_edges:
+            assert "raw_sql" not in edge["data"]
+            assert edge["data"]["statement_id"] in statement_ids
+    
     def test_analyze_with_joins(self, sample_procedure_with_joins):
         """测试分析包含JOIN的存储过程"""
         payload = {
@@ -219,6 +234,55 @@ class TestAPIEndpoints:
         # 应该返回文件过大错误
         assert response.status_code == 413 or (response.status_code == 400 and not response.json()["success"])
     
+    def test_file_upload_streamed_in_chunks(self, sample_simple_procedure, monkeypatch):
+        """测试分块读取上传文件时跨块的多字节字符与BOM均能正确解码"""
+        import backend.main as backend_main
+        
+        monkeypatch.setattr(backend_main, "UPLOAD_CHUNK_SIZE", 7)
+        content = "\ufeff-- 更新员工薪资（中文注释）\n" + sample_simple_procedure
+        files = {
+            "file": ("utf8.sql", io.BytesIO(content.encode('utf-8')), "text/plain")
+        }
+        
+        response = self.client.post("/api/analyze/file", files=files)
+        
+        assert response.status_code == 200
+        assert response.json()["data"]["procedure_name"] == "update_employee_salary"
+    
+    def test_file_upload_size_limit_enforced(self, sample_simple_procedure, monkeypatch):
+        """测试上传文件超过 upload.max_size 时返回413"""
+        import backend.main as backend_main
+        
+        monkeypatch.setitem(backend_main.upload_config, "max_size", 64)
+        files = {
+            "file": ("big.sql", io.BytesIO(sample_simple_procedure.encode('utf-8')), "text/plain")
+        }
+        
+        response = self.client.post("/api/analyze/file", files=files)
+        
+        assert response.status_code == 413
+
+    def test_file_upload_multiple_procedures(self, sample_simple_procedure, sample_complex_procedure):
+        """测试上传包含两个存储过程的文件时按程序单元分别分析"""
+        content = sample_simple_procedure + "\n/\n" + sample_complex_procedure + "\n/\n"
+        files = {
+            "file": ("export.sql", io.BytesIO(content.encode('utf-8')), "text/plain")
+        }
+
+        response = self.client.post("/api/analyze/file", files=files)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert [u["unit"] for u in data["units"]] == ["update_employee_salary", "process_employee_data"]
+        assert [u["data"]["procedure_name"] for u in data["units"]] == [
+            "update_employee_salary", "process_employee_data"
+        ]
+        assert data["units"][0]["analysis_id"] != data["units"][1]["analysis_id"]
+        # 每个单元的结果都可以通过查询接口单独访问
+        for unit in data["units"]:
+            assert self.client.get(f"/api/analyses/{unit['analysis_id']}/graph").status_code == 200
+
     def test_analyze_with_options(self, sample_simple_procedure):
         """测试带选项的分析"""
         payload = {
@@ -268,6 +332,144 @@ class TestAPIEndpoints:
         assert len(results) == 5
         assert all(status == 200 for status in results)
     
+    def test_analyze_rejected_when_pool_saturated(self, sample_simple_procedure, monkeypatch):
+        """测试进程池饱和时返回429"""
+        import backend.main as backend_main
+        from services.analysis_pool import AnalysisPool
+        
+        saturated_pool = AnalysisPool(max_workers=1, max_queue=0, timeout=10)
+        assert saturated_pool._acquire_slot(blocking=False)
+        assert saturated_pool.stats()["in_flight"] == 1
+        monkeypatch.setattr(backend_main, "analysis_pool", saturated_pool)
+        monkeypatch.setattr(backend_main.analyzer, "get_cached_analysis", lambda sp_text: None)
+        
+        payload = {"stored_procedure": sample_simple_procedure}
+        response = self.client.post("/api/analyze", json=payload)
+        
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        assert saturated_pool.stats()["rejected"] == 1
+    
+    def test_pool_shutdown_cancels_queued_tasks(self, sample_simple_procedure):
+        """测试关闭时取消排队中的任务，名额与在途计数随之归还"""
+        import threading
+        from services.analysis_pool import AnalysisPool
+        
+        pool = AnalysisPool(max_workers=1, max_queue=2, timeout=30, executor="thread")
+        started, release = threading.Event(), threading.Event()
+        
+        def block():
+            started.set()
+            release.wait(10)
+        
+        assert pool._acquire_slot(blocking=False)
+        running = pool._get_executor().submit(block)
+        running.add_done_callback(pool._release_slot)
+        started.wait(10)
+        assert pool._acquire_slot(blocking=False)
+        queued = pool._submit(sample_simple_procedure)
+        assert pool.stats()["in_flight"] == 2
+        
+        pool._reset_executor()
+        assert queued.cancelled()
+        release.set()
+        running.result(10)
+        assert pool.stats()["in_flight"] == 0
+        pool.shutdown()
+    
+    def test_analyze_batch_streams_ndjson(self, sample_simple_procedure, sample_complex_procedure, monkeypatch):
+        """测试批量分析按行流式返回每个存储过程的结果"""
+        import backend.main as backend_main
+        from services.analysis_pool import AnalysisPool
+        
+        # 排队上限为0：批量任务应等待名额而不是被拒绝
+        pool = AnalysisPool(max_workers=2, max_queue=0, timeout=30, executor="thread")
+        monkeypatch.setattr(backend_main, "analysis_pool", pool)
+        monkeypatch.setattr(backend_main.analyzer, "get_cached_analysis", lambda sp_text: None)
+        
+        payload = {
+            "procedures": [
+                {"id": "simple", "stored_procedure": sample_simple_procedure},
+                {"stored_procedure": "   "},
+                {"id": "complex", "stored_procedure": sample_complex_procedure},
+                {"stored_procedure": sample_simple_procedure},
+            ]
+        }
+        try:
+            response = self.client.post("/api/analyze/batch", json=payload)
+        finally:
+            pool.shutdown()
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        by_index = {line["index"]: line for line in lines}
+        
+        assert sorted(by_index) == [0, 1, 2, 3]
+        assert by_index[0]["id"] == "simple"
+        assert by_index[0]["data"]["procedure_name"] == "update_employee_salary"
+        assert by_index[1]["success"] is False
+        assert by_index[2]["success"] is True
+        assert by_index[3]["id"] == "3"
+        assert pool.stats()["rejected"] == 0
+    
+    def test_analysis_job_lifecycle(self, sample_simple_procedure, monkeypatch):
+        """测试异步分析任务的提交、状态查询与结果获取"""
+        import time
+        import backend.main as backend_main
+        from services.analysis_pool import AnalysisPool
+        from services.job_queue import JobQueue
+        
+        pool = AnalysisPool(max_workers=1, max_queue=0, timeout=30, executor="thread")
+        jobs = JobQueue(backend_main.run_analysis_job, workers=1, max_pending=5)
+        monkeypatch.setattr(backend_main, "analysis_pool", pool)
+        monkeypatch.setattr(backend_main, "job_queue", jobs)
+        monkeypatch.setattr(backend_main.analyzer, "get_cached_analysis", lambda sp_text: None)
+        
+        try:
+            response = self.client.post("/api/jobs", json={"stored_procedure": sample_simple_procedure})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            
+            deadline = time.time() + 30
+            status = response.json()
+            while status["status"] not in ("succeeded", "failed") and time.time() < deadline:
+                time.sleep(0.05)
+                status = self.client.get(f"/api/jobs/{job_id}").json()
+        finally:
+            jobs.shutdown()
+            pool.shutdown()
+        
+        assert status["status"] == "succeeded"
+        assert status["result_url"] == f"/api/jobs/{job_id}/result"
+        
+        result = self.client.get(status["result_url"])
+        assert result.status_code == 200
+        assert result.json()["data"]["procedure_name"] == "update_employee_salary"
+        
+        assert self.client.get("/api/jobs/unknown").status_code == 404
+    
+    def test_analysis_job_rejected_when_queue_full(self, sample_simple_procedure, monkeypatch):
+        """测试排队任务达到上限时返回429，未完成任务的结果返回409"""
+        import backend.main as backend_main
+        from services.job_queue import JobQueue
+        
+        # 没有工作线程，任务始终处于排队状态
+        jobs = JobQueue(backend_main.run_analysis_job, workers=0, max_pending=1)
+        monkeypatch.setattr(backend_main, "job_queue", jobs)
+        monkeypatch.setattr(backend_main.analyzer, "get_cached_analysis", lambda sp_text: None)
+        
+        payload = {"stored_procedure": sample_simple_procedure}
+        first = self.client.post("/api/jobs", json=payload)
+        assert first.status_code == 202
+        assert first.json()["queue_position"] == 0
+        
+        assert self.client.get(f"/api/jobs/{first.json()['job_id']}/result").status_code == 409
+        
+        second = self.client.post("/api/jobs", json=payload)
+        assert second.status_code == 429
+        assert "Retry-After" in second.headers
+    
     def test_api_error_handling(self):
         """测试API错误处理"""
         # 测试不存在的端点
@@ -311,4 +513,354 @@ class TestAPIEndpoints:
         end_time = time.time()
         
         assert response.status_code == 200
-        assert end_time - start_time < 5  # 应该在5秒内完成 
\ No newline at end of file
+        assert end_time - start_time < 5  # 应该在5秒内完成 
+
+
+class TestVisualizationBuild:
+    """可视化数据转换测试"""
+
+    @staticmethod
+    def _analysis(statement_count: int):
+        """构造 statement_count 条 INSERT ... SELECT ... JOIN 语句的分析结果，表数量随语句数增长"""
+        from models.data_models import (
+            StoredProcedureAnalysis, StoredProcedureStructure, SQLStatement, StatementType,
+            Parameter, JoinCondition, Table, TableFieldAnalysis, ConditionsAndLogic
+        )
+
+        table_count = max(statement_count // 5, 1)
+        statements = []
+        for i in range(statement_count):
+            source, ref, target = f"src_{i % table_count}", f"ref_{(i + 1) % table_count}", f"tgt_{i % table_count}"
+            statements.append(SQLStatement(
+                statement_id=i + 1,
+                statement_type=StatementType.INSERT,
+                raw_sql=f"INSERT INTO {target} SELECT s.id FROM {source} s JOIN {ref} r ON s.ref_id = r.id",
+                source_tables=[source, ref],
+                target_tables=[target],
+                join_conditions=[JoinCondition(left_table=source, left_field="ref_id", right_table=ref,
+                                               right_field="id", join_type="INNER", condition_text="s.ref_id = r.id",
+                                               left_alias="s", right_alias="r")],
+                table_aliases={"S": source, "R": ref},
+                parameters_used=["p_rate"] if i % 2 else []
+            ))
+        tables = {
+            f"{prefix}_{i}": Table(name=f"{prefix}_{i}", fields=["id"])
+            for prefix in ("src", "ref", "tgt") for i in range(table_count)
+        }
+        parameters = [Parameter("p_rate", "IN", "NUMBER")]
+        join_conditions = [jc for stmt in statements for jc in stmt.join_conditions]
+        return StoredProcedureAnalysis(
+            sp_structure=StoredProcedureStructure(name="big_proc", parameters=parameters, sql_statements=statements),
+            parameters=parameters,
+            table_field_analysis=TableFieldAnalysis(physical_tables=tables, temp_tables={}),
+            conditions_and_logic=ConditionsAndLogic(join_conditions=join_conditions, where_conditions=[], control_flow=[]),
+            parameter_usage={"P_RATE": [stmt.statement_id for stmt in statements if stmt.parameters_used]}
+        )
+
+    def test_join_edges_use_resolved_tables(self):
+        """测试JOIN边直接使用解析时确定的表名，找不到节点的连接条件被跳过"""
+        from backend.main import convert_to_visualization_data
+        from models.data_models import JoinCondition
+
+        analysis = self._analysis(10)
+        analysis.sp_structure.sql_statements[0].join_conditions.append(
+            JoinCondition(left_table="src_0", left_field="id", right_table="missing_table", right_field="id",
+                          join_type="LEFT", condition_text="src_0.id = missing_table.id"))
+        data = convert_to_visualization_data(analysis)
+
+        join_edges = [e for e in data["edges"] if e["type"] == "join_condition"]
+        assert len(join_edges) == 10
+        assert join_edges[0]["source"] == "table_src_0"
+        assert join_edges[0]["target"] == "table_ref_1"
+        assert join_edges[0]["data"]["left_table_alias"] == "s"
+        assert join_edges[0]["data"]["statement_id"] == 1
+        # 同一对表在多条语句中连接时，边ID按语句与条件序号区分
+        assert len({e["id"] for e in data["edges"]}) == len(data["edges"])
+
+        param_edges = [e for e in data["edges"] if e["type"] == "parameter_usage"]
+        assert len(param_edges) == 5 * 3
+        assert {e["source"] for e in param_edges} == {"param_p_rate"}
+
+    def test_aggregated_edges(self):
+        """测试合并模式下平行边按关系合并，边数据给出语句ID与计数"""
+        from backend.main import convert_to_visualization_data
+
+        analysis = self._analysis(500)
+        expanded = convert_to_visualization_data(analysis, aggregate_edges=False)
+        aggregated = convert_to_visualization_data(analysis, aggregate_edges=True)
+
+        for edge_type in ("data_flow", "parameter_usage"):
+            before = [e for e in expanded["edges"] if e["type"] == edge_type]
+            after = [e for e in aggregated["edges"] if e["type"] == edge_type]
+            assert len(after) == len({(e["source"], e["target"]) for e in before})
+            assert len({e["id"] for e in after}) == len(after)
+            assert sum(e["data"]["count"] for e in after) == len(before)
+
+        flow = next(e for e in aggregated["edges"]
+                    if e["type"] == "data_flow" and e["source"] == "table_src_0" and e["target"] == "table_tgt_0")
+        assert flow["label"] == "INSERT"
+        assert flow["data"] == {"statement_ids": [1, 101, 201, 301, 401], "count": 5,
+                                "statement_types": {"INSERT": 5}}
+        assert aggregated["metadata"]["aggregated"] is True
+        assert len(aggregated["edges"]) < len(expanded["edges"]) / 2
+
+    def test_aggregate_edges_request_option(self, sample_procedure_with_joins):
+        """测试 /api/analyze 的 options.aggregate_edges 选项"""
+        client = TestClient(app)
+        payload = {"stored_procedure": sample_procedure_with_joins, "options": {"aggregate_edges": True}}
+        data = client.post("/api/analyze", json=payload).json()
+
+        flow_edges = [e for e in data["visualization"]["edges"] if e["type"] == "data_flow"]
+        assert flow_edges
+        assert all("statement_ids" in e["data"] for e in flow_edges)
+        assert data["visualization"]["metadata"]["aggregated"] is True
+
+    @pytest.mark.performance
+    def test_build_scales_linearly(self, performance_report):
+        """基准：5000 条语句的转换耗时与语句数近似线性增长（节点与连接条件同步增长时不出现 O(J·N)）"""
+        import timeit
+        from backend.main import convert_to_visualization_data
+
+        small, large = self._analysis(1000), self._analysis(5000)
+        small_time = min(timeit.repeat(lambda: convert_to_visualization_data(small), number=1, repeat=5))
+        large_time = min(timeit.repeat(lambda: convert_to_visualization_data(large), number=1, repeat=5))
+        # 线性约为 5 倍；每个连接条件重建节点ID集合时约为 25 倍
+        performance_report(f"1000 条语句 {small_time * 1000:.1f}ms, 5000 条语句 {large_time * 1000:.1f}ms"
+                           f"（{large_time / small_time:.1f} 倍）")
+
+    @pytest.mark.performance
+    def test_response_serialization_cost(self, performance_report):
+        """基准：5000 条语句的分析响应，响应模型校验 + 标准库 json 与直接编码的耗时对比"""
+        import timeit
+        from fastapi.encoders import jsonable_encoder
+        from backend.main import AnalyzeResponse, build_analyze_response
+        from utils import serialization
+
+        analysis = self._analysis(5000)
+        response = build_analyze_response(analysis)
+        payload = json.loads(response.body)
+
+        def validated():
+            model = AnalyzeResponse(**payload)
+            json.dumps(jsonable_encoder(model), ensure_ascii=False).encode("utf-8")
+
+        def direct():
+            serialization.dumps(payload)
+
+        before = min(timeit.repeat(validated, number=1, repeat=3))
+        after = min(timeit.repeat(direct, number=1, repeat=3))
+        performance_report(f"{len(response.body) / 1024:.0f}KB 响应: 校验+json {before * 1000:.1f}ms, "
+                           f"{serialization.backend_name()} {after * 1000:.1f}ms")
+
+class TestAnalysisGraphAPI:
+    """已保存分析的图查询接口测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app)
+
+    def test_analyze_returns_id_without_full_graph(self, sample_procedure_with_joins):
+        """测试 include_visualization 为 false 时只返回 analysis_id，子图与语句按需查询"""
+        payload = {"stored_procedure": sample_procedure_with_joins, "options": {"include_visualization": False}}
+        data = self.client.post("/api/analyze", json=payload).json()
+        assert data["visualization"] is None
+        analysis_id = data["analysis_id"]
+
+        graph = self.client.get(f"/api/analyses/{analysis_id}/graph",
+                                params={"focus": "departments", "depth": 1, "types": "join_condition"}).json()
+        assert graph["focus"] == "table_departments"
+        assert [node["id"] for node in graph["nodes"]] == ["table_departments", "table_employees"]
+        assert {edge["type"] for edge in graph["edges"]} == {"join_condition"}
+        assert graph["page"]["next_offset"] is None
+
+        deeper = self.client.get(f"/api/analyses/{analysis_id}/graph",
+                                 params={"focus": "table_departments", "depth": 2, "types": "join_condition"}).json()
+        assert [node["id"] for node in deeper["nodes"]][-1] == "table_job_history"
+
+        statements = self.client.get(f"/api/analyses/{analysis_id}/statements", params={"ids": "1"}).json()
+        assert [stmt["id"] for stmt in statements["statements"]] == [1]
+        assert "LEFT JOIN employees" in statements["statements"][0]["raw_sql"]
+
+    def test_pages_concatenate_to_subgraph(self):
+        """测试分页：按顺序拼接各页得到完整子图，边不重复"""
+        from backend.main import store_analysis
+
+        store_analysis("paged", TestVisualizationBuild._analysis(200))
+        full = self.client.get("/api/analyses/paged/graph", params={"limit": 2000}).json()
+        assert full["page"]["total_nodes"] == len(full["nodes"]) == 1 + 3 * 40
+        assert full["page"]["total_edges"] == len(full["edges"])
+
+        nodes, edges, offset = [], [], 0
+        while offset is not None:
+            page = self.client.get("/api/analyses/paged/graph", params={"offset": offset, "limit": 25}).json()
+            nodes += page["nodes"]
+            edges += page["edges"]
+            offset = page["page"]["next_offset"]
+        assert nodes == full["nodes"]
+        assert sorted(e["id"] for e in edges) == sorted(e["id"] for e in full["edges"])
+
+        aggregated = self.client.get("/api/analyses/paged/graph",
+                                     params={"aggregate": True, "node_types": "physical_table"}).json()
+        assert {node["type"] for node in aggregated["nodes"]} == {"physical_table"}
+        assert all("statement_ids" in e["data"] for e in aggregated["edges"] if e["type"] == "data_flow")
+
+    def test_unknown_analysis_or_focus(self):
+        """测试分析ID或焦点节点不存在时返回404"""
+        from backend.main import store_analysis
+
+        assert self.client.get("/api/analyses/missing/graph").status_code == 404
+        store_analysis("small", TestVisualizationBuild._analysis(5))
+        assert self.client.get("/api/analyses/small/graph", params={"focus": "no_such_table"}).status_code == 404
+        assert self.client.get("/api/analyses/small/graph", params={"depth": 99}).status_code == 422
+
+    def test_falls_back_to_persistent_cache(self, tmp_path, monkeypatch):
+        """测试分析结果不在内存中时从持久化缓存恢复，并重新保存供后续查询"""
+        from backend.main import analyzer, analysis_store
+        from models.data_models import StoredProcedureAnalysis
+        from utils.cache import DiskAnalysisCache
+
+        persistent = DiskAnalysisCache(tmp_path / "cache.db", StoredProcedureAnalysis, "1.0")
+        persistent.put("persisted", TestVisualizationBuild._analysis(5))
+        monkeypatch.setattr(analyzer, "persistent_cache", persistent)
+
+        assert analysis_store.get("persisted") is None
+        graph = self.client.get("/api/analyses/persisted/graph").json()
+        assert "table_src_0" in [node["id"] for node in graph["nodes"]]
+        assert analysis_store.get("persisted") is not None
+        assert self.client.get("/api/analyses/persisted/statements", params={"ids": "1"}).status_code == 200
+        assert persistent.stats()["hits"] == 1
+
+        monkeypatch.setattr(analyzer, "persistent_cache", None)
+        assert self.client.get("/api/analyses/not_persisted/graph").status_code == 404
+
+class TestResponseCompression:
+    """响应压缩与紧凑格式测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app)
+
+    def test_gzip_negotiated(self, sample_complex_procedure):
+        """测试客户端接受 gzip 时压缩分析响应，不接受时原样返回"""
+        payload = {"stored_procedure": sample_complex_procedure}
+        compressed = self.client.post("/api/analyze", json=payload, headers={"Accept-Encoding": "gzip"})
+        assert compressed.status_code == 200
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in compressed.headers["vary"]
+
+        plain = self.client.post("/api/analyze", json=payload, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        assert plain.json() == compressed.json()
+
+    def test_small_response_not_compressed(self):
+        """测试小于最小长度的响应不压缩"""
+        response = self.client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    def test_accepted_encodings(self):
+        """测试 Accept-Encoding 解析"""
+        from services.compression import accepted_encodings
+
+        assert accepted_encodings("gzip, br;q=0.5, deflate;q=0") == {"gzip": 1.0, "br": 0.5, "deflate": 0.0}
+        assert accepted_encodings("") == {}
+
+    def test_encoding_chosen_by_quality(self):
+        """测试按 q 值选择编码：客户端更偏好 gzip 时不使用 brotli，q=0 表示拒绝"""
+        from services.compression import choose_encoding
+
+        assert choose_encoding("br;q=0.1, gzip", brotli_available=True) == "gzip"
+        assert choose_encoding("gzip, br", brotli_available=True) == "br"
+        assert choose_encoding("gzip;q=0.5, *", brotli_available=True) == "br"
+        assert choose_encoding("gzip;q=0, br;q=0", brotli_available=True) is None
+        assert choose_encoding("identity", brotli_available=True) is None
+        assert choose_encoding("br, gzip;q=0.1", brotli_available=False) == "gzip"
+
+    def test_compact_round_trip(self, sample_procedure_with_joins):
+        """测试 format=compact 还原后与标准响应内容一致（边按下标对应，不带ID）"""
+        from services.compact_format import FORMAT_NAME, decode_records
+
+        payload = {"stored_procedure": sample_procedure_with_joins}
+        standard = self.client.post("/api/analyze", json=payload).json()
+        compact = self.client.post("/api/analyze", params={"format": "compact"}, json=payload).json()
+        assert compact["format"] == FORMAT_NAME
+        assert compact["analysis_id"] == standard["analysis_id"]
+        strings = compact["strings"]
+
+        def without_nulls(records, omit=()):
+            return [{k: v for k, v in r.items() if v is not None and k not in omit} for r in records]
+
+        for key in ("parameters", "sql_statements", "join_conditions"):
+            assert decode_records(compact["data"][key], strings) == without_nulls(standard["data"][key])
+        physical = decode_records(compact["data"]["tables"]["physical"], strings)
+        assert {t.pop("name"): t for t in physical} == standard["data"]["tables"]["physical"]
+
+        visualization = compact["visualization"]
+        assert visualization["metadata"] == standard["visualization"]["metadata"]
+        assert decode_records(visualization["nodes"], strings) == without_nulls(standard["visualization"]["nodes"])
+        assert decode_records(visualization["edges"], strings) == \
+            without_nulls(standard["visualization"]["edges"], omit=("id",))
+
+    def test_unknown_format_rejected(self, sample_procedure_with_joins):
+        """测试不支持的 format 参数返回422"""
+        response = self.client.post("/api/analyze", params={"format": "xml"},
+                                    json={"stored_procedure": sample_procedure_with_joins})
+        assert response.status_code == 422
+
+    @pytest.mark.performance
+    def test_compact_size_and_cost(self, performance_report):
+        """基准：5000 条语句的分析响应，标准与紧凑格式的字节数、gzip 后字节数与构建+编码+压缩耗时"""
+        import gzip
+        import timeit
+        from backend.main import build_analyze_response
+
+        analysis = TestVisualizationBuild._analysis(5000)
+        sizes, times = {}, {}
+        for compact in (False, True):
+            body = build_analyze_response(analysis, compact=compact).body
+            sizes[compact] = (len(body), len(gzip.compress(body, 6)))
+            times[compact] = min(timeit.repeat(
+                lambda: gzip.compress(build_analyze_response(analysis, compact=compact).body, 6),
+                number=1, repeat=3))
+        for compact, label in ((False, "标准"), (True, "紧凑")):
+            raw, compressed = sizes[compact]
+            performance_report(f"{label} {raw / 1024:.0f}KB, gzip {compressed / 1024:.0f}KB, "
+                               f"{times[compact] * 1000:.1f}ms")
+        assert sizes[True][0] < sizes[False][0] / 2
+        assert sizes[True][1] < sizes[False][1] / 2
+
+    def test_brotli_preferred(self, sample_complex_procedure):
+        """测试安装了 brotli 时客户端接受 br 则优先使用 brotli"""
+        pytest.importorskip("brotli")
+
+        response = self.client.post("/api/analyze", json={"stored_procedure": sample_complex_procedure},
+                               headers={"Accept-Encoding": "br, gzip"})
+        assert response.headers["content-encoding"] == "br"
+        assert response.json()["success"] is True
+
+    def test_brotli_large_chunks_compressed_off_loop(self, monkeypatch):
+        """测试 brotli 压缩大块响应体时在工作线程中进行，小块仍在事件循环中直接压缩"""
+        pytest.importorskip("brotli")
+        import asyncio
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Route
+        from services.compression import BrotliResponder, CompressionMiddleware
+
+        on_loop = []
+        compress_chunk = BrotliResponder._compress_chunk
+
+        def recording(responder, body, more_body):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return compress_chunk(responder, body, more_body)
+
+        monkeypatch.setattr(BrotliResponder, "_compress_chunk", recording)
+        body = "x" * 4096
+        plain = Starlette(routes=[Route("/", lambda request: PlainTextResponse(body))])
+        for threshold in (1024, 1 << 20):
+            client = TestClient(CompressionMiddleware(plain, minimum_size=16, thread_threshold=threshold))
+            response = client.get("/", headers={"Accept-Encoding": "br"})
+            assert response.headers["content-encoding"] == "br"
+            assert response.text == body
+        assert on_loop == [False, True]
@@ -16,6 +16,41 @@ sys.path.insert(0, str(src_path))
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
+# 性能测试的计时结果，在测试会话结束时统一输出
+_performance_results = pytest.StashKey[list]()
+
+
+def pytest_configure(config):
+    # pytest.ini 使用 [tool:pytest] 节，其中的标记定义不会被读取，在此注册
+    config.addinivalue_line("markers", "performance: 性能测试 - 测试性能指标（默认跳过，使用 -m performance 运行）")
+    config.stash[_performance_results] = []
+
+
+def pytest_collection_modifyitems(config, items):
+    """性能测试依赖机器负载，只在用 -m 显式选择（如 -m performance）时运行"""
+    if "performance" in (config.getoption("markexpr") or ""):
+        return
+    skip = pytest.mark.skip(reason="性能测试默认跳过，使用 -m performance 运行")
+    for item in items:
+        if "performance" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(_performance_results, [])
+    if results:
+        terminalreporter.section("性能测试结果")
+        for nodeid, message in results:
+            terminalreporter.write_line(f"{nodeid}: {message}")
+
+
+@pytest.fixture
+def performance_report(request):
+    """记录性能测试的计时结果（在测试会话结束时的汇总中输出，而不是在测试中打印）"""
+    def report(message: str):
+        request.config.stash[_performance_results].append((request.node.nodeid, message))
+    return report
+
 
 @pytest.fixture
 def sample_simple_procedure():
@@ -245,4 +245,263 @@ class TestEndToEndAnalysis:
         assert result.success is True
         assert end_time - start_time < 10  # 应该在10秒内完成
         assert len(result.physical_tables) >= 12  # employees, departments, report_table_0-9
-        assert len(result.join_conditions) >= 10  # 每个INSERT都有JOIN 
\ No newline at end of file
+        assert len(result.join_conditions) >= 10  # 每个INSERT都有JOIN
+
+    def test_repeated_analysis_hits_cache(self, sample_simple_procedure):
+        """测试相同存储过程重复分析时命中缓存"""
+        from utils.cache import AnalysisCache
+        
+        analyzer = OracleSPAnalyzer(cache=AnalysisCache(max_size=10, ttl=60))
+        first = analyzer.analyze(sample_simple_procedure)
+        # 仅行尾空白和换行符不同的文本视为同一存储过程
+        second = analyzer.analyze(sample_simple_procedure.replace("\n", "  \r\n"))
+        
+        assert second is first
+        assert analyzer.cache.hits == 1
+        assert analyzer.cache.misses == 1
+
+    def test_persistent_cache_reloads_real_analysis(self, sample_complex_procedure, tmp_path):
+        """测试持久化缓存中的完整分析结果可被另一个分析器实例（模拟另一个worker）还原"""
+        from utils.cache import AnalysisCache, DiskAnalysisCache
+        from models.data_models import StoredProcedureAnalysis
+
+        path = tmp_path / "cache.sqlite3"
+        writer = OracleSPAnalyzer(cache=AnalysisCache(max_size=10, ttl=60),
+                                  persistent_cache=DiskAnalysisCache(path, StoredProcedureAnalysis, "1.0"),
+                                  visualize=False)
+        first = writer.analyze(sample_complex_procedure)
+
+        reader = OracleSPAnalyzer(cache=AnalysisCache(max_size=10, ttl=60),
+                                  persistent_cache=DiskAnalysisCache(path, StoredProcedureAnalysis, "1.0"),
+                                  visualize=False)
+        second = reader.analyze(sample_complex_procedure)
+
+        assert reader.persistent_cache.stats()["hits"] == 1
+        assert second.model_dump() == first.model_dump()
+        assert any(table.source_sql_ids for table in second.table_field_analysis.physical_tables.values())
+
+    def test_concurrent_analysis_shares_one_analyzer(self, tmp_path):
+        """测试多个线程共享同一个分析器并发分析时结果互不干扰"""
+        from concurrent.futures import ThreadPoolExecutor
+        from visualizer.interactive_visualizer import InteractiveVisualizer
+        
+        analyzer = OracleSPAnalyzer()
+        analyzer.cache = None
+        analyzer.persistent_cache = None
+        analyzer.visualizer = InteractiveVisualizer(output_path=str(tmp_path / "viz.json"))
+        
+        def make_procedure(i):
+            inserts = "\n".join(
+                f"    INSERT INTO target_{i} (id) SELECT id FROM source_{i}_{k} WHERE id = p_id_{i};"
+                for k in range(i % 4 + 1)
+            )
+            return f"CREATE OR REPLACE PROCEDURE proc_{i}(p_id_{i} IN NUMBER) AS\nBEGIN\n{inserts}\nEND;"
+        
+        procedures = [make_procedure(i) for i in range(24)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(analyzer.analyze, procedures))
+        
+        for i, result in enumerate(results):
+            structure = result.sp_structure
+            assert structure.name == f"proc_{i}"
+            assert [p.name for p in structure.parameters] == [f"p_id_{i}"]
+            assert len(structure.sql_statements) == i % 4 + 1
+            assert all(f"target_{i}" in stmt.raw_sql for stmt in structure.sql_statements)
+
+    
+    def test_visualizer_aggregates_parallel_edges(self, tmp_path):
+        """测试可视化器合并模式：同一对表之间的多条语句只产生一条数据流边"""
+        from visualizer.interactive_visualizer import InteractiveVisualizer
+        
+        inserts = "\n".join(
+            f"    INSERT INTO target_t (id) SELECT id FROM source_t WHERE id = p_id + {k};" for k in range(6)
+        )
+        procedure = f"CREATE OR REPLACE PROCEDURE agg_proc(p_id IN NUMBER) AS\nBEGIN\n{inserts}\nEND;"
+        analysis = OracleSPAnalyzer().analyze(procedure)
+        
+        visualizer = InteractiveVisualizer(output_path=str(tmp_path / "viz.json"), aggregate_edges=True)
+        ctx = visualizer._build_graph(analysis)
+        
+        flow_edges = [e for e in ctx.edges if e.type == "data_flow"]
+        param_edges = [e for e in ctx.edges if e.type == "parameter_usage"]
+        assert len(flow_edges) == 1
+        assert flow_edges[0].properties["statement_ids"] == [1, 2, 3, 4, 5, 6]
+        assert flow_edges[0].label == "SQL-1,2,3 (+3)"
+        assert sorted(e.target for e in param_edges) == ["table_source_t", "table_target_t"]
+        assert all(e.properties["count"] == 6 for e in param_edges)
+    
+    def test_visualizer_mode_follows_config(self, monkeypatch):
+        """测试分析器的可视化合并模式默认取配置 visualization.aggregate_edges"""
+        from utils.config import config
+        
+        monkeypatch.setattr(config, "get_visualization_config", lambda: {"aggregate_edges": True})
+        assert OracleSPAnalyzer(visualize=False).visualizer.aggregate_edges is True
+
+class TestDirectoryAnalysis:
+    """目录批量分析测试"""
+    
+    def _write_sources(self, input_dir, sample_simple_procedure):
+        (input_dir / "schema").mkdir(parents=True)
+        (input_dir / "single.sql").write_text(sample_simple_procedure, encoding="utf-8")
+        (input_dir / "schema" / "pkg.pkb").write_text(
+            "CREATE OR REPLACE PACKAGE BODY pkg AS\n"
+            "  PROCEDURE m1(p_a NUMBER) IS BEGIN INSERT INTO t1 (c) VALUES (p_a); END;\n"
+            "  PROCEDURE m2 IS BEGIN DELETE FROM t2; END;\n"
+            "END pkg;\n/\n",
+            encoding="utf-8"
+        )
+        (input_dir / "notes.md").write_text("not a source file", encoding="utf-8")
+    
+    @pytest.mark.parametrize("chunk_bytes", [1024 * 1024, 64])
+    def test_analyze_directory(self, tmp_path, sample_simple_procedure, chunk_bytes):
+        """测试并行分析目录中的所有程序单元（小任务块时大文件在主进程中切分）"""
+        from batch.directory_analyzer import analyze_directory
+        
+        input_dir = tmp_path / "input"
+        output_dir = tmp_path / "output"
+        self._write_sources(input_dir, sample_simple_procedure)
+        
+        summary = analyze_directory(input_dir, output_dir, jobs=2, chunk_bytes=chunk_bytes)
+        
+        assert summary["files"] == 2
+        assert summary["units"] == 3
+        assert summary["failed"] == 0
+        assert [(r["file"], r["name"]) for r in summary["results"]] == [
+            ("schema/pkg.pkb", "pkg.m1"),
+            ("schema/pkg.pkb", "pkg.m2"),
+            ("single.sql", "update_employee_salary"),
+        ]
+        for row in summary["results"]:
+            assert (output_dir / row["output"]).exists()
+        assert (output_dir / "summary.json").exists()
+    
+    def test_cli_analyze_dir(self, tmp_path, sample_simple_procedure, capsys):
+        """测试 analyze-dir 命令行入口"""
+        import oracle_sp_parser
+        
+        input_dir = tmp_path / "input"
+        self._write_sources(input_dir, sample_simple_procedure)
+        
+        exit_code = oracle_sp_parser.main(
+            ["analyze-dir", str(input_dir), "-o", str(tmp_path / "output"), "-j", "2"]
+        )
+        
+        assert exit_code == 0
+        output = capsys.readouterr().out
+        assert "3 个程序单元" in output
+        assert "过程/秒" in output
+    
+    def test_incremental_analysis(self, tmp_path, sample_simple_procedure):
+        """测试基于清单的增量分析：跳过未变化文件，只重新分析变化文件并清理已删除文件的结果"""
+        import json
+        import os
+        from batch.directory_analyzer import analyze_directory
+        
+        input_dir = tmp_path / "input"
+        output_dir = tmp_path / "output"
+        self._write_sources(input_dir, sample_simple_procedure)
+        first = analyze_directory(input_dir, output_dir, jobs=2)
+        assert first["analyzed_files"] == 2
+        
+        # 只更新修改时间，内容不变
+        os.utime(input_dir / "single.sql", ns=(0, 0))
+        second = analyze_directory(input_dir, output_dir, jobs=2)
+        assert second["analyzed_files"] == 0
+        assert second["skipped_files"] == 2
+        assert second["units"] == 3
+        
+        (input_dir / "schema" / "pkg.pkb").write_text(
+            "CREATE OR REPLACE PROCEDURE p_new AS BEGIN INSERT INTO t9 (c) VALUES (1); END;\n/\n",
+            encoding="utf-8"
+        )
+        old_output = output_dir / next(r["output"] for r in first["results"] if r["name"] == "pkg.m1")
+        third = analyze_directory(input_dir, output_dir, jobs=2)
+        assert third["analyzed_files"] == 1
+        assert third["analyzed_units"] == 1
+        assert not old_output.exists()
+        
+        lineage = json.loads((output_dir / "lineage.json").read_text(encoding="utf-8"))
+        assert lineage["t9"]["writers"] == ["schema/pkg.pkb:p_new"]
+        assert "t1" not in lineage
+        assert "employees" in lineage
+        
+        (input_dir / "single.sql").unlink()
+        fourth = analyze_directory(input_dir, output_dir, jobs=2)
+        assert fourth["removed_files"] == 1
+        assert fourth["analyzed_files"] == 0
+        assert [r["name"] for r in fourth["results"]] == ["p_new"]
+        
+        assert analyze_directory(input_dir, output_dir, jobs=2, incremental=False)["analyzed_files"] == 1
+    
+    def test_incremental_analysis_retries_failed_files(self, tmp_path, sample_simple_procedure):
+        """测试增量分析不沿用失败文件的结果：文件未变化时同样重新分析"""
+        from batch.directory_analyzer import analyze_directory
+        
+        input_dir = tmp_path / "input"
+        output_dir = tmp_path / "output"
+        self._write_sources(input_dir, sample_simple_procedure)
+        (input_dir / "broken.sql").write_bytes(b"CREATE PROCEDURE p AS BEGIN NULL; END; \xff\xfe")
+        
+        first = analyze_directory(input_dir, output_dir, jobs=2)
+        assert first["failed"] == 1
+        
+        second = analyze_directory(input_dir, output_dir, jobs=2)
+        assert second["analyzed_files"] == 1
+        assert second["skipped_files"] == 2
+        assert second["failed"] == 1
+
+
+class TestStartupCost:
+    """冷启动导入开销测试（python -X importtime）"""
+
+    SRC_DIR = Path(__file__).parent.parent.parent / "src"
+
+    # 工作进程加载分析器的导入时间预算（微秒），主要开销为 pydantic
+    IMPORT_TIME_BUDGET_US = 600_000
+
+    # 核心解析路径不应加载的重量级或可选依赖
+    HEAVY_MODULES = ("networkx", "matplotlib", "pygraphviz", "cx_Oracle", "sqlparse")
+
+    def _import_times(self, module: str) -> dict:
+        """在新进程中导入模块，返回 {模块名: 累计导入时间(微秒)}"""
+        import subprocess
+
+        code = f"import sys; sys.path.insert(0, {str(self.SRC_DIR)!r}); import {module}"
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True, check=True)
+        times = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(cumulative)
+        return times
+
+    def test_core_analyzer_skips_heavy_modules(self):
+        """测试分析器冷启动不加载重量级依赖"""
+        times = self._import_times("main")
+
+        loaded = [name for name in times if name.split(".")[0] in self.HEAVY_MODULES]
+        assert loaded == []
+
+    @pytest.mark.performance
+    def test_core_analyzer_import_budget(self, performance_report):
+        """测试分析器冷启动不加载重量级依赖且在时间预算内"""
+        times = self._import_times("main")
+        performance_report(f"导入 main {times['main'] / 1000:.1f}ms（预算 {self.IMPORT_TIME_BUDGET_US / 1000:.0f}ms）")
+
+        loaded = [name for name in times if name.split(".")[0] in self.HEAVY_MODULES]
+        assert loaded == []
+        assert times["main"] < self.IMPORT_TIME_BUDGET_US, f"导入耗时 {times['main'] / 1000:.1f}ms"
+
+    def test_package_import_is_lazy(self):
+        """测试导入 oracle_sp_parser 不会加载子包，导出的组件在首次访问时加载"""
+        times = self._import_times("oracle_sp_parser")
+        assert "models.data_models" not in times
+        assert "parser.sp_parser" not in times
+
+        import oracle_sp_parser
+        from parser.sp_parser import StoredProcedureParser
+        assert oracle_sp_parser.StoredProcedureParser is StoredProcedureParser
+        with pytest.raises(AttributeError):
+            oracle_sp_parser.NotAnExport
@@ -71,6 +71,22 @@ class TestParameterAnalyzer:
         assert len(result) == 1
         assert set(result[0].used_in_statements) == {1, 2}
 
+    def test_usage_index_is_case_insensitive(self):
+        """测试参数使用索引一次构建、不区分大小写且语句ID不重复"""
+        sql_statements = [
+            SQLStatement(statement_id=1, statement_type=StatementType.SELECT,
+                         raw_sql="SELECT * FROM t WHERE a = :P_ID OR b = :p_id",
+                         parameters_used=["P_ID", "p_id"]),
+            SQLStatement(statement_id=2, statement_type=StatementType.UPDATE,
+                         raw_sql="UPDATE t SET c = :P_Name", parameters_used=["P_Name"]),
+        ]
+        index = self.analyzer.build_usage_index(sql_statements)
+        assert index == {"P_ID": [1], "P_NAME": [2]}
+
+        parameters = [Parameter("p_id", "IN", "NUMBER"), Parameter("p_name", "IN", "VARCHAR2")]
+        result = self.analyzer.analyze(parameters, sql_statements, index)
+        assert [p.used_in_statements for p in result] == [[1], [2]]
+
 
 class TestTableAnalyzer:
     """测试表分析器"""
@@ -252,4 +268,131 @@ class TestTableFieldAnalyzer:
         employees_table = result.physical_tables["employees"]
         assert "department_id" in employees_table.fields
         assert "salary" in employees_table.fields
-        assert "hire_date" in employees_table.fields 
\ No newline at end of file
+        assert "hire_date" in employees_table.fields
+
+    def test_registry_collects_fields_once(self):
+        """测试物理表与临时表统一登记、字段按首次出现顺序去重"""
+        from analyzer.table_field_analyzer import TableRegistry
+
+        registry = TableRegistry({"tmp_totals"})
+        registry.register("employees").source_sql_ids.append(1)
+        registry.register("tmp_totals")
+        for field in ["salary", "employee_id", "salary", "dept_id", "employee_id"]:
+            registry.add_field("employees", field)
+        registry.add_field("tmp_totals", "total")
+        registry.add_field("unknown_table", "ignored")
+
+        physical, temp = registry.split()
+        assert list(physical) == ["employees"]
+        assert list(temp) == ["tmp_totals"]
+        assert physical["employees"].fields == ["salary", "employee_id", "dept_id"]
+        assert physical["employees"].source_sql_ids == [1]
+        assert temp["tmp_totals"].is_temporary is True
+
+        # 直接修改 fields 后 add_field 仍能正确去重
+        table = physical["employees"]
+        table.fields.append("hire_date")
+        table.add_field("hire_date")
+        table.add_field("bonus")
+        assert table.fields == ["salary", "employee_id", "dept_id", "hire_date", "bonus"]
+
+
+class TestColumnLineage:
+    """字段级血缘测试"""
+
+    def test_insert_select_maps_columns_by_position(self):
+        """测试 INSERT ... SELECT 按位置对应目标列，并解析别名与聚合表达式"""
+        from analyzer.column_lineage import extract_column_mappings
+
+        mappings = extract_column_mappings(
+            "INSERT INTO dept_summary (dept_id, total_salary, emp_count) "
+            "SELECT e.department_id, SUM(e.salary * v_rate), COUNT(*) "
+            "FROM employees e JOIN departments d ON e.department_id = d.department_id "
+            "GROUP BY e.department_id",
+            excluded=["v_rate"]
+        )
+        assert [(m.target, m.expression, m.sources) for m in mappings] == [
+            (("dept_summary", "dept_id"), "e.department_id", [("employees", "department_id")]),
+            (("dept_summary", "total_salary"), "SUM(e.salary * v_rate)", [("employees", "salary")]),
+            (("dept_summary", "emp_count"), "COUNT(*)", []),
+        ]
+
+    def test_update_merge_and_ctas(self):
+        """测试 UPDATE SET、MERGE（内联视图来源）与 CTAS"""
+        from analyzer.column_lineage import extract_column_mappings
+
+        update = extract_column_mappings(
+            "UPDATE accounts a SET (balance, updated) = "
+            "(SELECT SUM(t.amount), MAX(t.ts) FROM txns t WHERE t.account_id = a.id)")
+        assert [(m.target, m.sources) for m in update] == [
+            (("accounts", "balance"), [("txns", "amount")]),
+            (("accounts", "updated"), [("txns", "ts")]),
+        ]
+
+        merge = extract_column_mappings(
+            "MERGE INTO dim_customer d "
+            "USING (SELECT c.id, c.first_name || ' ' || c.last_name full_name FROM stg_customer c) s "
+            "ON (d.id = s.id) "
+            "WHEN MATCHED THEN UPDATE SET d.name = s.full_name "
+            "WHEN NOT MATCHED THEN INSERT (id, name) VALUES (s.id, s.full_name)")
+        full_name = [("stg_customer", "first_name"), ("stg_customer", "last_name")]
+        assert [(m.target, m.sources) for m in merge] == [
+            (("dim_customer", "name"), full_name),
+            (("dim_customer", "id"), [("stg_customer", "id")]),
+            (("dim_customer", "name"), full_name),
+        ]
+
+        ctas = extract_column_mappings(
+            "CREATE GLOBAL TEMPORARY TABLE tmp_totals ON COMMIT PRESERVE ROWS AS "
+            "SELECT dept_id, SUM(sal) total FROM emp GROUP BY dept_id")
+        assert [(m.target, m.sources) for m in ctas] == [
+            (("tmp_totals", "dept_id"), [("emp", "dept_id")]),
+            (("tmp_totals", "total"), [("emp", "sal")]),
+        ]
+
+    def test_lineage_is_interned_edge_list(self):
+        """测试分析结果中的血缘以列ID边列表保存，并补充表字段"""
+        from models.data_models import StoredProcedureStructure
+
+        sql_statements = [
+            SQLStatement(statement_id=1, statement_type=StatementType.INSERT,
+                         raw_sql="INSERT INTO dept_summary (dept_id, total) "
+                                 "SELECT department_id, SUM(salary) FROM employees GROUP BY department_id",
+                         source_tables=["employees"], target_tables=["dept_summary"]),
+            SQLStatement(statement_id=2, statement_type=StatementType.UPDATE,
+                         raw_sql="UPDATE dept_summary SET total = TOTAL * 2",
+                         source_tables=["dept_summary"], target_tables=["dept_summary"]),
+        ]
+        structure = StoredProcedureStructure(name="p", parameters=[], sql_statements=sql_statements)
+        result = TableFieldAnalyzer().analyze(structure)
+
+        lineage = result.field_lineage
+        assert lineage.columns == ["dept_summary.dept_id", "employees.department_id",
+                                   "dept_summary.total", "employees.salary"]
+        assert lineage.edges == [(1, 0, 1), (3, 2, 1), (2, 2, 2)]
+        assert lineage.sources_of("DEPT_SUMMARY.TOTAL") == ["employees.salary", "dept_summary.total"]
+        assert result.physical_tables["employees"].fields == ["department_id", "salary"]
+
+    def test_reuses_procedure_tokens(self, monkeypatch):
+        """测试分析解析得到的语句时复用存储过程的token流，不对语句重新分词，结果与单独分析一致"""
+        import analyzer.column_lineage as column_lineage
+        from analyzer.column_lineage import extract_column_mappings
+        from parser.sp_parser import StoredProcedureParser
+
+        sql = ("INSERT INTO dept_summary (dept_id, total) "
+               "SELECT e.department_id, SUM(e.salary) FROM employees e GROUP BY e.department_id")
+        structure = StoredProcedureParser().parse(f"CREATE PROCEDURE p AS BEGIN {sql}; END;")
+        stmt = structure.sql_statements[0]
+        assert stmt.token_range is not None
+        expected = extract_column_mappings(sql)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("不应重新分词")
+
+        monkeypatch.setattr(column_lineage, "tokenize", fail)
+        monkeypatch.setattr(column_lineage, "iter_tokens", fail)
+        result = TableFieldAnalyzer().analyze(structure)
+
+        assert result.field_lineage.sources_of("dept_summary.total") == ["employees.salary"]
+        source, tokens, start, end = stmt.token_range
+        assert extract_column_mappings(source, (), tokens, start, end) == expected
@@ -116,6 +116,29 @@ class TestSQLStatement:
         assert "employees" in stmt.source_tables
         assert "reports" in stmt.target_tables
         assert stmt.join_conditions == []
+    
+    def test_sql_statement_span_reference(self):
+        """测试按偏移引用共享源文本的SQL语句"""
+        source = "BEGIN UPDATE employees SET salary = 1; END;"
+        stmt = SQLStatement(
+            statement_id=1,
+            statement_type=StatementType.UPDATE,
+            source=source,
+            span=(6, 37),
+            target_tables=["employees"]
+        )
+        
+        assert stmt.raw_sql == "UPDATE employees SET salary = 1"
+        assert stmt.model_dump()["raw_sql"] == "UPDATE employees SET salary = 1"
+        
+        restored = SQLStatement.model_validate(stmt.model_dump())
+        assert restored.raw_sql == stmt.raw_sql
+        assert restored.span == (6, 37)
+    
+    def test_sql_statement_requires_text(self):
+        """测试缺少语句文本时报错"""
+        with pytest.raises(ValueError):
+            SQLStatement(statement_id=1, statement_type=StatementType.SELECT)
 
 
 class TestStoredProcedure:
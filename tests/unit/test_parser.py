@@ -12,6 +12,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
 from parser.sp_parser import StoredProcedureParser
 from parser.sql_parser import SQLStatementParser
+from parser.plsql_lexer import tokenize, TokenType
+from parser.statement_splitter import iter_statement_spans
+from parser.unit_splitter import iter_source_units, iter_analysis_units
 from models.data_models import StoredProcedure, SQLStatement, Parameter
 
 
@@ -78,6 +81,251 @@ class TestStoredProcedureParser:
         assert params[0].direction == "IN"
         assert params[1].data_type == "VARCHAR2"
         assert params[2].direction == "OUT"
+    
+    def test_extract_parameters_with_precision_and_defaults(self):
+        """测试提取带精度、IN OUT和默认值的参数"""
+        procedure_text = """
+        CREATE OR REPLACE PROCEDURE hr.test_proc(
+            p_amount IN NUMBER(10,2) DEFAULT 0,
+            p_salary IN OUT NOCOPY employees.salary%TYPE
+        ) AS BEGIN NULL; END;
+        """
+        params = self.parser._extract_parameters(procedure_text)
+        assert len(params) == 2
+        assert params[0].data_type == "NUMBER(10,2)"
+        assert params[0].default_value == "0"
+        assert params[1].direction == "INOUT"
+        assert params[1].data_type == "employees.salary%TYPE"
+    
+    def test_split_ignores_semicolons_in_strings_and_comments(self):
+        """测试字符串和注释中的分号不会拆分语句"""
+        procedure_text = """
+        CREATE OR REPLACE PROCEDURE test_proc AS
+        BEGIN
+            -- 注释中的分号; 不应拆分
+            UPDATE employees SET note = 'a;b' WHERE employee_id = 1;
+            DELETE FROM logs /* ; */ WHERE log_id = 2;
+        END;
+        """
+        result = self.parser.parse(procedure_text)
+        assert [stmt.statement_type.value for stmt in result.sql_statements] == ["UPDATE", "DELETE"]
+        assert "'a;b'" in result.sql_statements[0].raw_sql
+    
+    def test_extract_declarations(self):
+        """测试提取游标和变量声明"""
+        procedure_text = """
+        CREATE OR REPLACE PROCEDURE test_proc(p_dept IN NUMBER) IS
+            CURSOR c_emp IS SELECT employee_id FROM employees WHERE department_id = p_dept;
+            v_count CONSTANT NUMBER := 0;
+            v_name VARCHAR2(100);
+        BEGIN
+            NULL;
+        END;
+        """
+        result = self.parser.parse(procedure_text)
+        assert result.cursor_declarations == [{
+            'name': 'c_emp',
+            'definition': 'SELECT employee_id FROM employees WHERE department_id = p_dept'
+        }]
+        assert [v['name'] for v in result.variable_declarations] == ['v_count', 'v_name']
+        assert result.variable_declarations[0]['initial_value'] == '0'
+        assert result.variable_declarations[1]['type'] == 'VARCHAR2(100)'
+
+
+class TestPLSQLLexer:
+    """测试PL/SQL词法分析器"""
+    
+    def test_tokenize_literals_and_identifiers(self):
+        """测试识别字符串、q-quote、双引号标识符和绑定变量"""
+        text = "v := q'[it's]' || N'a''b' || \"My Col\" || :b1;"
+        tokens = tokenize(text)
+        
+        strings = [tok.value for tok in tokens if tok.type == TokenType.STRING]
+        assert strings == ["q'[it's]'", "N'a''b'"]
+        assert any(tok.type == TokenType.QUOTED_IDENT and tok.norm == "My Col" for tok in tokens)
+        assert any(tok.type == TokenType.BIND and tok.value == ":b1" for tok in tokens)
+        assert tokens[1].type == TokenType.OPERATOR and tokens[1].value == ":="
+    
+    def test_tokenize_comments(self):
+        """测试注释识别"""
+        text = "SELECT 1 -- one; two\nFROM /* x; */ dual;"
+        assert [tok.norm for tok in tokenize(text)] == ["SELECT", "1", "FROM", "DUAL", ";"]
+        
+        comments = [tok for tok in tokenize(text, include_comments=True) if tok.type == TokenType.COMMENT]
+        assert len(comments) == 2
+    
+    def test_token_offsets(self):
+        """测试token偏移指向原始文本"""
+        text = "UPDATE employees SET salary = 1;"
+        for tok in tokenize(text):
+            assert text[tok.start:tok.end] == tok.value
+
+
+class TestStatementSplitter:
+    """测试块结构语句切分"""
+    
+    def _split(self, body):
+        tokens = tokenize(body)
+        return [body[span.start:span.end] for span in iter_statement_spans(tokens, 0)]
+    
+    def test_split_nested_control_blocks(self):
+        """测试IF/LOOP/CASE嵌套中的叶子语句切分"""
+        body = """
+        BEGIN
+            FOR r IN (SELECT id FROM src) LOOP
+                IF r.id > 0 THEN
+                    INSERT INTO t1 SELECT CASE WHEN id > 1 THEN 1 END FROM s1;
+                ELSIF r.id < 0 THEN
+                    DELETE FROM t2 WHERE id = r.id;
+                END IF;
+            END LOOP;
+            CASE p_mode
+                WHEN 1 THEN UPDATE t3 SET c = 1;
+                ELSE UPDATE t4 SET c = 2;
+            END CASE;
+        END;
+        SELECT * FROM after_end;
+        """
+        assert self._split(body) == [
+            "INSERT INTO t1 SELECT CASE WHEN id > 1 THEN 1 END FROM s1",
+            "DELETE FROM t2 WHERE id = r.id",
+            "UPDATE t3 SET c = 1",
+            "UPDATE t4 SET c = 2",
+        ]
+    
+    def test_split_nested_blocks_and_handlers(self):
+        """测试嵌套匿名块、异常处理器和FORALL"""
+        body = """
+        BEGIN
+            FORALL i IN 1..10 INSERT INTO t1 VALUES (i);
+            DECLARE
+                v_x NUMBER;
+            BEGIN
+                UPDATE t2 SET c = 1;
+            EXCEPTION
+                WHEN OTHERS THEN NULL;
+            END;
+        EXCEPTION
+            WHEN NO_DATA_FOUND THEN
+                ROLLBACK;
+        END;
+        """
+        assert self._split(body) == [
+            "INSERT INTO t1 VALUES (i)",
+            "UPDATE t2 SET c = 1",
+            "NULL",
+            "ROLLBACK",
+        ]
+    
+    def test_skip_nested_subprogram_declarations(self):
+        """测试声明区嵌套子程序不影响主体定位"""
+        procedure_text = """
+        CREATE OR REPLACE PROCEDURE outer_proc AS
+            PROCEDURE helper IS
+            BEGIN
+                UPDATE helper_table SET c = 1;
+            END helper;
+        BEGIN
+            DELETE FROM main_table;
+        END;
+        """
+        result = StoredProcedureParser().parse(procedure_text)
+        assert [stmt.raw_sql for stmt in result.sql_statements] == ["DELETE FROM main_table"]
+
+
+class TestUnitSplitter:
+    """测试源文件程序单元切分"""
+    
+    DUMP = """-- schema export
+CREATE OR REPLACE PROCEDURE hr.p_first(p_id IN NUMBER) AS
+BEGIN
+    UPDATE t1 SET c = p_id;
+END p_first;
+/
+CREATE TABLE not_a_unit (id NUMBER);
+CREATE OR REPLACE FUNCTION f_second(p_id NUMBER) RETURN NUMBER IS
+BEGIN
+    RETURN p_id / 2;
+END;
+/
+CREATE OR REPLACE PACKAGE pkg AS
+    PROCEDURE m1(p_a NUMBER);
+END pkg;
+/
+CREATE OR REPLACE PACKAGE BODY pkg AS
+    PROCEDURE m0;
+    PROCEDURE m1(p_a NUMBER) IS
+    BEGIN
+        INSERT INTO t2 (c) VALUES (p_a);
+    END m1;
+    PROCEDURE m0 IS BEGIN DELETE FROM t3; END;
+END pkg;
+/
+CREATE OR REPLACE TRIGGER trg_t1 BEFORE INSERT ON t1 REFERENCING NEW AS n FOR EACH ROW
+DECLARE
+    v_count NUMBER;
+BEGIN
+    INSERT INTO audit_t1 (c) VALUES (:n.c);
+END;
+/
+"""
+    
+    def test_split_units(self):
+        """测试按 / 结束符与 CREATE 头部切分单元，单元外的DDL被忽略"""
+        units = list(iter_source_units(self.DUMP))
+        
+        assert [(u.kind, u.name) for u in units] == [
+            ("PROCEDURE", "p_first"),
+            ("FUNCTION", "f_second"),
+            ("PACKAGE", "pkg"),
+            ("PACKAGE BODY", "pkg"),
+            ("TRIGGER", "trg_t1"),
+        ]
+        assert self.DUMP[units[0].start:units[0].end].endswith("END p_first;")
+        assert units[0].end < self.DUMP.index("not_a_unit") < units[1].start
+        # 除法运算符不是结束符
+        assert "RETURN p_id / 2;" in self.DUMP[units[1].start:units[1].end]
+    
+    def test_units_without_terminators(self):
+        """测试没有 / 结束符时以下一个单元头部为界"""
+        text = ("CREATE PROCEDURE a AS BEGIN NULL; END;\n"
+                "CREATE PROCEDURE b AS BEGIN NULL; END;")
+        units = list(iter_source_units(text))
+        
+        assert [text[u.start:u.end] for u in units] == [
+            "CREATE PROCEDURE a AS BEGIN NULL; END;",
+            "CREATE PROCEDURE b AS BEGIN NULL; END;",
+        ]
+    
+    def test_analysis_units_expand_package_body(self):
+        """测试包体展开为成员子程序，包规范与前置声明被跳过"""
+        units = list(iter_analysis_units(self.DUMP))
+        
+        assert [(u.kind, u.name) for u in units] == [
+            ("PROCEDURE", "p_first"),
+            ("FUNCTION", "f_second"),
+            ("PROCEDURE", "pkg.m1"),
+            ("PROCEDURE", "pkg.m0"),
+            ("TRIGGER", "trg_t1"),
+        ]
+        assert units[2].package == "pkg"
+    
+    def test_parse_each_unit(self):
+        """测试各类单元均能被存储过程解析器解析"""
+        parser = StoredProcedureParser()
+        parsed = [parser.parse(self.DUMP[u.start:u.end]) for u in iter_analysis_units(self.DUMP)]
+        
+        assert [p.name for p in parsed] == ["p_first", "f_second", "m1", "m0", "trg_t1"]
+        assert [p.name for p in parsed[2].parameters] == ["p_a"]
+        assert parsed[2].sql_statements[0].raw_sql == "INSERT INTO t2 (c) VALUES (p_a)"
+        # 触发器的 REFERENCING ... AS 不影响声明区识别
+        assert [v['name'] for v in parsed[4].variable_declarations] == ["v_count"]
+        assert parsed[4].sql_statements[0].raw_sql == "INSERT INTO audit_t1 (c) VALUES (:n.c)"
+    
+    def test_anonymous_block(self):
+        """测试没有单元头部的文本作为一个匿名单元"""
+        text = "BEGIN UPDATE t SET c = 1; END;"
+        assert [(u.kind, u.start, u.end) for u in iter_analysis_units(text)] == [("ANONYMOUS", 0, len(text))]
 
 
 class TestSQLStatementParser:
@@ -163,4 +411,132 @@ class TestSQLStatementParser:
         """测试处理无效SQL"""
         invalid_sql = "INVALID SQL STATEMENT"
         with pytest.raises(Exception):
-            self.parser.parse(invalid_sql) 
\ No newline at end of file
+            self.parser.parse(invalid_sql) 
+
+class TestPatternRegistry:
+    """预编译正则注册表测试"""
+
+    SQL = ("SELECT e.name, d.name FROM employees e JOIN departments d ON e.dept_id = d.id "
+           "WHERE e.salary > :min_salary AND d.region = :region")
+    DDL = "CREATE GLOBAL TEMPORARY TABLE tmp_emp AS SELECT * FROM employees"
+
+    def test_patterns_match_inline_results(self):
+        """测试预编译模式与内联正则结果一致"""
+        import re
+        from parser.patterns import BIND_PARAMETER, CREATE_TABLE
+
+        assert BIND_PARAMETER.findall(self.SQL) == re.findall(r':(\w+)', self.SQL) == ['min_salary', 'region']
+        assert CREATE_TABLE.search(self.DDL).group(1) == 'tmp_emp'
+        assert SQLStatementParser()._extract_parameters(self.SQL) == ['min_salary', 'region']
+
+    @pytest.mark.performance
+    def test_per_statement_cost(self, performance_report):
+        """微基准：每条语句的正则开销（内联模式字符串 vs 预编译模式）"""
+        import re
+        import timeit
+        from parser.patterns import BIND_PARAMETER, CREATE_TABLE
+
+        sql = self.SQL.upper()
+        ddl = self.DDL
+
+        def inline():
+            re.findall(r':(\w+)', sql)
+            re.search(r'CREATE\s+(?:GLOBAL\s+TEMPORARY\s+)?TABLE\s+([^\s(]+)', ddl, re.IGNORECASE)
+
+        def precompiled():
+            BIND_PARAMETER.findall(sql)
+            CREATE_TABLE.search(ddl)
+
+        number = 20000
+        before = min(timeit.repeat(inline, number=number, repeat=5)) / number
+        after = min(timeit.repeat(precompiled, number=number, repeat=5)) / number
+        performance_report(f"每条语句: 内联 {before * 1e6:.2f}us, 预编译 {after * 1e6:.2f}us")
+
+
+class TestSymbolResolver:
+    """符号表与参数/变量引用解析测试"""
+
+    PROCEDURE = """CREATE OR REPLACE PROCEDURE update_dept(p_dept_id IN NUMBER, p_rate IN NUMBER) IS
+  v_total NUMBER := 0;
+BEGIN
+  SELECT SUM(salary) INTO v_total FROM employees e WHERE e.department_id = P_DEPT_ID AND e.p_rate = 1;
+  UPDATE departments SET total = v_total WHERE id = :p_dept_id;
+  log_change(p_rate => 1, msg => 'p_dept_id');
+  v_total := v_total * p_rate;
+END;"""
+
+    def test_bare_references(self):
+        """测试识别不带冒号的参数与变量引用"""
+        statements = StoredProcedureParser().parse(self.PROCEDURE).sql_statements
+
+        assert [s.parameters_used for s in statements] == [['p_dept_id'], ['p_dept_id'], [], ['p_rate']]
+        assert [s.variables_used for s in statements] == [['v_total'], ['v_total'], [], ['v_total']]
+
+    def test_qualified_and_named_notation_are_not_references(self):
+        """测试 别名.列名、命名参数的形参名 和 字符串 不视为引用"""
+        from parser.symbol_resolver import SymbolTable, PARAMETER, resolve_references
+
+        symbols = SymbolTable()
+        symbols.declare("p_id", PARAMETER)
+        tokens = tokenize("f(p_id => e.p_id, x => 'p_id')")
+        assert resolve_references(tokens, 0, len(tokens), symbols).parameters == []
+
+        tokens = tokenize('x = P_Id + "P_ID"')
+        assert resolve_references(tokens, 0, len(tokens), symbols).parameters == ['p_id']
+
+
+class TestJoinExtractor:
+    """JOIN 条件提取与别名解析测试"""
+
+    def _conditions(self, sql):
+        from parser.join_extractor import extract_joins
+        joins = extract_joins(sql)
+        return joins.aliases, [
+            (c.left_table, c.left_field, c.join_type, c.right_table, c.right_field, c.syntax)
+            for c in joins.conditions
+        ]
+
+    def test_ansi_join_resolves_aliases(self):
+        """测试 ANSI JOIN 的别名在解析时映射为实际表名，非列比较的条件被忽略"""
+        aliases, conditions = self._conditions(
+            "SELECT d.name FROM departments d "
+            "LEFT OUTER JOIN hr.employees emp ON d.department_id = emp.department_id AND emp.active = 1 "
+            "INNER JOIN jobs ON emp.job_id = jobs.job_id "
+            "WHERE EXTRACT(YEAR FROM emp.hire_date) = 2024")
+        assert aliases == {'D': 'departments', 'EMP': 'hr.employees', 'JOBS': 'jobs'}
+        assert conditions == [
+            ('departments', 'department_id', 'LEFT', 'hr.employees', 'department_id', 'ANSI'),
+            ('hr.employees', 'job_id', 'INNER', 'jobs', 'job_id', 'ANSI'),
+        ]
+
+    def test_oracle_outer_join_syntax(self):
+        """测试 WHERE 子句中的 Oracle 连接与 (+) 外连接"""
+        _, conditions = self._conditions(
+            "SELECT * FROM employees e, departments d, locations l "
+            "WHERE e.dept_id = d.id(+) AND d.loc_id(+) = l.id AND e.salary > 1000")
+        assert conditions == [
+            ('employees', 'dept_id', 'LEFT', 'departments', 'id', 'ORACLE'),
+            ('departments', 'loc_id', 'RIGHT', 'locations', 'id', 'ORACLE'),
+        ]
+
+    def test_subquery_scopes(self):
+        """测试子查询中的连接被识别，关联条件不视为 Oracle 连接，内联视图别名不映射为表"""
+        aliases, conditions = self._conditions(
+            "UPDATE employees e SET bonus = (SELECT MAX(b.amount) FROM bonus b, grades g "
+            "WHERE b.grade = g.id AND b.emp_id = e.id) "
+            "WHERE EXISTS (SELECT 1 FROM (SELECT * FROM jobs) j JOIN depts q ON j.dept = q.id)")
+        assert aliases == {'E': 'employees', 'B': 'bonus', 'G': 'grades', 'Q': 'depts', 'JOBS': 'jobs'}
+        assert conditions == [('bonus', 'grade', 'INNER', 'grades', 'id', 'ORACLE')]
+
+    def test_statement_carries_structured_joins(self, sample_procedure_with_joins):
+        """测试存储过程中的 JOIN 语句解析出结构化条件与语句级别名映射"""
+        procedure = StoredProcedureParser().parse(sample_procedure_with_joins)
+        stmt = procedure.sql_statements[0]
+
+        assert stmt.statement_type.value == "INSERT"
+        assert stmt.table_aliases == {'D': 'departments', 'E': 'employees', 'JH': 'job_history'}
+        assert [(c.left_table, c.right_table, c.join_type, c.left_alias, c.condition_text)
+                for c in stmt.join_conditions] == [
+            ('departments', 'employees', 'LEFT', 'd', 'd.department_id = e.department_id'),
+            ('employees', 'job_history', 'LEFT', 'e', 'e.employee_id = jh.employee_id'),
+        ]
@@ -0,0 +1,201 @@
+"""
+测试工具模块
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from utils.cache import AnalysisCache, DiskAnalysisCache, procedure_hash
+from utils.config import Config
+from models.data_models import StoredProcedureStructure, SQLStatement, StatementType
+
+
+class TestAnalysisCache:
+    """测试分析结果缓存"""
+    
+    def test_hit_and_miss_counters(self):
+        """测试命中与未命中计数"""
+        cache = AnalysisCache(max_size=10, ttl=60)
+        
+        assert cache.get("k1") is None
+        cache.put("k1", "v1")
+        assert cache.get("k1") == "v1"
+        
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+    
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        cache = AnalysisCache(max_size=2, ttl=None)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+    
+    def test_ttl_expiry(self, monkeypatch):
+        """测试条目过期"""
+        import utils.cache as cache_module
+        
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        
+        cache = AnalysisCache(max_size=10, ttl=5)
+        cache.put("k", "v")
+        now[0] += 10
+        
+        assert cache.get("k") is None
+        assert len(cache) == 0
+    
+    def test_procedure_hash_normalization(self):
+        """测试缓存键忽略行尾空白与换行差异"""
+        text = "CREATE PROCEDURE p AS\nBEGIN\n  NULL;\nEND;"
+        
+        assert procedure_hash(text) == procedure_hash("  " + text.replace("\n", "   \r\n") + "\n")
+        assert procedure_hash(text) != procedure_hash(text.replace("NULL", "COMMIT"))
+    
+    def test_from_config(self, monkeypatch):
+        """测试按配置创建缓存"""
+        monkeypatch.delenv("CACHE_ENABLED", raising=False)
+        monkeypatch.delenv("CACHE_TTL", raising=False)
+        config = Config()
+        config.set("cache", {"enabled": True, "ttl": 120, "max_size": 50})
+        
+        cache = AnalysisCache.from_config(config)
+        assert cache.max_size == 50
+        assert cache.ttl == 120
+        
+        config.set("cache", {"enabled": False})
+        assert AnalysisCache.from_config(config) is None
+
+
+class TestDiskAnalysisCache:
+    """测试持久化分析缓存"""
+    
+    def _structure(self):
+        source = "BEGIN DELETE FROM employees; END;"
+        return StoredProcedureStructure(
+            name="p",
+            parameters=[],
+            sql_statements=[SQLStatement(
+                statement_id=1,
+                statement_type=StatementType.DELETE,
+                source=source,
+                span=(6, 27),
+                target_tables=["employees"]
+            )]
+        )
+    
+    def test_shared_between_instances(self, tmp_path):
+        """测试不同实例（模拟不同worker）共享同一缓存文件"""
+        path = tmp_path / "cache.sqlite3"
+        writer = DiskAnalysisCache(path, StoredProcedureStructure, "1.0")
+        writer.put("k", self._structure())
+        
+        reader = DiskAnalysisCache(path, StoredProcedureStructure, "1.0")
+        cached = reader.get("k")
+        
+        assert cached is not None
+        assert cached.sql_statements[0].raw_sql == "DELETE FROM employees"
+        assert reader.stats()["hits"] == 1
+    
+    def test_parser_version_mismatch(self, tmp_path):
+        """测试解析器版本变化后旧结果失效"""
+        path = tmp_path / "cache.sqlite3"
+        DiskAnalysisCache(path, StoredProcedureStructure, "1.0").put("k", self._structure())
+        
+        assert DiskAnalysisCache(path, StoredProcedureStructure, "2.0").get("k") is None
+    
+    def test_full_analysis_round_trip(self, tmp_path):
+        """测试完整分析结果（含表的语句ID）可以写入并还原"""
+        from main import OracleSPAnalyzer
+        from models.data_models import StoredProcedureAnalysis
+        
+        analysis = OracleSPAnalyzer(visualize=False).analyze(
+            "CREATE PROCEDURE p(p_id IN NUMBER) AS BEGIN UPDATE employees SET salary = 0 WHERE id = p_id; END;"
+        )
+        cache = DiskAnalysisCache(tmp_path / "cache.sqlite3", StoredProcedureAnalysis, "1.0")
+        cache.put("k", analysis)
+        
+        cached = cache.get("k")
+        assert cached is not None
+        assert cached.table_field_analysis.physical_tables["employees"].source_sql_ids == [1]
+    
+    def test_undecodable_entry_is_miss(self, tmp_path):
+        """测试无法还原为当前模型的条目视为未命中"""
+        from models.data_models import StoredProcedureAnalysis
+        
+        path = tmp_path / "cache.sqlite3"
+        DiskAnalysisCache(path, StoredProcedureStructure, "1.0").put("k", self._structure())
+        cache = DiskAnalysisCache(path, StoredProcedureAnalysis, "1.0")
+        
+        assert cache.get("k") is None
+        assert cache.stats()["misses"] == 1
+    
+    def test_max_size(self, tmp_path):
+        """测试超过容量时删除最早的条目"""
+        cache = DiskAnalysisCache(tmp_path / "cache.sqlite3", StoredProcedureStructure, "1.0", max_size=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, self._structure())
+        
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+
+
+class TestConfig:
+    """测试配置读取"""
+    
+    def test_parse_size(self):
+        """测试大小字符串换算为字节数"""
+        assert Config.parse_size("10MB") == 10 * 1024 * 1024
+        assert Config.parse_size("512 kb") == 512 * 1024
+        assert Config.parse_size("1.5GB") == int(1.5 * 1024 ** 3)
+        assert Config.parse_size("2048") == 2048
+        assert Config.parse_size(4096) == 4096
+    
+    def test_upload_config(self, monkeypatch):
+        """测试上传配置中的大小上限"""
+        monkeypatch.delenv("MAX_FILE_SIZE", raising=False)
+        config = Config()
+        config.set('upload', {'max_size': '50MB'})
+        assert config.get_upload_config()['max_size'] == 50 * 1024 * 1024
+
+
+class TestSerialization:
+    """测试JSON序列化"""
+    
+    DATA = {"名称": "员工表", "ids": [1, 2, 3], "edges": [(0, 1, 2)], "nested": {"ok": True, "none": None}, 7: "int key"}
+    
+    def test_fallback_matches_orjson(self, monkeypatch):
+        """测试未安装 orjson 时回退到标准库，解码结果一致且不转义非ASCII字符"""
+        import json
+        from utils import serialization
+        
+        fast = serialization.dumps(self.DATA)
+        monkeypatch.setattr(serialization, "_orjson", None)
+        assert serialization.backend_name() == "json"
+        fallback = serialization.dumps(self.DATA)
+        
+        assert json.loads(fast) == json.loads(fallback)
+        assert "员工表".encode("utf-8") in fallback
+        assert b"\n" not in fallback
+        assert b"\n  " in serialization.dumps(self.DATA, pretty=True)
+    
+    def test_dump_to_file(self, tmp_path):
+        """测试写入文件"""
+        import json
+        from utils import serialization
+        
+        path = tmp_path / "data.json"
+        serialization.dump(self.DATA, path)
+        assert json.loads(path.read_text(encoding="utf-8"))["名称"] == "员工表"